@@ -11,14 +11,14 @@ import torchaudio
 import tempfile
 import shutil
 import re
-import pandas as pd
 import numpy as np
 from typing import List, Dict, Optional, Tuple
-from faster_whisper import WhisperModel
-from pyannote.audio import Pipeline as PyannotePipeline
+from concurrent.futures import ThreadPoolExecutor
 from faster_whisper.vad import VadOptions
-from preprocess import preprocess_audio
-from hf_downloader import download_model
+from preprocess import preprocess_array
+from stt_pool import (stt_pool, cpu_thread_split, run_concurrently, whisper_transcribe,
+                      STT_CONCURRENT, STT_BATCH_SIZE, STT_BEAM_SIZE)
+from speaker_assign import assign_speakers
 
 
 
@@ -94,37 +94,31 @@ class Output:
         }
 
 class WhisperDiarizationPipeline:
-    def __init__(self, device: str = "cpu", compute_type: str = "int8", model_name: str = "large-v3-turbo"):
+    def __init__(self, device: str = "cpu", compute_type: str = "int8", model_name: str = "large-v3-turbo",
+                 concurrent: bool = STT_CONCURRENT, batch_size: int = STT_BATCH_SIZE,
+                 beam_size: int = STT_BEAM_SIZE):
         """Load models into memory."""
 
         print(f"DEBUG --> Setup with {model_name}, {device}, {compute_type}")
-        if model_name=="deepdml/faster-whisper-large-v3-turbo-ct2":
-          model_dir = download_model(
-                "deepdml/faster-whisper-large-v3-turbo-ct2",
-                download_folder="./",
-                redownload=False)
-          self.model = WhisperModel(
-                model_dir,
-                device=device,
-                compute_type=compute_type)
-        else:
-          self.model = WhisperModel(
-                  model_name,
-                  device=device,
-                  compute_type=compute_type,
-              )
-        token = os.getenv("HF_AUTH_TOKEN", "TOKEN_HERE")
-        try:
-          self.diarization_model = PyannotePipeline.from_pretrained(
-              "pyannote/speaker-diarization-3.1",
-              use_auth_token=token,
-          ).to(torch.device(device))
-        except:
-          # skip google colab hugging face authentication problem
-          print("Google Colab Wants Huggingface Token 🤬")
-          self.diarization_model = PyannotePipeline.from_pretrained(
-              "fatymatariq/speaker-diarization-3.1"
-          ).to(torch.device(device))
+        self.device = device
+        self.compute_type = compute_type
+        self.model_name = model_name
+        # Transcription and diarization run at the same time, CPU cores split between them
+        self.concurrent = concurrent
+        # batch_size > 0: batched faster-whisper over VAD speech chunks
+        self.batch_size = batch_size
+        self.beam_size = beam_size
+        self.whisper_threads, self.diarization_threads = cpu_thread_split(device) if concurrent else (0, 0)
+        # Load through the shared pool now (so setup pays for it, not the first predict);
+        # other pipelines / UIs in this process with the same config reuse the warm models.
+        with self.whisper_model(), self.diarization():
+            pass
+
+    def whisper_model(self):
+        return stt_pool.whisper(self.model_name, self.device, self.compute_type, cpu_threads=self.whisper_threads)
+
+    def diarization(self):
+        return stt_pool.diarization(self.device)
 
     def _get_file(self, file_path=None, file_url=None, file_string=None) -> str:
         """
@@ -175,24 +169,26 @@ class WhisperDiarizationPipeline:
         lowpass_freq: int = 8000,
         prop_decrease: float = 1.0,
         stationary: bool = True,
-        target_dBFS: float = -18.0
+        target_dBFS: float = -18.0,
+        keep_stereo: bool = False
     ) -> Output:
         """Run a single prediction on the model."""
         temp_input, temp_dir = self._get_file(file_path, file_url, file_string)
         # Convert to mono because sometime Sterio audio gives errors
-        mono_audio = convert_to_mono(temp_input)
-        temp_input=mono_audio
+        # (keep_stereo=True: 2-channel recordings take the per-channel path below)
+        if not keep_stereo:
+            mono_audio = convert_to_mono(temp_input)
+            temp_input=mono_audio
 
 
         try:
             num_channels = self._get_audio_channels(temp_input)
             print(f"DEBUG --> Audio with {num_channels} channels")
             if num_channels == 1:
-                temp_processed = os.path.join(temp_dir, "input_processed.wav")
                 if preprocess > 0:
-                    preprocess_audio(
+                    # Preprocessed in memory; the 16 kHz array goes straight to whisper + pyannote
+                    audio_for_model = preprocess_array(
                         temp_input,
-                        temp_processed,
                         preprocess_level=preprocess,
                         highpass_freq=highpass_freq,
                         lowpass_freq=lowpass_freq,
@@ -200,7 +196,6 @@ class WhisperDiarizationPipeline:
                         stationary=stationary,
                         target_dBFS=target_dBFS
                     )
-                    audio_for_model = temp_processed
                 else:
                     audio_for_model = temp_input
 
@@ -212,41 +207,40 @@ class WhisperDiarizationPipeline:
 
             else:
                 print(f"DEBUG --> Spliting channels")
-                ch1_path, ch2_path = self._split_stereo_channels(temp_input, temp_dir)
-                ch1_proc = os.path.join(temp_dir, "ch1_proc.wav")
-                ch2_proc = os.path.join(temp_dir, "ch2_proc.wav")
+                # One decode for both channels; each channel is then preprocessed and
+                # transcribed concurrently instead of one after the other.
+                ch1_audio, ch2_audio = self._decode_stereo_channels(temp_input)
 
+                # faster-whisper takes 16 kHz float32 arrays directly, so nothing touches disk
                 if preprocess > 0:
-                    preprocess_audio(ch1_path, ch1_proc,
-                                    preprocess_level=preprocess,
-                                    highpass_freq=highpass_freq,
-                                    lowpass_freq=lowpass_freq,
-                                    prop_decrease=prop_decrease,
-                                    stationary=stationary,
-                                    target_dBFS=target_dBFS)
-                    preprocess_audio(ch2_path, ch2_proc,
-                                    preprocess_level=preprocess,
-                                    highpass_freq=highpass_freq,
-                                    lowpass_freq=lowpass_freq,
-                                    prop_decrease=prop_decrease,
-                                    stationary=stationary,
-                                    target_dBFS=target_dBFS)
+                    with ThreadPoolExecutor(max_workers=2) as pool:
+                        ch1_input, ch2_input = pool.map(
+                            lambda audio: preprocess_array(audio,
+                                                           preprocess_level=preprocess,
+                                                           highpass_freq=highpass_freq,
+                                                           lowpass_freq=lowpass_freq,
+                                                           prop_decrease=prop_decrease,
+                                                           stationary=stationary,
+                                                           target_dBFS=target_dBFS),
+                            [ch1_audio, ch2_audio],
+                        )
                 else:
-                    ch1_proc = ch1_path
-                    ch2_proc = ch2_path
+                    ch1_input, ch2_input = ch1_audio, ch2_audio
 
-                print(f"DEBUG --> Starting transcribing stereo channel 0")
+                print(f"DEBUG --> Starting transcribing stereo channels 0 and 1")
                 # ch1_segments, info1 = self._transcribe_audio_ch0_mock(ch1_proc, language, prompt or "", translate)
-                ch1_segments, info1 = self._transcribe_audio(ch1_proc, language, prompt or "", translate)
+                # ch2_segments, info2 = self._transcribe_audio_ch1_mock(ch2_proc, language, prompt or "", translate)
+                with ThreadPoolExecutor(max_workers=2) as pool:
+                    ch1_job = pool.submit(self._transcribe_audio, ch1_input, language, prompt or "", translate)
+                    ch2_job = pool.submit(self._transcribe_audio, ch2_input, language, prompt or "", translate)
+                    ch1_segments, info1 = ch1_job.result()
+                    ch2_segments, info2 = ch2_job.result()
+
                 for s in ch1_segments:
                     s["speaker"] = "SPEAKER_00"
                     for w in s["words"]:
                         w["speaker"] = "SPEAKER_00"
                 # print(f"DEBUG --> Transcription stereo channel 0 {ch1_segments}")
-
-                print(f"DEBUG --> Starting transcribing stereo channel 1")
-                # ch2_segments, info2 = self._transcribe_audio_ch1_mock(ch2_proc, language, prompt or "", translate)
-                ch2_segments, info2 = self._transcribe_audio(ch2_proc, language, prompt or "", translate)
                 for s in ch2_segments:
                     s["speaker"] = "SPEAKER_01"
                     for w in s["words"]:
@@ -265,13 +259,9 @@ class WhisperDiarizationPipeline:
 
         finally:
             try:
+                # preprocessing and channel splitting stay in memory; only the input file is on disk
                 cleanup_candidates = {
                     locals().get("temp_input"),
-                    locals().get("temp_processed"),
-                    locals().get("ch1_path"),
-                    locals().get("ch2_path"),
-                    locals().get("ch1_proc"),
-                    locals().get("ch2_proc"),
                 }
                 for f in cleanup_candidates:
                     if f and os.path.exists(f):
@@ -300,23 +290,33 @@ class WhisperDiarizationPipeline:
     ) -> Tuple[List[Dict], int, str]:
         time_start = time.time()
 
-        # segments, transcript_info = self._transcribe_audio_mock(
-        segments, transcript_info = self._transcribe_audio(
-            audio_file_wav, language, prompt, translate
-        )
-        print(f"DEBUG --> Finished transcribing, {len(segments)} segments")
-        # debug_segmetns=list(segments)
-        # raw_text=""
-        # for i in  debug_segmetns:
-        #   raw_text+=i['text']+"\n"
-        # print(f"DEBUG --> What faster whisper got ")
-        # print(raw_text)
-        print("DEBUG --> Starting diarization")
-        # diarization, detected_num_speakers = self._diarize_audio_mock(
-        diarization, detected_num_speakers = self._diarize_audio(
-            audio_file_wav, num_speakers
-        )
-        print(f"DEBUG --> Finished diarization, {detected_num_speakers} speakers detected")
+        if self.concurrent:
+            print("DEBUG --> Starting transcription and diarization concurrently")
+            (segments, transcript_info), (diarization, detected_num_speakers) = run_concurrently(
+                lambda: self._transcribe_audio(audio_file_wav, language, prompt, translate),
+                lambda: self._diarize_audio(audio_file_wav, num_speakers),
+                diarization_threads=self.diarization_threads,
+            )
+            print(f"DEBUG --> Finished transcribing, {len(segments)} segments")
+            print(f"DEBUG --> Finished diarization, {detected_num_speakers} speakers detected")
+        else:
+            # segments, transcript_info = self._transcribe_audio_mock(
+            segments, transcript_info = self._transcribe_audio(
+                audio_file_wav, language, prompt, translate
+            )
+            print(f"DEBUG --> Finished transcribing, {len(segments)} segments")
+            # debug_segmetns=list(segments)
+            # raw_text=""
+            # for i in  debug_segmetns:
+            #   raw_text+=i['text']+"\n"
+            # print(f"DEBUG --> What faster whisper got ")
+            # print(raw_text)
+            print("DEBUG --> Starting diarization")
+            # diarization, detected_num_speakers = self._diarize_audio_mock(
+            diarization, detected_num_speakers = self._diarize_audio(
+                audio_file_wav, num_speakers
+            )
+            print(f"DEBUG --> Finished diarization, {detected_num_speakers} speakers detected")
 
         print("DEBUG --> Starting merging segments with speaker info")
         final_segments = self._merge_segments_with_diarization(segments, diarization)
@@ -331,24 +331,26 @@ class WhisperDiarizationPipeline:
         return final_segments, detected_num_speakers, transcript_info.language
 
     def _transcribe_audio(self, audio_file_wav, language, prompt, translate):
-        options = dict(
-            language=language,
-            beam_size=5,
-            vad_filter=True, # False
-            vad_parameters=VadOptions(
-                max_speech_duration_s=self.model.feature_extractor.chunk_length,
-                min_speech_duration_ms=100,
-                speech_pad_ms=100,
-                threshold=0.25,# 0.15
-                neg_threshold=0.2,
-            ),
-            word_timestamps=True,
-            initial_prompt=prompt,
-            language_detection_segments=1,
-            task="translate" if translate else "transcribe",
-        )
-        segments, transcript_info = self.model.transcribe(audio_file_wav, **options)
-        segments = list(segments)
+        with self.whisper_model() as model:
+            options = dict(
+                language=language,
+                beam_size=self.beam_size,
+                vad_filter=True, # False
+                vad_parameters=VadOptions(
+                    max_speech_duration_s=model.feature_extractor.chunk_length,
+                    min_speech_duration_ms=100,
+                    speech_pad_ms=100,
+                    threshold=0.25,# 0.15
+                    neg_threshold=0.2,
+                ),
+                word_timestamps=True,
+                initial_prompt=prompt,
+                language_detection_segments=1,
+                task="translate" if translate else "transcribe",
+            )
+            segments, transcript_info = whisper_transcribe(
+                model, audio_file_wav, batch_size=self.batch_size, **options
+            )
         segments = [
             {
                 "avg_logprob": s.avg_logprob,
@@ -370,11 +372,16 @@ class WhisperDiarizationPipeline:
         return segments, transcript_info
 
     def _diarize_audio(self, audio_file_wav, num_speakers=None):
-        waveform, sample_rate = torchaudio.load(audio_file_wav)
-        diarization = self.diarization_model(
-            {"waveform": waveform, "sample_rate": sample_rate},
-            num_speakers=num_speakers,
-        )
+        if isinstance(audio_file_wav, np.ndarray):
+            # preprocessed 16 kHz mono array
+            waveform, sample_rate = torch.from_numpy(audio_file_wav).float()[None], 16000
+        else:
+            waveform, sample_rate = torchaudio.load(audio_file_wav)
+        with self.diarization() as diarization_model:
+            diarization = diarization_model(
+                {"waveform": waveform, "sample_rate": sample_rate},
+                num_speakers=num_speakers,
+            )
 
         diarize_segments = []
         diarization_list = list(diarization.itertracks(yield_label=True))
@@ -388,41 +395,19 @@ class WhisperDiarizationPipeline:
 
         return diarize_segments, detected_num_speakers
 
-    def _assign_speaker_to_segment_or_word(self, segment_or_word, diarize_df, fallback_speaker=None):
-        """Calculates the intersection of times."""
-        diarize_df["intersection"] = np.minimum(
-            diarize_df["end"], segment_or_word["end"]
-        ) - np.maximum(diarize_df["start"], segment_or_word["start"])
-        dia_tmp = diarize_df[diarize_df["intersection"] > 0]
-
-        if len(dia_tmp) > 0:
-            speaker = dia_tmp.groupby("speaker")["intersection"].sum().sort_values(ascending=False).index[0]
-        else:
-            speaker = fallback_speaker or "UNKNOWN"
-        return speaker
-
     def _merge_segments_with_diarization(self, segments, diarize_segments):
-        diarize_df = pd.DataFrame(diarize_segments)
+        # Segment and word speakers for the whole transcript in one vectorized pass
+        segment_speakers = assign_speakers(segments, diarize_segments)
         final_segments = []
 
-        for segment in segments:
-            # Segment speaker
-            speaker = self._assign_speaker_to_segment_or_word(segment, diarize_df)
-
-            # Word-level speakers
-            words_with_speakers = []
-            for word in segment["words"]:
-                word_speaker = self._assign_speaker_to_segment_or_word(word, diarize_df, fallback_speaker=speaker)
-                word["speaker"] = word_speaker
-                words_with_speakers.append(word)
-
+        for segment, speaker in zip(segments, segment_speakers):
             new_segment = {
                 "start": segment["start"],
                 "end": segment["end"],
                 "text": segment["text"],
                 "speaker": speaker,
                 "avg_logprob": segment["avg_logprob"],
-                "words": words_with_speakers,
+                "words": list(segment["words"]),
             }
             final_segments.append(new_segment)
 
@@ -501,22 +486,15 @@ class WhisperDiarizationPipeline:
         )
         return int(result.stdout.strip())
 
-    def _split_stereo_channels(self, file_path: str, temp_dir: str) -> Tuple[str, str]:
-        """Splits stereo audio into two mono files (left and right channel)."""
-        ch1_path = os.path.join(temp_dir, "channel1.wav")
-        ch2_path = os.path.join(temp_dir, "channel2.wav")
-
-        subprocess.run([
-            "ffmpeg", "-y", "-i", file_path, "-map_channel", "0.0.0",
-            "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000", ch1_path
-        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        subprocess.run([
-            "ffmpeg", "-y", "-i", file_path, "-map_channel", "0.0.1",
-            "-acodec", "pcm_s16le", "-ac", "1", "-ar", "16000", ch2_path
-        ], check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-        return ch1_path, ch2_path
+    def _decode_stereo_channels(self, file_path: str) -> Tuple[np.ndarray, np.ndarray]:
+        """First two channels as 16 kHz float32 arrays, from a single ffmpeg decode."""
+        result = subprocess.run([
+            "ffmpeg", "-v", "error", "-i", file_path,
+            "-af", "pan=stereo|c0=c0|c1=c1", "-ar", "16000",
+            "-f", "f32le", "-"
+        ], check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        audio = np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, 2)
+        return np.ascontiguousarray(audio[:, 0]), np.ascontiguousarray(audio[:, 1])
 
     def merge_stereo_words(self, ch1_segments, ch2_segments, overlap_tolerance=0, merge_margin=1):
         words = []
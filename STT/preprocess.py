@@ -1,63 +1,119 @@
 """Audio preprocessing utilities."""
-import os
 import subprocess
 import numpy as np
-from scipy.io import wavfile
 from scipy.io.wavfile import write
 import noisereduce as nr
-import tempfile
 import shutil
 
-def sanitize_audio(input_path: str, sanitized_path: str):
-    """Convert audio to mono, 16kHz, pcm_s16le using ffmpeg."""
+SAMPLE_RATE = 16000
+BLOCK_SECONDS = 60  # decode + filter this much audio at a time
+
+
+def decode_audio(input_path: str, sr: int = SAMPLE_RATE, block_seconds: int = BLOCK_SECONDS):
+    """Yields mono float32 blocks of input_path at sr from one ffmpeg decode (no temp files)."""
     cmd = [
-        "ffmpeg",
-        "-y",
+        "ffmpeg", "-v", "error",
         "-i", input_path,
         "-ac", "1",
-        "-ar", "16000",
-        "-c:a", "pcm_s16le",
-        sanitized_path
+        "-ar", str(sr),
+        "-f", "f32le", "-"
     ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    print(f"DEBUG --> Sanitization completed: {sanitized_path}")
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    block_bytes = sr * block_seconds * 4
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            yield np.frombuffer(data[:len(data) - len(data) % 4], dtype=np.float32)
+        if process.wait() != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def filter_sos(sr: int, highpass_freq: int, lowpass_freq: int):
+    """
+    Second-order Butterworth sections matching ffmpeg's highpass/lowpass
+    (2-pole, Q=0.707). A cutoff at or above Nyquist is skipped, like a no-op filter.
+    """
+    from scipy.signal import butter
+    sections = []
+    nyquist = sr / 2
+    if highpass_freq and 0 < highpass_freq < nyquist:
+        sections.append(butter(2, highpass_freq, btype="highpass", fs=sr, output="sos"))
+    if lowpass_freq and 0 < lowpass_freq < nyquist:
+        sections.append(butter(2, lowpass_freq, btype="lowpass", fs=sr, output="sos"))
+    return np.concatenate(sections) if sections else None
 
 
-def apply_filters(input_path: str, filtered_path: str, highpass_freq: int, lowpass_freq: int):
-    """Applies highpass and lowpass filters via ffmpeg."""
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i", input_path,
-        "-af", f"highpass=f={highpass_freq},lowpass=f={lowpass_freq}",
-        filtered_path
-    ]
-    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    print(f"DEBUG --> Applied filters: {filtered_path}")
+def _blocks(audio, block_size):
+    for start in range(0, len(audio), block_size):
+        yield audio[start:start + block_size]
 
 
-def reduce_noise(input_path: str, prop_decrease: float, stationary: bool):
-    """Reduces audio noise and returns numpy float32 data and sample rate."""
-    rate, data = wavfile.read(input_path)
-    if data.dtype == np.int16:
-        data = data.astype(np.float32) / 32768.0
-    reduced = nr.reduce_noise(
+def preprocess_array(
+    audio,
+    preprocess_level: int = 4,
+    highpass_freq: int = 45,
+    lowpass_freq: int = 8000,
+    prop_decrease: float = 1.0,
+    stationary: bool = False,
+    target_dBFS: float = -20.0,
+    sr: int = SAMPLE_RATE,
+) -> np.ndarray:
+    """
+    In-memory version of preprocess_audio: returns mono float32 at sr, ready to
+    hand to faster-whisper / pyannote. `audio` is a path (decoded once by
+    ffmpeg) or a mono float32 array already at sr. Decoding and the IIR filters
+    run block by block, the filter state carried across blocks, so long files
+    are filtered in the same pass as they are decoded.
+    """
+    from scipy.signal import sosfilt
+
+    if preprocess_level <= 0 and not isinstance(audio, str):
+        return np.asarray(audio, dtype=np.float32)
+
+    if isinstance(audio, str):
+        blocks = decode_audio(audio, sr)
+    else:
+        blocks = _blocks(np.asarray(audio, dtype=np.float32), sr * BLOCK_SECONDS)
+
+    # 1 - Sanitization (mono, sr, float32) + 2 - Filter, one pass over the blocks
+    sos = filter_sos(sr, highpass_freq, lowpass_freq) if preprocess_level >= 2 else None
+    zi = np.zeros((len(sos), 2)) if sos is not None else None  # starts at rest, like ffmpeg
+    out = []
+    for block in blocks:
+        if sos is not None:
+            block, zi = sosfilt(sos, block, zi=zi)
+        out.append(block.astype(np.float32, copy=False))
+    data = np.concatenate(out) if out else np.zeros(0, dtype=np.float32)
+    if preprocess_level >= 2:
+        print("DEBUG --> Applied filters")
+    if preprocess_level < 3 or len(data) == 0:
+        return data
+
+    # 3 - ReduceNoise
+    data = nr.reduce_noise(
         y=data,
-        sr=rate,
+        sr=sr,
         prop_decrease=prop_decrease,
         stationary=stationary,
-    )
+    ).astype(np.float32, copy=False)
     print("DEBUG --> Noise removed")
-    return rate, reduced
-
 
-def normalize_audio(audio_data: np.ndarray, target_dBFS: float):
-    """Normalizes audio RMS to target dBFS."""
-    rms = np.sqrt(np.mean(audio_data**2))
-    target_rms = 10 ** (target_dBFS / 20)
-    gain = target_rms / (rms + 1e-9)
-    print("DEBUG --> Audio normalized")
-    return audio_data * gain
+    # 4 - Normalization (RMS accumulated blockwise, gain applied in place)
+    if preprocess_level >= 4:
+        block_size = sr * BLOCK_SECONDS
+        sum_sq = sum(float(np.dot(b, b)) for b in _blocks(data, block_size))
+        rms = np.sqrt(sum_sq / len(data))
+        gain = 10 ** (target_dBFS / 20) / (rms + 1e-9)
+        for b in _blocks(data, block_size):
+            b *= gain
+        print("DEBUG --> Audio normalized")
+    np.clip(data, -1.0, 32767 / 32768, out=data)
+    return data
 
 
 def preprocess_audio(
@@ -79,44 +135,22 @@ def preprocess_audio(
     2 - Sanitization + Filter
     3 - Sanitization + Filter + ReduceNoise
     4 - Sanitization + Filter + ReduceNoise + Normalization
-    """
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        temp1 = f"{tmpdir}/stage1.wav"
-        temp2 = f"{tmpdir}/stage2.wav"
-        temp3 = f"{tmpdir}/stage3.wav"
-
-        if preprocess_level == 0:
-            shutil.copy(input_path, output_path)
-            return
-
-        sanitize_audio(input_path, temp1)
-        if preprocess_level == 1:
-            shutil.copy(temp1, output_path)
-            return
-
-        apply_filters(temp1, temp2, highpass_freq, lowpass_freq)
-        if preprocess_level == 2:
-            shutil.copy(temp2, output_path)
-            return
-
-        rate, reduced = reduce_noise(temp2, prop_decrease, stationary)
-        out_int16 = np.clip(reduced * 32768, -32768, 32767).astype(np.int16)
-        write(temp3, rate, out_int16)
-        if preprocess_level == 3:
-            shutil.copy(temp3, output_path)
-            return
-
-        normalized = normalize_audio(reduced, target_dBFS)
-        out_int16 = np.clip(normalized * 32768, -32768, 32767).astype(np.int16)
-        write(output_path, rate, out_int16)
-
-        # debug_folder = "/home/rafaelgalle/Downloads/audio_debug"
-        # os.makedirs(debug_folder, exist_ok=True)
-        # # shutil.copy(temp1, f"{debug_folder}/stage1.wav")
-        # # shutil.copy(temp2, f"{debug_folder}/stage2.wav")
-        # # shutil.copy(temp3, f"{debug_folder}/stage3.wav")
-        # shutil.copy(output_path, f"{debug_folder}/final_output_{output_path.split('/')[-1].replace('.wav', '')}.wav")
-        # print(f"DEBUG --> Copy files to: {debug_folder}")
-
-        print(f"DEBUG --> Preprocessing complete. File saved in: {output_path}")
+    All stages run in memory (preprocess_array); only output_path is written.
+    """
+    if preprocess_level == 0:
+        shutil.copy(input_path, output_path)
+        return
+
+    data = preprocess_array(
+        input_path,
+        preprocess_level=preprocess_level,
+        highpass_freq=highpass_freq,
+        lowpass_freq=lowpass_freq,
+        prop_decrease=prop_decrease,
+        stationary=stationary,
+        target_dBFS=target_dBFS,
+    )
+    out_int16 = np.clip(data * 32768, -32768, 32767).astype(np.int16)
+    write(output_path, SAMPLE_RATE, out_int16)
+    print(f"DEBUG --> Preprocessing complete. File saved in: {output_path}")
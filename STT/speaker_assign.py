@@ -0,0 +1,93 @@
+"""Interval-overlap speaker assignment for merging Whisper output with diarization."""
+# %cd /content/Video-Dubbing/STT
+import numpy as np
+
+# Overlaps below this (seconds) count as touching, not overlapping — guards float cancellation
+OVERLAP_EPS = 1e-6
+
+
+class SpeakerAssigner:
+    """
+    For every query interval, picks the diarization speaker with the largest
+    total overlap (the same rule as the old per-word pandas groupby, ties going
+    to the lexically first speaker), or the fallback when nothing overlaps.
+
+    Per speaker, turns are kept as sorted start / end arrays with prefix sums,
+    so the overlap of [a, b] with all of that speaker's turns is
+    F(b) - F(a), where F(t) = sum over turns of clip(t - start, 0, end - start)
+    needs two searchsorted lookups. All queries are answered at once,
+    O((queries + turns) log turns) instead of one DataFrame pass per word.
+    """
+
+    def __init__(self, diarize_segments):
+        self.speakers = sorted({seg["speaker"] for seg in diarize_segments})
+        self._tables = []
+        for speaker in self.speakers:
+            turns = [seg for seg in diarize_segments if seg["speaker"] == speaker]
+            starts = np.sort(np.array([t["start"] for t in turns], dtype=np.float64))
+            ends = np.sort(np.array([t["end"] for t in turns], dtype=np.float64))
+            self._tables.append((
+                starts, np.concatenate([[0.0], np.cumsum(starts)]),
+                ends, np.concatenate([[0.0], np.cumsum(ends)]),
+            ))
+
+    @staticmethod
+    def _covered(table, t):
+        """F(t): seconds of this speaker's turns that lie before t (overlapping turns add up)."""
+        starts, starts_cum, ends, ends_cum = table
+        n_started = np.searchsorted(starts, t, side="left")
+        n_ended = np.searchsorted(ends, t, side="left")
+        return (t * n_started - starts_cum[n_started]) - (t * n_ended - ends_cum[n_ended])
+
+    def overlaps(self, starts, ends):
+        """(num_speakers, num_queries) matrix of total overlap in seconds."""
+        starts = np.asarray(starts, dtype=np.float64)
+        ends = np.asarray(ends, dtype=np.float64)
+        overlap = np.zeros((len(self.speakers), len(starts)))
+        for k, table in enumerate(self._tables):
+            overlap[k] = self._covered(table, ends) - self._covered(table, starts)
+        overlap[:, ends <= starts] = 0.0
+        return overlap
+
+    def assign(self, starts, ends, fallbacks=None):
+        """Speaker per query; fallbacks is a per-query list (or None → "UNKNOWN")."""
+        if fallbacks is None:
+            fallbacks = [None] * len(starts)
+        if not self.speakers or len(starts) == 0:
+            return [fallback or "UNKNOWN" for fallback in fallbacks]
+
+        # Rounded so float noise from the prefix sums can't break exact ties
+        overlap = np.round(self.overlaps(starts, ends), 6)
+        best = np.argmax(overlap, axis=0)
+        has_overlap = overlap[best, np.arange(overlap.shape[1])] > OVERLAP_EPS
+        return [
+            self.speakers[b] if hit else (fallback or "UNKNOWN")
+            for b, hit, fallback in zip(best, has_overlap, fallbacks)
+        ]
+
+
+def assign_speakers(segments, diarize_segments):
+    """
+    Sets segment speakers, then word speakers (falling back to their segment's
+    speaker), in two vectorized passes. Words get a "speaker" key in place;
+    returns the list of segment speakers.
+    """
+    assigner = SpeakerAssigner(diarize_segments)
+    segment_speakers = assigner.assign(
+        [seg["start"] for seg in segments], [seg["end"] for seg in segments]
+    )
+
+    words, word_fallbacks = [], []
+    for segment, speaker in zip(segments, segment_speakers):
+        for word in segment["words"]:
+            words.append(word)
+            word_fallbacks.append(speaker)
+    word_speakers = assigner.assign(
+        [w["start"] for w in words], [w["end"] for w in words], word_fallbacks
+    )
+    for word, speaker in zip(words, word_speakers):
+        word["speaker"] = speaker
+    return segment_speakers
+
+# from speaker_assign import assign_speakers
+# segment_speakers = assign_speakers(whisper_segments, [{"start": 0.0, "end": 4.2, "speaker": "SPEAKER_00"}])
@@ -0,0 +1,304 @@
+"""Process-wide pool of warm STT models (faster-whisper, pyannote)."""
+# %cd /content/Video-Dubbing/STT
+import os
+import gc
+import sys
+import inspect
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+
+try:
+    from hf_downloader import download_model
+except ImportError:
+    from STT.hf_downloader import download_model
+
+try:
+    # Inside Video-Dubbing the pool also answers to the shared RAM/VRAM budget
+    from model_manager import model_manager
+except ImportError:
+    model_manager = None
+
+
+DEFAULT_WHISPER_MODEL = "deepdml/faster-whisper-large-v3-turbo-ct2"
+# Seconds a model may sit unused before it is unloaded (0 disables idle eviction)
+STT_IDLE_TIMEOUT = float(os.getenv("STT_IDLE_TIMEOUT", "600"))
+# Run transcription and diarization at the same time (STT_CONCURRENT=0 for one after the other)
+STT_CONCURRENT = os.getenv("STT_CONCURRENT", "1") != "0"
+# >0 switches whisper to batched inference over VAD speech chunks (try 8-16 on GPU)
+STT_BATCH_SIZE = int(os.getenv("STT_BATCH_SIZE", "0"))
+STT_BEAM_SIZE = int(os.getenv("STT_BEAM_SIZE", "5"))
+
+
+def default_device():
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def default_compute_type(device=None):
+    return "float16" if (device or default_device()) == "cuda" else "int8"
+
+
+def load_whisper(model_name=DEFAULT_WHISPER_MODEL, device=None, compute_type=None, cpu_threads=0):
+    from faster_whisper import WhisperModel
+    device = device or default_device()
+    compute_type = compute_type or default_compute_type(device)
+    model_path = model_name
+    if model_name == DEFAULT_WHISPER_MODEL:
+        model_path = download_model(DEFAULT_WHISPER_MODEL, download_folder="./", redownload=False)
+    return WhisperModel(model_path, device=device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def load_pyannote(device=None):
+    from pyannote.audio import Pipeline as PyannotePipeline
+    device = device or default_device()
+    token = os.getenv("HF_AUTH_TOKEN", "TOKEN_HERE")
+    try:
+        diarization_model = PyannotePipeline.from_pretrained(
+            "pyannote/speaker-diarization-3.1",
+            use_auth_token=token,
+        ).to(torch.device(device))
+    except:
+        # skip google colab hugging face authentication problem
+        print("Google Colab Wants Huggingface Token 🤬")
+        diarization_model = PyannotePipeline.from_pretrained(
+            "fatymatariq/speaker-diarization-3.1"
+        ).to(torch.device(device))
+    return diarization_model
+
+
+class _PoolEntry:
+    def __init__(self, name, loader, device, exclusive):
+        self.name = name
+        self.loader = loader
+        self.device = device
+        self.model = None
+        self.refcount = 0
+        self.last_used = time.monotonic()
+        self.load_lock = threading.Lock()
+        # pyannote pipelines keep per-call state, so they are used one caller at a time
+        self.use_lock = threading.Lock() if exclusive else None
+
+
+class STTModelPool:
+    """
+    Warm STT models keyed by (kind, model_name, device, compute_type, cpu_threads).
+
+    Models load lazily on first checkout and stay resident between calls, so
+    back-to-back transcriptions (whisper_pyannote, WhisperDiarizationPipeline,
+    whisper_subtitle) skip the load. Checkout is thread-safe: a model loads once
+    even when several threads ask for it, whisper models are shared, pyannote is
+    handed to one caller at a time. A daemon thread unloads models idle for
+    longer than idle_timeout. When model_manager is importable every entry is
+    registered there too, so the dubbing side's budget can evict idle STT models.
+    """
+
+    def __init__(self, idle_timeout=STT_IDLE_TIMEOUT):
+        self.idle_timeout = idle_timeout
+        self.entries = {}
+        self.lock = threading.Lock()
+        self._reaper = None
+
+    # =========================
+    # CHECKOUT
+    # =========================
+    def _entry(self, key, loader, exclusive=False):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                name = "stt-" + "-".join(str(part) for part in key if part)
+                entry = _PoolEntry(name, loader, key[2], exclusive)
+                self.entries[key] = entry
+                if model_manager is not None:
+                    model_manager.register(
+                        name,
+                        loader=lambda key=key: self._load(key),
+                        unloader=lambda key=key: self._drop(key),
+                        is_loaded=lambda entry=entry: entry.model is not None,
+                        device=entry.device,
+                    )
+            self._start_reaper()
+            return entry
+
+    def _load(self, key):
+        entry = self.entries[key]
+        with entry.load_lock:
+            if entry.model is None:
+                print(f"🔁 Loading {entry.name} ...")
+                entry.model = entry.loader()
+            return entry.model
+
+    @contextmanager
+    def checkout(self, key, loader, exclusive=False):
+        entry = self._entry(key, loader, exclusive)
+        with self.lock:
+            entry.refcount += 1
+        try:
+            if model_manager is not None:
+                model = model_manager.acquire(entry.name)
+            else:
+                model = self._load(key)
+            try:
+                if entry.use_lock is not None:
+                    with entry.use_lock:
+                        yield model
+                else:
+                    yield model
+            finally:
+                if model_manager is not None:
+                    model_manager.release(entry.name)
+        finally:
+            with self.lock:
+                entry.refcount -= 1
+                entry.last_used = time.monotonic()
+
+    def whisper(self, model_name=DEFAULT_WHISPER_MODEL, device=None, compute_type=None, cpu_threads=0):
+        """
+        cpu_threads (CTranslate2 intra-op threads) is fixed at load time and is
+        not part of the key: one copy per model, the first load's setting wins.
+        """
+        device = device or default_device()
+        compute_type = compute_type or default_compute_type(device)
+        cpu_threads = cpu_threads if device == "cpu" else 0
+        key = ("whisper", model_name, device, compute_type, None)
+        return self.checkout(key, lambda: load_whisper(model_name, device, compute_type, cpu_threads))
+
+    def diarization(self, device=None):
+        device = device or default_device()
+        key = ("pyannote", "speaker-diarization-3.1", device, None, None)
+        return self.checkout(key, lambda: load_pyannote(device), exclusive=True)
+
+    # =========================
+    # EVICTION
+    # =========================
+    def _drop(self, key):
+        entry = self.entries.get(key)
+        if entry is not None and entry.model is not None:
+            entry.model = None
+            print(f"🧹 Unloaded {entry.name}")
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+
+    def evict(self, key):
+        """Unload one model if nobody has it checked out."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry.model is None or entry.refcount > 0:
+                return False
+        if model_manager is not None:
+            return model_manager.evict(entry.name)
+        self._drop(key)
+        return True
+
+    def evict_idle(self):
+        now = time.monotonic()
+        with self.lock:
+            idle = [
+                key for key, entry in self.entries.items()
+                if entry.model is not None and entry.refcount == 0
+                and now - entry.last_used > self.idle_timeout
+            ]
+        for key in idle:
+            self.evict(key)
+
+    def evict_all(self):
+        for key in list(self.entries):
+            self.evict(key)
+
+    def resident(self):
+        """{name: refcount} for loaded models."""
+        with self.lock:
+            return {e.name: e.refcount for e in self.entries.values() if e.model is not None}
+
+    def _start_reaper(self):
+        if self._reaper is not None or not self.idle_timeout or self.idle_timeout <= 0:
+            return
+
+        def reap():
+            while True:
+                time.sleep(min(60.0, self.idle_timeout / 2))
+                try:
+                    self.evict_idle()
+                except Exception as e:
+                    print(f"⚠️ STT idle eviction failed: {e}")
+
+        self._reaper = threading.Thread(target=reap, name="stt-pool-reaper", daemon=True)
+        self._reaper.start()
+
+
+def whisper_transcribe(whisper_model, audio, batch_size=0, **options):
+    """
+    WhisperModel.transcribe, or with batch_size > 0 faster-whisper's
+    BatchedInferencePipeline: the audio is cut into VAD speech chunks that are
+    decoded batch_size at a time (word timestamps kept) and stitched back in
+    time order. Options the batched transcribe doesn't accept are dropped.
+    Returns (list_of_segments, info).
+    """
+    if batch_size and batch_size > 0:
+        try:
+            from faster_whisper import BatchedInferencePipeline
+        except ImportError:
+            print("⚠️ faster-whisper has no BatchedInferencePipeline, transcribing sequentially")
+        else:
+            pipeline = BatchedInferencePipeline(model=whisper_model)
+            accepted = inspect.signature(pipeline.transcribe).parameters
+            options = {k: v for k, v in options.items() if k in accepted}
+            segments, info = pipeline.transcribe(audio, batch_size=batch_size, **options)
+            return sorted(segments, key=lambda s: s.start), info
+    segments, info = whisper_model.transcribe(audio, **options)
+    return list(segments), info
+
+
+def cpu_thread_split(device=None, whisper_threads=None, diarization_threads=None):
+    """
+    (whisper_threads, diarization_threads) for running both stages at once.
+    On CPU the cores are split (STT_WHISPER_THREADS / STT_DIARIZATION_THREADS
+    override) so CTranslate2 and torch don't oversubscribe; on GPU both are 0
+    (library defaults).
+    """
+    if (device or default_device()) != "cpu":
+        return whisper_threads or 0, diarization_threads or 0
+    cores = os.cpu_count() or 2
+    if whisper_threads is None:
+        whisper_threads = int(os.getenv("STT_WHISPER_THREADS", "0")) or max(1, cores // 2)
+    if diarization_threads is None:
+        diarization_threads = int(os.getenv("STT_DIARIZATION_THREADS", "0")) or max(1, cores - whisper_threads)
+    return whisper_threads, diarization_threads
+
+
+def run_concurrently(transcribe, diarize, diarization_threads=0):
+    """
+    transcribe() and diarize() at the same time, each on its own single-worker
+    pool; returns (transcription_result, diarization_result). torch's intra-op
+    thread count is capped at diarization_threads while diarize() runs
+    (CTranslate2 has its own pool, sized when the whisper model is loaded).
+    """
+    def diarize_limited():
+        previous = torch.get_num_threads()
+        if diarization_threads:
+            torch.set_num_threads(diarization_threads)
+        try:
+            return diarize()
+        finally:
+            if diarization_threads:
+                torch.set_num_threads(previous)
+
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-transcribe") as transcribe_pool, \
+         ThreadPoolExecutor(max_workers=1, thread_name_prefix="stt-diarize") as diarize_pool:
+        transcription = transcribe_pool.submit(transcribe)
+        diarization = diarize_pool.submit(diarize_limited)
+        return transcription.result(), diarization.result()
+
+
+# STT is imported both as top-level modules (sys.path has ./STT) and as the
+# STT package (from STT.subtitle import ...); share one pool between the two.
+_twin = sys.modules.get("STT.stt_pool" if __name__ == "stt_pool" else "stt_pool")
+stt_pool = getattr(_twin, "stt_pool", None) or STTModelPool()
+
+# from stt_pool import stt_pool
+# with stt_pool.whisper() as whisper_model:
+#     segments, info = whisper_model.transcribe("audio.wav", word_timestamps=True)
+#     segments = list(segments)
@@ -28,8 +28,14 @@ import urllib.error
 import torch
 import pysrt
 from tqdm.auto import tqdm
-from faster_whisper import WhisperModel
-from deep_translator import GoogleTranslator
+try:
+    from stt_pool import stt_pool
+except ImportError:
+    from STT.stt_pool import stt_pool
+try:
+    from translation import get_translator
+except ImportError:
+    from STT.translation import get_translator
 
 
 # ==============================================================================
@@ -205,42 +211,27 @@ def whisper_subtitle(uploaded_file, source_language):
     Main transcription function. Loads the model, transcribes the audio,
     and generates subtitle files.
     """
-    # 1. Configure device and model
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    compute_type = "float16" if torch.cuda.is_available() else "int8"
-    # try:
-    #     model = WhisperModel("deepdml/faster-whisper-large-v3-turbo-ct2",device=device, compute_type=compute_type)
-    # except:
-    # print("💀 Avoid Google Colab HF_TOKEN not found error")
-    model_dir = download_model(
-        "deepdml/faster-whisper-large-v3-turbo-ct2",
-        download_folder="./",
-        redownload=False
-    )
-    model = WhisperModel(model_dir, device=device, compute_type=compute_type)
-
+    # 1. Warm model from the shared STT pool (loaded once per process)
     # 2. Process audio file
     # audio_file_path = get_audio_file(uploaded_file)
     audio_file_path=uploaded_file
     # 3. Transcribe
     detected_language = source_language
-    if source_language == "Automatic":
-        segments, info = model.transcribe(audio_file_path, word_timestamps=True)
-        detected_lang_code = info.language
-        detected_language = get_language_name(detected_lang_code)
-    else:
-        lang_code = LANGUAGE_CODE[source_language]
-        segments, _ = model.transcribe(audio_file_path, word_timestamps=True, language=lang_code)
+    with stt_pool.whisper("deepdml/faster-whisper-large-v3-turbo-ct2") as model:
+        if source_language == "Automatic":
+            segments, info = model.transcribe(audio_file_path, word_timestamps=True)
+            detected_lang_code = info.language
+            detected_language = get_language_name(detected_lang_code)
+        else:
+            lang_code = LANGUAGE_CODE[source_language]
+            segments, _ = model.transcribe(audio_file_path, word_timestamps=True, language=lang_code)
 
-    sentence_timestamps, word_timestamps, transcript_text = format_segments(segments)
+        # segments is a generator: consume it while the model is checked out
+        sentence_timestamps, word_timestamps, transcript_text = format_segments(segments)
 
     # 4. Cleanup
     # if os.path.exists(audio_file_path):
     #     os.remove(audio_file_path)
-    del model
-    gc.collect()
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
 
     # 5. Prepare output file paths
     base_filename = os.path.splitext(os.path.basename(uploaded_file))[0][:30]
@@ -509,24 +500,29 @@ def generate_srt_from_sentences(sentence_timestamp, srt_path="default_subtitle.s
 # --- 6. TRANSLATION UTILITIES
 # ==============================================================================
 
-def translate_text(text, source_language, destination_language):
-    """Translates a single block of text using GoogleTranslator."""
+def translation_codes(source_language, destination_language):
+    """Google-style (source, target) codes for two language names."""
     source_code = LANGUAGE_CODE[source_language]
     target_code = LANGUAGE_CODE[destination_language]
     if destination_language == "Chinese":
         target_code = 'zh-CN'
+    return source_code, target_code
 
-    translator = GoogleTranslator(source=source_code, target=target_code)
-    return str(translator.translate(text.strip()))
+def translate_text(text, source_language, destination_language):
+    """Translates a single block of text with the configured translation backend."""
+    source_code, target_code = translation_codes(source_language, destination_language)
+    return get_translator().translate_text(text, source_code, target_code, strict=True)
 
 def translate_subtitle(subtitles, source_language, destination_language):
-    """Translates the text content of a pysrt Subtitle object."""
-    translated_text_dump = ""
-    for sub in subtitles:
-        translated_text = translate_text(sub.text, source_language, destination_language)
+    """Translates the text content of a pysrt Subtitle object (all lines in batched requests)."""
+    source_code, target_code = translation_codes(source_language, destination_language)
+    translations = get_translator().translate_lines(
+        [sub.text for sub in subtitles], source_code, target_code, strict=True
+    )
+    for sub, translated_text in zip(subtitles, translations):
         sub.text = translated_text
-        translated_text_dump += translated_text.strip() + " "
-    return subtitles, translated_text_dump.strip()
+    translated_text_dump = " ".join(t.strip() for t in translations if t.strip())
+    return subtitles, translated_text_dump
 
 
 # ==============================================================================
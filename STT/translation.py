@@ -0,0 +1,270 @@
+"""Batched, cached line translation behind a pluggable backend."""
+# %cd /content/Video-Dubbing/STT
+import os
+import re
+import sys
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Which backend get_translator() builds ("google", "local" or anything added with register_backend)
+TRANSLATION_BACKEND = os.getenv("TRANSLATION_BACKEND", "google")
+# Batches in flight at once
+TRANSLATION_WORKERS = int(os.getenv("TRANSLATION_WORKERS", "4"))
+# Translation memory file ("" disables it)
+TRANSLATION_MEMORY = os.getenv("TRANSLATION_MEMORY", "./translation_memory.sqlite")
+
+
+def normalize_text(text):
+    return re.sub(r"\s+", " ", str(text)).strip()
+
+
+# =========================
+# BACKENDS
+# =========================
+class TranslationBackend:
+    """
+    A backend translates a list of lines in one request. Translator packs the
+    lines so a batch never exceeds max_batch_chars / max_batch_lines, and calls
+    translate_batch from several threads at once, so it must be thread-safe.
+    source_code is None for auto-detect. A None in the returned list marks a
+    line the backend couldn't translate (it isn't stored in memory).
+    """
+    name = "base"
+    max_batch_chars = 4500
+    max_batch_lines = 100
+
+    def translate_batch(self, texts, source_code, target_code):
+        raise NotImplementedError
+
+
+class GoogleBackend(TranslationBackend):
+    """
+    deep_translator's GoogleTranslator (5000 chars per request). A batch goes
+    out as one newline-joined request; if the reply doesn't come back with the
+    same number of lines, that batch is retried one line per request.
+    """
+    name = "google"
+    max_batch_chars = 4500
+
+    def _translator(self, source_code, target_code):
+        from deep_translator import GoogleTranslator
+        if source_code is None:
+            return GoogleTranslator(target=target_code)
+        return GoogleTranslator(source=source_code, target=target_code)
+
+    def translate_batch(self, texts, source_code, target_code):
+        translator = self._translator(source_code, target_code)
+        if len(texts) > 1:
+            joined = str(translator.translate("\n".join(texts)) or "")
+            lines = joined.split("\n")
+            if len(lines) == len(texts):
+                return [line.strip() for line in lines]
+            print(f"⚠️ Batch came back with {len(lines)} lines for {len(texts)}, retrying line by line")
+        return [str(translator.translate(text) or "").strip() for text in texts]
+
+
+class LocalBackend(TranslationBackend):
+    """Offline stand-in for tests: returns each line unchanged, or tagged with the target code."""
+    name = "local"
+
+    def __init__(self, tag=False):
+        self.tag = tag
+        self.calls = 0
+
+    def translate_batch(self, texts, source_code, target_code):
+        self.calls += 1
+        if self.tag:
+            return [f"[{target_code}] {text}" for text in texts]
+        return list(texts)
+
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "local": LocalBackend,
+}
+
+
+def register_backend(name, backend_class):
+    BACKENDS[name] = backend_class
+
+
+# =========================
+# TRANSLATION MEMORY
+# =========================
+class TranslationMemory:
+    """
+    Persistent (source text, language pair, backend) -> translation store in
+    SQLite, shared across runs, so lines repeated across episodes are
+    translated once. Source text is whitespace-normalized before hashing.
+    """
+
+    def __init__(self, path=TRANSLATION_MEMORY):
+        self.path = path
+        self.lock = threading.Lock()
+        folder = os.path.dirname(os.path.abspath(path))
+        os.makedirs(folder, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS memory ("
+            "key TEXT PRIMARY KEY, backend TEXT, source TEXT, target TEXT, "
+            "text TEXT, translation TEXT)"
+        )
+        self.db.commit()
+
+    @staticmethod
+    def key(text, source_code, target_code, backend):
+        raw = "\x1f".join([backend, source_code or "auto", target_code, normalize_text(text)])
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def get_many(self, texts, source_code, target_code, backend):
+        """{text: translation} for the texts already in memory."""
+        keys = {self.key(t, source_code, target_code, backend): t for t in texts}
+        found = {}
+        with self.lock:
+            items = list(keys)
+            for i in range(0, len(items), 500):  # SQLite caps host parameters per query
+                chunk = items[i:i + 500]
+                rows = self.db.execute(
+                    f"SELECT key, translation FROM memory WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ).fetchall()
+                for key, translation in rows:
+                    found[keys[key]] = translation
+        return found
+
+    def put_many(self, pairs, source_code, target_code, backend):
+        rows = [
+            (self.key(text, source_code, target_code, backend), backend,
+             source_code or "auto", target_code, normalize_text(text), translation)
+            for text, translation in pairs
+        ]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO memory VALUES (?, ?, ?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    def __len__(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+
+
+# =========================
+# TRANSLATOR
+# =========================
+def pack_batches(texts, max_chars, max_lines):
+    """Consecutive groups of texts, each within max_chars (newline-joined) and max_lines."""
+    batches, batch, size = [], [], 0
+    for text in texts:
+        extra = len(text) + (1 if batch else 0)
+        if batch and (size + extra > max_chars or len(batch) >= max_lines):
+            batches.append(batch)
+            batch, size, extra = [], 0, len(text)
+        batch.append(text)
+        size += extra
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class Translator:
+    """
+    translate_lines(texts, ...) returns the translations in input order.
+    Blank lines stay blank, duplicates and lines already in the translation
+    memory are not sent, the rest go out in size-limited batches with at most
+    max_workers requests in flight.
+    """
+
+    def __init__(self, backend=None, memory=None, max_workers=TRANSLATION_WORKERS):
+        self.backend = backend or GoogleBackend()
+        self.memory = memory
+        self.max_workers = max(1, max_workers)
+
+    def _translate_batch(self, batch, source_code, target_code, strict):
+        try:
+            translations = self.backend.translate_batch(batch, source_code, target_code)
+            if len(translations) != len(batch):
+                raise ValueError(f"{self.backend.name} returned {len(translations)} lines for {len(batch)}")
+            return list(zip(batch, translations))
+        except Exception as e:
+            if strict:
+                raise
+            print(f"Translation failed: {e}")
+            return [(text, None) for text in batch]
+
+    def translate_lines(self, texts, source_code, target_code, strict=False):
+        """
+        texts: list of str. Failed lines come back as "" (strict=True raises
+        instead) and are not stored in memory.
+        """
+        clean = [normalize_text(t) for t in texts]
+        unique = list(dict.fromkeys(t for t in clean if t))
+        backend = self.backend.name
+
+        done = self.memory.get_many(unique, source_code, target_code, backend) if self.memory is not None else {}
+        todo = [t for t in unique if t not in done]
+        if todo:
+            batches = pack_batches(todo, self.backend.max_batch_chars, self.backend.max_batch_lines)
+            print(f"🌐 Translating {len(todo)} lines in {len(batches)} batches "
+                  f"({len(done)} from translation memory)")
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as pool:
+                results = pool.map(
+                    lambda batch: self._translate_batch(batch, source_code, target_code, strict),
+                    batches,
+                )
+                translated = [pair for batch_result in results for pair in batch_result]
+            fresh = [(text, tr) for text, tr in translated if tr is not None]
+            if self.memory is not None and fresh:
+                # re-read: a backend's name can pin down which model it loaded only after running
+                self.memory.put_many(fresh, source_code, target_code, self.backend.name)
+            done.update(fresh)
+        return [done.get(t, "") if t else "" for t in clean]
+
+    def translate_text(self, text, source_code, target_code, strict=False):
+        return self.translate_lines([text], source_code, target_code, strict=strict)[0]
+
+
+def translation_memory(memory_path=None):
+    """Process-wide TranslationMemory per file (one SQLite connection each), None if disabled."""
+    memory_path = TRANSLATION_MEMORY if memory_path is None else memory_path
+    if not memory_path:
+        return None
+    key = os.path.abspath(memory_path)
+    with _translators_lock:
+        if key not in _memories:
+            _memories[key] = TranslationMemory(memory_path)
+        return _memories[key]
+
+
+def get_translator(backend=None, memory_path=None, max_workers=TRANSLATION_WORKERS):
+    """
+    Process-wide Translator per (backend, memory file). backend is a name in
+    BACKENDS or a TranslationBackend instance (the Translator is not cached,
+    but it shares the memory's connection with every other translator).
+    """
+    backend = backend or TRANSLATION_BACKEND
+    if not isinstance(backend, str):  # an instance (possibly from the twin module's classes)
+        return Translator(backend, translation_memory(memory_path), max_workers=max_workers)
+    key = (backend, TRANSLATION_MEMORY if memory_path is None else memory_path)
+    memory = translation_memory(memory_path)
+    with _translators_lock:
+        if key not in _translators:
+            _translators[key] = Translator(BACKENDS[backend](), memory, max_workers=max_workers)
+        return _translators[key]
+
+
+# STT is imported both as top-level modules (sys.path has ./STT) and as the
+# STT package; share one set of translators (and SQLite handles) between the two.
+_twin = sys.modules.get("STT.translation" if __name__ == "translation" else "translation")
+_translators = getattr(_twin, "_translators", None)
+_translators = {} if _translators is None else _translators
+_memories = getattr(_twin, "_memories", None)
+_memories = {} if _memories is None else _memories
+_translators_lock = getattr(_twin, "_translators_lock", None) or threading.Lock()
+
+# from translation import get_translator, LocalBackend
+# translator = get_translator()                      # TRANSLATION_BACKEND, default google
+# lines = translator.translate_lines(["Hello", "How are you?"], "en", "hi")
+# offline = get_translator(LocalBackend(tag=True), memory_path="")
+# print(offline.translate_lines(["Hello"], None, "hi"))   # ['[hi] Hello']
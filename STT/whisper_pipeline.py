@@ -2,16 +2,19 @@
 import os
 from pydub import AudioSegment
 import subprocess
-from hf_downloader import download_model
-from pyannote.audio import Pipeline as PyannotePipeline
-from faster_whisper import WhisperModel
+from stt_pool import (stt_pool, load_whisper, load_pyannote, cpu_thread_split, run_concurrently,
+                      whisper_transcribe, STT_CONCURRENT, STT_BATCH_SIZE, STT_BEAM_SIZE)
 import torch
 import gc
-import pandas as pd
 import numpy as np
 import re 
 import torchaudio
 from small_segment import segment_split
+from speaker_assign import assign_speakers
+try:
+  from separation_store import separation_store
+except ImportError:
+  separation_store = None
 
 def convert_to_mono(media_file):
     # Extract folder, base name, and extension
@@ -95,46 +98,25 @@ def get_language_name(code):
             return name
     return None
 
+def load_whisper_model(model_name="deepdml/faster-whisper-large-v3-turbo-ct2"):
+  return load_whisper(model_name)
+
+
+def load_diarization_model():
+  return load_pyannote()
+
+
 def load_model(model_name="deepdml/faster-whisper-large-v3-turbo-ct2"):
-  whisper_model, diarization_model=None,None
-  device = "cuda" if torch.cuda.is_available() else "cpu"
-  compute_type = "float16" if torch.cuda.is_available() else "int8"
-  if model_name=="deepdml/faster-whisper-large-v3-turbo-ct2":
-    model_dir = download_model(
-                "deepdml/faster-whisper-large-v3-turbo-ct2",
-                download_folder="./",
-                redownload=False)
-    whisper_model = WhisperModel(
-                model_dir,
-                device=device,
-                compute_type=compute_type)
-  else:
-    whisper_model = WhisperModel(
-                  model_name,
-                  device=device,
-                  compute_type=compute_type,
-              )
-  token = os.getenv("HF_AUTH_TOKEN", "TOKEN_HERE")
-  try:
-    diarization_model = PyannotePipeline.from_pretrained(
-              "pyannote/speaker-diarization-3.1",
-              use_auth_token=token,
-          ).to(torch.device(device))
-  except:
-    # skip google colab hugging face authentication problem
-    print("Google Colab Wants Huggingface Token 🤬")
-    diarization_model = PyannotePipeline.from_pretrained(
-              "fatymatariq/speaker-diarization-3.1"
-          ).to(torch.device(device))
-  return whisper_model, diarization_model
-
-
-def transcribe_audio(whisper_model,mono_audio, language="English"):
+  return load_whisper_model(model_name), load_diarization_model()
+
+
+def transcribe_audio(whisper_model,mono_audio, language="English", batch_size=STT_BATCH_SIZE, beam_size=STT_BEAM_SIZE):
   lang_code = LANGUAGE_CODE.get(language, None)
-  segments,whisper_info  = whisper_model.transcribe(mono_audio, word_timestamps=True, language=lang_code)
+  # batch_size > 0: VAD chunks decoded in parallel batches (much faster on long media)
+  segments,whisper_info  = whisper_transcribe(whisper_model, mono_audio, batch_size=batch_size,
+                                              word_timestamps=True, language=lang_code, beam_size=beam_size)
   # predicted_lang=get_language_name(whisper_info.language)
   predicted_lang=whisper_info.language
-  segments = list(segments)
   segments = [
             {
                 "avg_logprob": s.avg_logprob,
@@ -171,19 +153,6 @@ def speaker_diarization(diarization_model,mono_audio,num_speakers=None):
   detected_num_speakers = len(unique_speakers)
   return diarize_segments, detected_num_speakers
 
-def _assign_speaker_to_segment_or_word(segment_or_word, diarize_df, fallback_speaker=None):
-    """Calculates the intersection of times."""
-    diarize_df["intersection"] = np.minimum(
-        diarize_df["end"], segment_or_word["end"]
-    ) - np.maximum(diarize_df["start"], segment_or_word["start"])
-    dia_tmp = diarize_df[diarize_df["intersection"] > 0]
-
-    if len(dia_tmp) > 0:
-        speaker = dia_tmp.groupby("speaker")["intersection"].sum().sort_values(ascending=False).index[0]
-    else:
-        speaker = fallback_speaker or "UNKNOWN"
-    return speaker
-
 def _group_segments(segments):
     if not segments:
         return []
@@ -215,27 +184,18 @@ def _group_segments(segments):
 
 
 def _merge_segments_with_diarization(segments, diarize_segments):
-    diarize_df = pd.DataFrame(diarize_segments)
+    # Segment and word speakers for the whole transcript in one vectorized pass
+    segment_speakers = assign_speakers(segments, diarize_segments)
     final_segments = []
 
-    for segment in segments:
-        # Segment speaker
-        speaker = _assign_speaker_to_segment_or_word(segment, diarize_df)
-
-        # Word-level speakers
-        words_with_speakers = []
-        for word in segment["words"]:
-            word_speaker = _assign_speaker_to_segment_or_word(word, diarize_df, fallback_speaker=speaker)
-            word["speaker"] = word_speaker
-            words_with_speakers.append(word)
-
+    for segment, speaker in zip(segments, segment_speakers):
         new_segment = {
             "start": segment["start"],
             "end": segment["end"],
             "text": segment["text"],
             "speaker": speaker,
             "avg_logprob": segment["avg_logprob"],
-            "words": words_with_speakers,
+            "words": list(segment["words"]),
         }
         final_segments.append(new_segment)
 
@@ -287,7 +247,11 @@ def vocal_music_split(media_file,mono_audio):
   name_only = os.path.splitext(os.path.basename(media_file))[0]
   vocal_path=f"{separate_folder}/{name_only}_vocal.wav"
   music_path=f"{separate_folder}/{name_only}_music.wav"
-  demucs_vocal,demucs_music=demucs_separate_vocal_music(mono_audio)
+  if separation_store is not None:
+    # keyed by the original media, so speaker extraction / restore_music reuse these stems
+    demucs_vocal,demucs_music=separation_store.get_stems(mono_audio, source=media_file)
+  else:
+    demucs_vocal,demucs_music=demucs_separate_vocal_music(mono_audio)
   shutil.copy(demucs_vocal,vocal_path)
   if demucs_music is not None:
     shutil.copy(demucs_music,music_path)
@@ -297,12 +261,28 @@ def vocal_music_split(media_file,mono_audio):
 
 
 
-def whisper_pyannote(mono_audio,language_name,number_of_speakers=None,make_small_segments=True,model_name="deepdml/faster-whisper-large-v3-turbo-ct2"):
+def whisper_pyannote(mono_audio,language_name,number_of_speakers=None,make_small_segments=True,model_name="deepdml/faster-whisper-large-v3-turbo-ct2",concurrent=STT_CONCURRENT,batch_size=STT_BATCH_SIZE,beam_size=STT_BEAM_SIZE):
   if number_of_speakers==0:
       number_of_speakers=None
-  whisper_model, diarization_model=load_model(model_name="deepdml/faster-whisper-large-v3-turbo-ct2")
-  segments,predicted_lang=transcribe_audio(whisper_model,mono_audio, language=language_name)
-  diarize_segments, detected_num_speakers=speaker_diarization(diarization_model,mono_audio,num_speakers=number_of_speakers)
+  # Warm models from the process-wide pool: no load/delete per transcription.
+  # Both stages only need the mono audio, so by default they run at the same time
+  # with the CPU cores split between them.
+  whisper_threads, diarization_threads = cpu_thread_split() if concurrent else (0, 0)
+
+  def transcribe():
+    with stt_pool.whisper(model_name, cpu_threads=whisper_threads) as whisper_model:
+      return transcribe_audio(whisper_model,mono_audio, language=language_name, batch_size=batch_size, beam_size=beam_size)
+
+  def diarize():
+    with stt_pool.diarization() as diarization_model:
+      return speaker_diarization(diarization_model,mono_audio,num_speakers=number_of_speakers)
+
+  if concurrent:
+    (segments,predicted_lang), (diarize_segments, detected_num_speakers) = run_concurrently(
+        transcribe, diarize, diarization_threads=diarization_threads)
+  else:
+    segments,predicted_lang=transcribe()
+    diarize_segments, detected_num_speakers=diarize()
   final_segments=_merge_segments_with_diarization(segments, diarize_segments)
   if make_small_segments:
       lang_code=LANGUAGE_CODE[language_name]
@@ -317,22 +297,20 @@ def whisper_pyannote(mono_audio,language_name,number_of_speakers=None,make_small
       final_segments=segments
       
   result={'segments':final_segments, 'language':predicted_lang, 'num_speakers':detected_num_speakers}
-  del whisper_model
-  del diarization_model
   gc.collect()
   if torch.cuda.is_available():
       torch.cuda.empty_cache()
   return result
 
-def get_transcript(media_file,language_name=None,number_of_speakers=None,remove_music=True,make_small_segments=True,model_name="deepdml/faster-whisper-large-v3-turbo-ct2"):
+def get_transcript(media_file,language_name=None,number_of_speakers=None,remove_music=True,make_small_segments=True,model_name="deepdml/faster-whisper-large-v3-turbo-ct2",concurrent=STT_CONCURRENT,batch_size=STT_BATCH_SIZE,beam_size=STT_BEAM_SIZE):
   mono_audio=convert_to_mono(media_file)
   used_audio_file=mono_audio
   if remove_music:
     vocal_path,music_path=vocal_music_split(media_file,mono_audio)
     used_audio_file=vocal_path
-    result=whisper_pyannote(vocal_path,language_name,number_of_speakers,make_small_segments,model_name)
+    result=whisper_pyannote(vocal_path,language_name,number_of_speakers,make_small_segments,model_name,concurrent,batch_size,beam_size)
   else:
-    result=whisper_pyannote(mono_audio,language_name,number_of_speakers,make_small_segments,model_name)
+    result=whisper_pyannote(mono_audio,language_name,number_of_speakers,make_small_segments,model_name,concurrent,batch_size,beam_size)
   return result,used_audio_file
 
 # from whisper_pipeline import get_transcript
@@ -2,13 +2,25 @@ import os
 import shutil
 import subprocess
 import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import librosa
 import soundfile as sf
 from pydub import AudioSegment
 from pydub.silence import split_on_silence
+from time_stretch import time_stretch
 
 TARGET_SR = 48000  # 48 kHz
 
+# Worker threads for segment processing (None → cores - 1, 1 → sequential)
+AUDIO_SYNC_WORKERS = int(os.getenv("AUDIO_SYNC_WORKERS", "0")) or None
+
+
+def default_sync_workers():
+    return max(1, (os.cpu_count() or 2) - 1)
+
 # --- Helper functions 
 def atempo_chain(factor):
     if 0.5 <= factor <= 2.0:
@@ -26,22 +38,21 @@ def atempo_chain(factor):
 def change_speed(input_file, output_file, speedup_factor):
     # print(f"{input_file} {speedup_factor}")
     try:
-        command = [
-            "ffmpeg", "-i", input_file,
-            "-filter:a", atempo_chain(speedup_factor),
-            "-ar", str(TARGET_SR),
-            output_file, "-y"
-        ]
-        # print(" ".join(command))
-        subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        y, sr = librosa.load(input_file, sr=TARGET_SR)
+        y_stretched = time_stretch(y, rate=speedup_factor, sr=TARGET_SR)
+        sf.write(output_file, y_stretched, TARGET_SR, subtype="PCM_16")
     except Exception as e:
-        # print(f"⚠️ FFmpeg speedup error: {e}. Falling back to Librosa.")
+        # print(f"⚠️ In-process time stretch error: {e}. Falling back to FFmpeg.")
         try:
-            y, sr = librosa.load(input_file, sr=TARGET_SR)
-            y_stretched = librosa.effects.time_stretch(y, rate=speedup_factor)
-            sf.write(output_file, y_stretched, TARGET_SR)
-        except Exception as e_librosa:
-            # print(f"⚠️ Librosa speedup failed: {e_librosa}. Copying original file.")
+            command = [
+                "ffmpeg", "-i", input_file,
+                "-filter:a", atempo_chain(speedup_factor),
+                "-ar", str(TARGET_SR),
+                output_file, "-y"
+            ]
+            subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except Exception as e_ffmpeg:
+            # print(f"⚠️ FFmpeg speedup failed: {e_ffmpeg}. Copying original file.")
             shutil.copy(input_file, output_file)
 
 def remove_edge_silence(input_path, output_path, top_db=30):
@@ -71,107 +82,200 @@ def make_silence(duration_sec, path):
 
 
 # --- Core Algorithm
-def dubbing_algorithm(segments_data, final_audio_save_path):
-    """
-    Processes and stitches TTS segments using a file-based approach to conserve memory.
-    """
-    temp_dir = "processed_segments"
+MIN_SPEED = 0.8  # <-- minimum playback speed limit
+MAX_SPEED = 4  # <-- Skip tts with silence
+
+
+def prepare_temp_dir(temp_dir="processed_segments"):
     if os.path.exists(temp_dir):
         shutil.rmtree(temp_dir)
     os.makedirs(temp_dir, exist_ok=True)
+    return temp_dir
 
-    processed_file_paths = []
-    sorted_segments = sorted(segments_data.values(), key=lambda x: x['start'])
 
-    MIN_SPEED = 0.8  # <-- minimum playback speed limit
-    MAX_SPEED=4 # <-- Skip tts with silence 
-    for i, segment in enumerate(sorted_segments):
-        tts_path = segment['tts_path']
-        actual_duration = segment['actual_duration']
-        starting_silence_s = segment['starting_silence']
+def nonsilent_ranges(pcm, min_silence_len=100, silence_thresh=-45, keep_silence=50, sr=TARGET_SR):
+    """
+    [start_ms, end_ms] of the chunks pydub's split_on_silence would return for
+    an int16 array (same rules: rms of every min_silence_len window, one per
+    ms; touching silent windows merge; keep_silence padding split halfway
+    where chunks overlap), computed with a cumulative sum instead of a
+    Python loop over 1 ms slices, so it runs without holding the GIL.
+    """
+    per_ms = sr // 1000
+    length = int(round(len(pcm) / per_ms))
+    ranges = [[0, length]]
+    if length >= min_silence_len:
+        starts = np.arange(length - min_silence_len + 1)
+        energy = np.concatenate([[0.0], np.cumsum(np.square(pcm.astype(np.float64)))])
+        lo = np.minimum(starts * per_ms, len(pcm))
+        hi = np.minimum((starts + min_silence_len) * per_ms, len(pcm))
+        # a window past the last sample is zero-padded to full length, as pydub does
+        rms = np.floor(np.sqrt((energy[hi] - energy[lo]) / (min_silence_len * per_ms)))
+        silent = np.flatnonzero(rms <= 10 ** (silence_thresh / 20) * 32768)
+        if len(silent):
+            breaks = np.flatnonzero(np.diff(silent) > min_silence_len)
+            silent_starts = silent[np.concatenate([[0], breaks + 1])]
+            silent_ends = silent[np.concatenate([breaks, [len(silent) - 1]])] + min_silence_len
+            if silent_starts[0] == 0 and silent_ends[0] == length:
+                return []
+            ranges, prev_end = [], 0
+            for silent_start, silent_end in zip(silent_starts.tolist(), silent_ends.tolist()):
+                ranges.append([prev_end, silent_start])
+                prev_end = silent_end
+            if prev_end != length:
+                ranges.append([prev_end, length])
+            if ranges[0] == [0, 0]:
+                ranges.pop(0)
+
+    ranges = [[start - keep_silence, end + keep_silence] for start, end in ranges]
+    for current, following in zip(ranges, ranges[1:]):
+        if following[0] < current[1]:
+            current[1] = following[0] = (current[1] + following[0]) // 2
+    return [[max(start, 0), min(end, length)] for start, end in ranges]
 
-        if not os.path.exists(tts_path):
-            # print(f"⚠️ WARNING: TTS file not found for segment {i+1}: {tts_path}. Skipping.")
-            continue
 
-        if actual_duration <= 0.1:
-            # print(f"⚠️ WARNING: Segment {i+1} has near-zero duration ({actual_duration}s). Skipping.")
+def reduce_internal_silence_array(y, min_silence_duration_ms=100, silence_reduction_ms=50):
+    """In-memory reduce_internal_silence for a float32 mono array at TARGET_SR."""
+    pcm = (np.clip(y, -1.0, 1.0) * 32767).astype(np.int16)
+    per_ms = TARGET_SR // 1000
+    chunks = [
+        pcm[start * per_ms:end * per_ms]
+        for start, end in nonsilent_ranges(pcm, min_silence_duration_ms, -45, silence_reduction_ms)
+    ]
+    if not chunks:
+        return y
+    return np.concatenate(chunks).astype(np.float32) / 32768.0
+
+
+def process_segment(i, segment, temp_dir="processed_segments"):
+    """
+    Trim / compress / time-stretch one TTS segment (Stages 1–4) in memory.
+    segment['tts_audio'] = (array, sr) skips reading tts_path.
+    Returns (paths, placement): the wav files this segment contributes to the
+    final concat, in order (empty → skipped), and where its speech sits inside
+    them — {"samples": total, "speech": (first, last) sample or None if silenced}.
+    """
+    tts_path = segment['tts_path']
+    actual_duration = segment['actual_duration']
+    starting_silence_s = segment['starting_silence']
+
+    if not os.path.exists(tts_path):
+        # print(f"⚠️ WARNING: TTS file not found for segment {i+1}: {tts_path}. Skipping.")
+        return [], None
+
+    if actual_duration <= 0.1:
+        # print(f"⚠️ WARNING: Segment {i+1} has near-zero duration ({actual_duration}s). Skipping.")
+        return [], None
+
+    # --- Stage 1–3: Process segment ---
+    final_timed_path = os.path.join(temp_dir, f"{i+1}_timed.wav")
+
+    # Step 1: Trim edge silence
+    if segment.get('tts_audio') is not None:
+        # Already decoded in memory by the TTS backend (e.g. Edge TTS): (array, sr)
+        audio, sr = segment['tts_audio']
+        y = librosa.resample(audio, orig_sr=sr, target_sr=TARGET_SR) if sr != TARGET_SR else audio.copy()
+    else:
+        y, _ = librosa.load(tts_path, sr=TARGET_SR)
+    y, _ = librosa.effects.trim(y, top_db=30)
+    current_duration = len(y) / TARGET_SR
+
+    # Step 2: Natural Compression
+    if current_duration > actual_duration:
+        y = reduce_internal_silence_array(y)
+        current_duration = len(y) / TARGET_SR
+
+    # Step 3: Forced Synchronization with min 0.5x cap
+    speedup_factor = current_duration / actual_duration
+    capped = False
+
+    if speedup_factor < MIN_SPEED:
+        # print(f"⚠️ Segment {i+1}: Capping slow-down {speedup_factor:.2f}x → {MIN_SPEED:.2f}x")
+        capped = True
+        speedup_factor = MIN_SPEED
+
+    #skip small duration but speed up
+    small_max_speed = 2.5   # only for very short segments
+    SMALL_DURATION = 1.3   # seconds
+    target_samples = int(round(actual_duration * TARGET_SR))
+    has_speech = True
+    if speedup_factor > small_max_speed and actual_duration <= SMALL_DURATION:
+       # print(f"⚠️ Skipping segment {i+1}: required speed {speedup_factor:.2f}× exceeds short-segment limit ({small_max_speed:.2f}×). Silence inserted.")
+       y = np.zeros(target_samples, dtype=np.float32)
+       has_speech = False
+    # Too aggressive → skip speech
+    elif speedup_factor > MAX_SPEED:
+       # print(f"⚠️ Skipping segment {i+1}: required speed {speedup_factor:.2f}× exceeds safe limit ({MAX_SPEED:.2f}×). Silence inserted.")
+       y = np.zeros(target_samples, dtype=np.float32)
+       has_speech = False
+    # Normal Speed Up (exact-length mode: lands on the slot to the sample)
+    elif abs(speedup_factor - 1.0) > 0.01:
+       stretched_samples = int(round(len(y) / speedup_factor)) if capped else target_samples
+       y = time_stretch(y, target_length=stretched_samples, sr=TARGET_SR)
+
+    # --- Handle padding if capped slow-down ---
+    if capped:
+        speech = (0, len(y))
+        silence_gap = target_samples - len(y)
+        if silence_gap > 0.01 * TARGET_SR:
+            y = np.concatenate([y, np.zeros(silence_gap, dtype=np.float32)])
+        sf.write(final_timed_path, y, TARGET_SR, subtype="PCM_16")
+        return [final_timed_path], {"samples": len(y), "speech": speech}
+
+    # --- Stage 4: Prepend silence if needed ---
+    lead = 0
+    if starting_silence_s > 0:
+        silence = np.zeros(int(starting_silence_s * 1000) * TARGET_SR // 1000, dtype=np.float32)
+        lead = len(silence)
+        y = np.concatenate([silence, y])
+
+    sf.write(final_timed_path, y, TARGET_SR, subtype="PCM_16")
+    speech = (lead, len(y)) if has_speech else None
+    return [final_timed_path], {"samples": len(y), "speech": speech}
+
+
+def timeline_placements(placements):
+    """
+    Per-segment (start_s, end_s) of the speech in the concatenated dub, from the
+    process_segment placements in timeline order (None where skipped / silenced).
+    """
+    cursor = 0
+    timeline = []
+    for placement in placements:
+        if placement is None:
+            timeline.append(None)
             continue
+        speech = placement["speech"]
+        timeline.append(
+            (round((cursor + speech[0]) / TARGET_SR, 3), round((cursor + speech[1]) / TARGET_SR, 3))
+            if speech else None
+        )
+        cursor += placement["samples"]
+    return timeline
+
+
+def timeline_path(json_path):
+    return os.path.splitext(json_path)[0] + "_timeline.json"
 
-        # --- Stage 1–3: Process segment ---
-        temp_segment_path = tts_path
-        trimmed_path = os.path.join(temp_dir, f"{i+1}_trimmed.wav")
-        silence_reduced_path = os.path.join(temp_dir, f"{i+1}_silence_reduced.wav")
-        final_timed_path = os.path.join(temp_dir, f"{i+1}_timed.wav")
-
-        # Step 1: Trim edge silence
-        remove_edge_silence(temp_segment_path, trimmed_path)
-        temp_segment_path = trimmed_path
-        current_duration = librosa.get_duration(path=temp_segment_path)
-
-        # Step 2: Natural Compression
-        if current_duration > actual_duration:
-            reduce_internal_silence(temp_segment_path, silence_reduced_path)
-            temp_segment_path = silence_reduced_path
-            current_duration = librosa.get_duration(path=temp_segment_path)
-
-        # Step 3: Forced Synchronization with min 0.5x cap
-        speedup_factor = current_duration / actual_duration
-        capped = False
-
-        if speedup_factor < MIN_SPEED:
-            # print(f"⚠️ Segment {i+1}: Capping slow-down {speedup_factor:.2f}x → {MIN_SPEED:.2f}x")
-            capped = True
-            speedup_factor = MIN_SPEED
-
-        #skip small duration but speed up
-        small_max_speed = 2.5   # only for very short segments
-        SMALL_DURATION = 1.3   # seconds
-        if speedup_factor > small_max_speed and actual_duration <= SMALL_DURATION:
-           # print(f"⚠️ Skipping segment {i+1}: required speed {speedup_factor:.2f}× exceeds short-segment limit ({small_max_speed:.2f}×). Silence inserted.")
-           make_silence(actual_duration, final_timed_path)
-        # Too aggressive → skip speech
-        elif speedup_factor > MAX_SPEED:
-           # print(f"⚠️ Skipping segment {i+1}: required speed {speedup_factor:.2f}× exceeds safe limit ({MAX_SPEED:.2f}×). Silence inserted.")
-           make_silence(actual_duration, final_timed_path)
-        # Normal Speed Up    
-        elif abs(speedup_factor - 1.0) > 0.01:
-           change_speed(temp_segment_path, final_timed_path, speedup_factor)
-        else:
-            shutil.copy(temp_segment_path, final_timed_path)
-
-        temp_segment_path = final_timed_path
-
-        # --- Handle padding if capped slow-down ---
-        if capped:
-            new_duration = librosa.get_duration(path=temp_segment_path)
-            silence_gap_s = actual_duration - new_duration
-
-            if silence_gap_s > 0.01:
-                silence_duration_ms = int(silence_gap_s * 1000)
-                silence_segment = AudioSegment.silent(
-                    duration=silence_duration_ms,
-                    frame_rate=TARGET_SR
-                )
-                silence_path = os.path.join(temp_dir, f"{i+1}_extra_silence.wav")
-                silence_segment.export(silence_path, format="wav")
-                
-                # Add both audio and silence
-                processed_file_paths.append(temp_segment_path)
-                processed_file_paths.append(silence_path)
-                continue  # skip normal append
-
-        # --- Stage 4: Prepend silence if needed ---
-        if starting_silence_s > 0:
-            silence_duration_ms = int(starting_silence_s * 1000)
-            silence_file = AudioSegment.silent(duration=silence_duration_ms, frame_rate=TARGET_SR)
-            silence_path = os.path.join(temp_dir, f"{i+1}_silence.wav")
-            silence_file.export(silence_path, format="wav")
-            processed_file_paths.append(silence_path)
-
-        processed_file_paths.append(temp_segment_path)
-
-    # --- Stage 5: Concatenate all ---
+
+def record_placements(json_path, placements_by_id):
+    """
+    Write each segment's final {"dub_start", "dub_end"} next to the segment
+    manifest (json_input.json → json_input_timeline.json); the manifest itself is
+    left untouched so checkpointed jobs still see the synthesis output unchanged.
+    """
+    timeline = {
+        segment_id: {"dub_start": placement[0], "dub_end": placement[1]} if placement else None
+        for segment_id, placement in placements_by_id.items()
+    }
+    path = timeline_path(json_path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(timeline, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def concat_segments(processed_file_paths, final_audio_save_path, temp_dir="processed_segments"):
+    """Stage 5: Concatenate all processed wav files with the ffmpeg concat demuxer."""
     concat_list_path = os.path.join(temp_dir, "concat_list.txt")
     with open(concat_list_path, "w") as f:
         for path in processed_file_paths:
@@ -189,13 +293,133 @@ def dubbing_algorithm(segments_data, final_audio_save_path):
         print(" ".join(join_command))
         print(f"❌ ERROR: FFmpeg concatenation failed: {e}")
 
+
+def parallel_map(func, *iterables, num_workers=AUDIO_SYNC_WORKERS):
+    """
+    map() over a thread pool, results in input order. The per-segment hot
+    paths (nonsilent_ranges, the WSOLA frame search, librosa trim / resample,
+    the wav write) are numpy / BLAS / libsndfile calls that release the GIL,
+    so segments run on separate cores without re-importing the app (gradio,
+    torch, TTS models) in worker processes. num_workers=1 runs in-process.
+    """
+    items = list(zip(*iterables))
+    num_workers = min(num_workers or default_sync_workers(), len(items))
+    if num_workers <= 1:
+        return [func(*args) for args in items]
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(func, *zip(*items)))
+
+
+def dubbing_algorithm(segments_data, final_audio_save_path, num_workers=AUDIO_SYNC_WORKERS):
+    """
+    Processes and stitches TTS segments using a file-based approach to conserve memory.
+    Segments are processed concurrently (num_workers threads) and joined in `start` order.
+    Returns {segment_id: (dub_start, dub_end) or None}, the speech placement in the output.
+    """
+    temp_dir = prepare_temp_dir("processed_segments")
+
+    sorted_items = sorted(segments_data.items(), key=lambda x: x[1]['start'])
+    sorted_segments = [segment for _, segment in sorted_items]
+    results = parallel_map(
+        process_segment,
+        range(len(sorted_segments)),
+        sorted_segments,
+        [temp_dir] * len(sorted_segments),
+        num_workers=num_workers,
+    )
+
+    processed_file_paths = []
+    for parts, _ in results:
+        processed_file_paths.extend(parts)
+
+    concat_segments(processed_file_paths, final_audio_save_path, temp_dir)
+    timeline = timeline_placements([placement for _, placement in results])
+    return {segment_id: placement for (segment_id, _), placement in zip(sorted_items, timeline)}
+
+
+# --- Pipelined mode ---
+class PipelinedAudioSync:
+    """
+    Runs process_segment on CPU worker threads while TTS is still generating.
+
+    The producer calls submit(index, segment) as each TTS wav is written; the
+    bounded queue gives back-pressure so workers never fall far behind, and
+    finish() concatenates the results in index order (index = position in the
+    start-sorted timeline, same as dubbing_algorithm). If the producer fails,
+    abort() stops the workers and removes the half-written temp dir.
+    """
+
+    def __init__(self, num_workers=None, queue_size=8, temp_dir="processed_segments"):
+        self.temp_dir = prepare_temp_dir(temp_dir)
+        self.num_workers = num_workers or default_sync_workers()
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.results = {}
+        self.placements = {}
+        self.lock = threading.Lock()
+        self.aborted = False
+        self.workers = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(self.num_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def _worker(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            index, segment = item
+            if self.aborted:
+                self.queue.task_done()
+                continue
+            try:
+                result = process_segment(index, segment, self.temp_dir)
+            except Exception as e:
+                print(f"⚠️ Segment {index+1} post-processing failed: {e}")
+                result = ([], None)
+            with self.lock:
+                self.results[index] = result
+            self.queue.task_done()
+
+    def submit(self, index, segment):
+        self.queue.put((index, dict(segment)))
+
+    def _stop_workers(self):
+        for _ in self.workers:
+            self.queue.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def abort(self):
+        """Drop queued segments, stop the workers and delete the temp dir."""
+        self.aborted = True
+        self._stop_workers()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def finish(self, final_audio_save_path):
+        self._stop_workers()
+
+        processed_file_paths = []
+        for index in sorted(self.results):
+            processed_file_paths.extend(self.results[index][0])
+        concat_segments(processed_file_paths, final_audio_save_path, self.temp_dir)
+        # {timeline index: (dub_start, dub_end) or None}
+        order = sorted(self.results)
+        self.placements = dict(zip(order, timeline_placements([self.results[i][1] for i in order])))
+        return final_audio_save_path
+
+
 # --- Wrapper function ---
-def audio_sync(json_path):
+def audio_sync(json_path, num_workers=AUDIO_SYNC_WORKERS):
     with open(json_path, "r", encoding="utf-8") as f:
         json_data = json.load(f)
     save_path = json_data['save_path']
     segments = json_data['segments']
-    dubbing_algorithm(segments, save_path)
+    placements = dubbing_algorithm(segments, save_path, num_workers)
+    record_placements(json_path, placements)
     return save_path
 
 # Example usage:
@@ -2,13 +2,18 @@ import os
 import shutil
 import subprocess
 import json
+import numpy as np
 import librosa
 import soundfile as sf
-from pydub import AudioSegment
+from audio_sync_pipeline import parallel_map, AUDIO_SYNC_WORKERS
+from time_stretch import time_stretch
 
 # Standard sample rate for video production
 TARGET_SR = 48000 
 
+# Timelines longer than this are rendered into a disk-backed np.memmap instead of RAM
+MEMMAP_THRESHOLD_SEC = 30 * 60
+
 def get_atempo_filter(speed_factor):
     """
     Generates an FFmpeg filter chain for time-stretching.
@@ -49,16 +54,11 @@ def process_segment_audio(input_path, output_path, target_duration_sec):
     # trim silence (top_db=30 is standard for voice)
     y_trimmed, _ = librosa.effects.trim(y, top_db=30)
     
-    # Save a temporary trimmed file
-    temp_trim_path = output_path.replace(".wav", "_trim.wav")
-    sf.write(temp_trim_path, y_trimmed, TARGET_SR)
-    
-    current_duration = librosa.get_duration(y=y_trimmed, sr=sr)
+    current_duration = len(y_trimmed) / TARGET_SR
     
     # Safety: If audio is extremely short or target is 0, just copy
     if target_duration_sec <= 0.1 or current_duration <= 0.1:
-        shutil.copy(temp_trim_path, output_path)
-        if os.path.exists(temp_trim_path): os.remove(temp_trim_path)
+        sf.write(output_path, y_trimmed, TARGET_SR)
         return True
 
     # --- Step 2: Calculate Speed Factor ---
@@ -69,38 +69,91 @@ def process_segment_audio(input_path, output_path, target_duration_sec):
     # We limit speedup to 2.5x and slowdown to 0.5x.
     # If it needs to go faster/slower than this, it's better to overlap/gap 
     # than to make the audio unintelligible.
-    speed_factor = max(0.5, min(speed_factor, 2.5))
+    clamped_factor = max(0.5, min(speed_factor, 2.5))
 
-    # --- Step 3: Apply FFmpeg Time Stretch ---
-    filter_str = get_atempo_filter(speed_factor)
-    
+    # --- Step 3: In-process Time Stretch (WSOLA, pitch preserved) ---
     # If speed change is less than 2%, don't re-encode (preserves quality)
-    if abs(speed_factor - 1.0) < 0.02:
-        shutil.move(temp_trim_path, output_path)
+    if abs(clamped_factor - 1.0) < 0.02:
+        sf.write(output_path, y_trimmed, TARGET_SR)
     else:
-        cmd = [
-            "ffmpeg", "-v", "error", "-i", temp_trim_path,
-            "-filter:a", filter_str,
-            "-ar", str(TARGET_SR),
-            output_path, "-y"
-        ]
+        # Exact-length mode hits the slot to the sample when no clamping was needed
+        if clamped_factor == speed_factor:
+            target_samples = int(round(target_duration_sec * TARGET_SR))
+        else:
+            target_samples = int(round(len(y_trimmed) / clamped_factor))
         try:
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        except subprocess.CalledProcessError:
-            print(f"⚠️ FFmpeg failed for segment. Using unstretched audio.")
-            shutil.copy(temp_trim_path, output_path)
-        
-        # Cleanup temp trim file
-        if os.path.exists(temp_trim_path):
-            os.remove(temp_trim_path)
+            y_stretched = time_stretch(y_trimmed, target_length=target_samples, sr=TARGET_SR)
+        except Exception as e:
+            print(f"⚠️ Time stretch failed for segment ({e}). Using unstretched audio.")
+            y_stretched = y_trimmed
+        sf.write(output_path, y_stretched, TARGET_SR)
             
     return True
 
-def dubbing_algorithm(segments_data, final_audio_save_path):
+class TimelineRenderer:
+    """
+    Sample-accurate mixing canvas.
+
+    Clips are added into one preallocated float32 buffer at their sample offset
+    (overlaps are summed, like pydub overlay), so rendering is linear in the total
+    clip length instead of copying the whole canvas per segment. Long timelines
+    use an np.memmap in temp_dir to keep memory bounded.
+    """
+
+    def __init__(self, total_duration_sec, sr=TARGET_SR, temp_dir=None, use_memmap=None):
+        self.sr = sr
+        self.total_samples = int(round(total_duration_sec * sr))
+        if use_memmap is None:
+            use_memmap = total_duration_sec > MEMMAP_THRESHOLD_SEC and temp_dir is not None
+        self.memmap_path = None
+        if use_memmap:
+            self.memmap_path = os.path.join(temp_dir, "timeline.f32")
+            self.buffer = np.memmap(self.memmap_path, dtype=np.float32, mode="w+", shape=(self.total_samples,))
+        else:
+            self.buffer = np.zeros(self.total_samples, dtype=np.float32)
+
+    def add(self, audio, start_sec, fade_ms=2, gain=1.0):
+        """Mix a mono float32 clip in at start_sec with linear fade in/out of fade_ms."""
+        start = int(round(start_sec * self.sr))
+        if start >= self.total_samples or len(audio) == 0:
+            return
+        audio = np.asarray(audio, dtype=np.float32)[: self.total_samples - start]
+        audio = audio * gain if gain != 1.0 else audio.copy()
+
+        fade = min(int(self.sr * fade_ms / 1000), len(audio) // 2)
+        if fade > 0:
+            ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+            audio[:fade] *= ramp
+            audio[-fade:] *= ramp[::-1]
+
+        self.buffer[start:start + len(audio)] += audio
+
+    def add_file(self, path, start_sec, fade_ms=2, gain=1.0):
+        audio, sr = sf.read(path, dtype="float32", always_2d=True)
+        audio = audio.mean(axis=1)
+        if sr != self.sr:
+            audio = librosa.resample(audio, orig_sr=sr, target_sr=self.sr)
+        self.add(audio, start_sec, fade_ms, gain)
+
+    def export(self, save_path, block_sec=60):
+        """Write 16-bit PCM wav, clipping block by block (no full-size temporary copy)."""
+        block = block_sec * self.sr
+        with sf.SoundFile(save_path, "w", samplerate=self.sr, channels=1, subtype="PCM_16") as f:
+            for i in range(0, self.total_samples, block):
+                f.write(np.clip(self.buffer[i:i + block], -1.0, 1.0))
+
+    def close(self):
+        if self.memmap_path is not None:
+            del self.buffer  # drops the mapping so the file can be removed
+            os.remove(self.memmap_path)
+            self.memmap_path = None
+
+
+def dubbing_algorithm(segments_data, final_audio_save_path, num_workers=AUDIO_SYNC_WORKERS):
     """
     Timeline/Canvas approach:
     1. Create a blank silent audio track of the total duration.
-    2. Process every segment to fit its specific time slot.
+    2. Process every segment to fit its specific time slot (num_workers threads in parallel).
     3. Paste every segment at its exact START timestamp.
     """
     temp_dir = "processed_segments_temp"
@@ -122,50 +175,52 @@ def dubbing_algorithm(segments_data, final_audio_save_path):
     
     print(f"Creating Audio Canvas: {total_duration_sec:.2f} seconds...")
     
-    # Create silent master track (pydub works in milliseconds)
-    canvas = AudioSegment.silent(duration=int(total_duration_sec * 1000), frame_rate=TARGET_SR)
+    # Create silent master track (float32 samples)
+    canvas = TimelineRenderer(total_duration_sec, TARGET_SR, temp_dir=temp_dir)
 
-    # --- 2. Process & Overlay Loop ---
+    # --- 2. Process all segments in parallel ---
+    jobs = []
     for i, segment in enumerate(sorted_segments):
-        tts_path = segment['tts_path']
-        start_time_sec = segment['start']
-        target_duration = segment['actual_duration']
-        
-        if not os.path.exists(tts_path):
-            print(f"⚠️ Warning: File not found {tts_path}")
+        if not os.path.exists(segment['tts_path']):
+            print(f"⚠️ Warning: File not found {segment['tts_path']}")
             continue
-
         # Define temporary output filename
-        processed_path = os.path.join(temp_dir, f"seg_{i}.wav")
-        
-        # A. Process Audio (Trim -> Stretch -> Save to processed_path)
-        success = process_segment_audio(tts_path, processed_path, target_duration)
-        
+        jobs.append((segment, os.path.join(temp_dir, f"seg_{i}.wav")))
+
+    # A. Process Audio (Trim -> Stretch -> Save to processed_path)
+    results = parallel_map(
+        process_segment_audio,
+        [segment['tts_path'] for segment, _ in jobs],
+        [processed_path for _, processed_path in jobs],
+        [segment['actual_duration'] for segment, _ in jobs],
+        num_workers=num_workers,
+    )
+
+    # --- 3. Overlay Loop (start order) ---
+    for (segment, processed_path), success in zip(jobs, results):
+        start_time_sec = segment['start']
+
         if success and os.path.exists(processed_path):
             # B. Load processed audio
-            audio_clip = AudioSegment.from_wav(processed_path)
-            
             # C. Apply Micro-Fade (2ms)
             # This removes the "digital click" without eating the words.
-            audio_clip = audio_clip.fade_in(2).fade_out(2)
-            
-            # D. Overlay onto Canvas at EXACT timestamp
+            # D. Mix onto Canvas at EXACT sample offset
             # This ensures 0% drift. Segment 100 will be perfectly synced.
-            position_ms = int(start_time_sec * 1000)
-            canvas = canvas.overlay(audio_clip, position=position_ms)
+            canvas.add_file(processed_path, start_time_sec, fade_ms=2)
             
             # Optional: Log progress
             # print(f"Synced Segment {i+1}/{len(sorted_segments)} at {start_time_sec}s")
 
-    # --- 3. Export Final Audio ---
+    # --- 4. Export Final Audio ---
     print(f"💾 Exporting final dubbed audio to: {final_audio_save_path}")
-    canvas.export(final_audio_save_path, format="wav")
+    canvas.export(final_audio_save_path)
     
     # Cleanup
+    canvas.close()
     shutil.rmtree(temp_dir)
     print("✅ Dubbing process completed successfully.")
 
-def audio_sync(json_path):
+def audio_sync(json_path, num_workers=AUDIO_SYNC_WORKERS):
     """
     Wrapper function to be called from other scripts.
     """
@@ -179,7 +234,7 @@ def audio_sync(json_path):
     save_path = json_data['save_path']
     segments = json_data['segments']
     
-    dubbing_algorithm(segments, save_path)
+    dubbing_algorithm(segments, save_path, num_workers)
     return save_path
 
 # --- Execution Block (for testing) ---
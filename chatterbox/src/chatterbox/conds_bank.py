@@ -0,0 +1,102 @@
+import os
+import hashlib
+import logging
+from collections import OrderedDict
+from pathlib import Path
+
+from .models.t3.modules.cond_enc import T3Cond
+
+
+logger = logging.getLogger(__name__)
+
+CONDS_CACHE_DIR = os.getenv("CHATTERBOX_CONDS_CACHE", "./conds_cache")
+
+
+def _file_sha1(fpath, block_size=1024 * 1024) -> str:
+    h = hashlib.sha1()
+    with open(fpath, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class ConditionalsBank:
+    """
+    In-memory + on-disk store of speaker `Conditionals`.
+
+    Entries are keyed by the reference wav's content hash plus everything that
+    changes the conditioning (model kind, exaggeration, loudness norm), so a
+    speaker is decoded, embedded and tokenized once per job and reused across
+    jobs through `Conditionals.save` / `Conditionals.load`.
+    """
+
+    def __init__(self, cache_dir=CONDS_CACHE_DIR, max_in_memory=32):
+        self.cache_dir = Path(cache_dir)
+        self.max_in_memory = max_in_memory
+        self._mem = OrderedDict()
+        self._hash_memo = {}
+
+    def _ref_hash(self, wav_fpath):
+        stat = os.stat(wav_fpath)
+        memo_key = (os.path.abspath(wav_fpath), stat.st_mtime_ns, stat.st_size)
+        if memo_key not in self._hash_memo:
+            self._hash_memo[memo_key] = _file_sha1(wav_fpath)
+        return self._hash_memo[memo_key]
+
+    def make_key(self, kind, wav_fpath, **params):
+        """Return the bank key for a reference file, or None if it can't be hashed (e.g. a URL)."""
+        if not wav_fpath or not os.path.isfile(wav_fpath):
+            return None
+        parts = [kind, self._ref_hash(wav_fpath)]
+        parts += [f"{k}={float(v):.4f}" for k, v in sorted(params.items())]
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _copy(conds):
+        # generate() swaps `conds.t3` when exaggeration changes; hand out copies so
+        # that never reaches the stored entry.
+        return type(conds)(T3Cond(**conds.t3.__dict__), dict(conds.gen))
+
+    def get(self, key, conds_cls, device):
+        if key is None:
+            return None
+
+        if key in self._mem:
+            self._mem.move_to_end(key)
+            return self._copy(self._mem[key])
+
+        fpath = self.cache_dir / f"{key}.pt"
+        if not fpath.exists():
+            return None
+        try:
+            conds = conds_cls.load(fpath, map_location="cpu").to(device)
+        except Exception as e:
+            logger.warning(f"Could not load cached conditionals {fpath}: {e}")
+            return None
+        self._remember(key, conds)
+        return self._copy(conds)
+
+    def put(self, key, conds):
+        if key is None:
+            return
+        self._remember(key, self._copy(conds))
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_dir / f"{key}.pt.tmp"
+            conds.save(tmp_path)
+            os.replace(tmp_path, self.cache_dir / f"{key}.pt")
+        except Exception as e:
+            logger.warning(f"Could not persist conditionals {key}: {e}")
+
+    def _remember(self, key, conds):
+        self._mem[key] = conds
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_in_memory:
+            self._mem.popitem(last=False)
+
+    def clear(self):
+        """Drop the in-memory entries (on-disk entries are kept)."""
+        self._mem.clear()
+
+
+default_conds_bank = ConditionalsBank()
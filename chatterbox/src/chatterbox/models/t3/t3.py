@@ -37,6 +37,14 @@ def _ensure_BOT_EOT(text_tokens: Tensor, hp):
     assert (text_tokens == hp.stop_text_token).int().sum() >= B, "missing stop_text_token"
 
 
+def _select_cache_rows(past, rows: Tensor):
+    """Keep only `rows` of a kv cache (DynamicCache or legacy tuple format)."""
+    if hasattr(past, "batch_select_indices"):
+        past.batch_select_indices(rows)
+        return past
+    return tuple(tuple(t[rows] for t in layer) for layer in past)
+
+
 class T3(nn.Module):
     """
     Token-To-Token (T3) TTS model using huggingface transformer models as backbones,
@@ -411,6 +419,165 @@ class T3(nn.Module):
         predicted_tokens = torch.cat(predicted, dim=1)  # shape: (B, num_tokens)
         return predicted_tokens
 
+    @torch.inference_mode()
+    def inference_batch(
+        self,
+        *,
+        t3_conds: Union[T3Cond, List[T3Cond]],
+        text_tokens: List[Tensor],
+        max_new_tokens=1000,
+        temperature=0.8,
+        top_p=0.95,
+        min_p=0.05,
+        repetition_penalty=1.2,
+        cfg_weight=0.5,
+        stop_on_token_repetition=True,
+        show_progress=True,
+    ) -> List[Tensor]:
+        """
+        Decode several text sequences together, e.g. consecutive dubbing segments.
+
+        Every sequence gets its own (cond, uncond) CFG row pair. Prefixes are left-padded with an
+        attention mask and explicit position ids, so each row sees exactly what `inference` would
+        feed it. Rows are dropped from the batch (and the kv cache) as soon as they emit EOS.
+
+        NOTE: the alignment stream analyzer hooks batch row 0 only, so it is not used here; the
+        token-repetition EOS check it performs is applied per row instead.
+
+        Args:
+            t3_conds: one T3Cond per sequence, or a single T3Cond shared by all of them.
+            text_tokens: list of 1D (or (1, T)) token tensors, each wrapped in start/stop text tokens.
+        Returns:
+            list of 1D speech token tensors (EOS stripped), in input order. Each can go through
+            `drop_invalid_tokens` and into `S3Gen.inference` like the output of `inference`.
+        """
+        n_seq = len(text_tokens)
+        if n_seq == 0:
+            return []
+        if isinstance(t3_conds, T3Cond):
+            t3_conds = [t3_conds] * n_seq
+        assert len(t3_conds) == n_seq, "need one T3Cond per text sequence"
+
+        device = self.device
+        use_cfg = cfg_weight > 0.0 and not self.is_gpt
+        rows_per_seq = 2 if use_cfg else 1
+        start_token = self.hp.start_speech_token
+        stop_token = self.hp.stop_speech_token
+
+        def speech_pos(idx):
+            if self.speech_pos_emb is None:
+                return 0
+            return self.speech_pos_emb.get_fixed_embedding(idx)
+
+        # Build each prefix unpadded (cond + text + BOS, then the extra BOS step `inference` uses),
+        # so learned text positions and conditioning lengths are per-sequence.
+        bos_token = torch.tensor([[start_token]], dtype=torch.long, device=device)
+        bos_embed = self.speech_emb(bos_token) + speech_pos(0)  # (1, 1, dim)
+        prefixes = []
+        for t3_cond, tokens in zip(t3_conds, text_tokens):
+            _ensure_BOT_EOT(torch.atleast_2d(tokens), self.hp)
+            tokens = torch.atleast_2d(tokens).to(dtype=torch.long, device=device)
+            tokens = tokens.expand(rows_per_seq, -1)
+            embeds, _ = self.prepare_input_embeds(
+                t3_cond=t3_cond,
+                text_tokens=tokens,
+                speech_tokens=bos_token.expand(rows_per_seq, -1),
+                cfg_weight=cfg_weight if use_cfg else 0.0,
+            )
+            embeds = torch.cat([embeds, bos_embed.expand(rows_per_seq, -1, -1)], dim=1)
+            prefixes.extend(embeds)
+
+        # Left-pad so every row's last prefix position lines up
+        n_rows = len(prefixes)
+        max_len = max(p.size(0) for p in prefixes)
+        inputs_embeds = prefixes[0].new_zeros(n_rows, max_len, prefixes[0].size(-1))
+        attention_mask = torch.zeros(n_rows, max_len, dtype=torch.long, device=device)
+        for r, p in enumerate(prefixes):
+            inputs_embeds[r, max_len - p.size(0):] = p
+            attention_mask[r, max_len - p.size(0):] = 1
+        position_ids = (attention_mask.cumsum(-1) - 1).clamp(min=0)
+
+        min_p_warper = MinPLogitsWarper(min_p=min_p)
+        top_p_warper = TopPLogitsWarper(top_p=top_p)
+        repetition_penalty_processor = RepetitionPenaltyLogitsProcessor(penalty=float(repetition_penalty))
+        cfg = torch.as_tensor(cfg_weight, device=device, dtype=inputs_embeds.dtype)
+
+        active = list(range(n_seq))  # original sequence index of each active row group
+        generated_ids = torch.full((n_seq, 1), start_token, dtype=torch.long, device=device)
+        results = [None] * n_seq
+
+        output = self.tfmr(
+            inputs_embeds=inputs_embeds,
+            attention_mask=attention_mask,
+            position_ids=position_ids,
+            use_cache=True,
+            return_dict=True,
+        )
+        past = output.past_key_values
+        next_pos = position_ids[:, -1:] + 1
+
+        for i in tqdm(range(max_new_tokens), desc="Sampling (batched)", dynamic_ncols=True, disable=not show_progress):
+            logits = self.speech_head(output.last_hidden_state[:, -1, :]).float()  # (rows, V)
+            if use_cfg:
+                logits = logits.view(len(active), 2, -1)
+                cond, uncond = logits[:, 0], logits[:, 1]
+                logits = cond + cfg * (cond - uncond)
+
+            logits = repetition_penalty_processor(generated_ids, logits)
+            if temperature != 1.0:
+                logits = logits / temperature
+            logits = min_p_warper(generated_ids, logits)
+            logits = top_p_warper(generated_ids, logits)
+
+            probs = torch.softmax(logits, dim=-1)
+            next_token = torch.multinomial(probs, num_samples=1)  # (n_active, 1)
+            generated_ids = torch.cat([generated_ids, next_token], dim=1)
+
+            finished = next_token.view(-1) == stop_token
+            if stop_on_token_repetition and generated_ids.size(1) > 3:
+                finished |= generated_ids[:, -1] == generated_ids[:, -2]
+
+            for row in finished.nonzero(as_tuple=True)[0].tolist():
+                tokens = generated_ids[row, 1:]
+                if tokens[-1] == stop_token:
+                    tokens = tokens[:-1]
+                results[active[row]] = tokens.clone()
+
+            if bool(finished.all()):
+                active = []
+                break
+
+            if bool(finished.any()):
+                keep = (~finished).nonzero(as_tuple=True)[0]
+                row_keep = (keep[:, None] * rows_per_seq + torch.arange(rows_per_seq, device=device)).view(-1)
+                active = [active[k] for k in keep.tolist()]
+                generated_ids = generated_ids[keep]
+                next_token = next_token[keep]
+                attention_mask = attention_mask[row_keep]
+                next_pos = next_pos[row_keep]
+                past = _select_cache_rows(past, row_keep)
+
+            next_token_embed = self.speech_emb(next_token) + speech_pos(i + 1)
+            next_token_embed = next_token_embed.repeat_interleave(rows_per_seq, dim=0)
+            attention_mask = torch.cat([attention_mask, attention_mask.new_ones(attention_mask.size(0), 1)], dim=1)
+
+            output = self.tfmr(
+                inputs_embeds=next_token_embed,
+                attention_mask=attention_mask,
+                position_ids=next_pos,
+                past_key_values=past,
+                use_cache=True,
+                return_dict=True,
+            )
+            past = output.past_key_values
+            next_pos = next_pos + 1
+
+        # Rows that hit max_new_tokens without EOS
+        for row, seq_idx in enumerate(active):
+            results[seq_idx] = generated_ids[row, 1:].clone()
+
+        return results
+
     @torch.inference_mode()
     def inference_turbo(self, t3_cond, text_tokens, temperature=0.8, top_k=1000, top_p=0.95, repetition_penalty=1.2,
                         max_gen_len=1000):
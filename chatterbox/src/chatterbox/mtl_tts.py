@@ -16,6 +16,7 @@ from .models.s3gen import S3GEN_SR, S3Gen
 from .models.tokenizers import MTLTokenizer
 from .models.voice_encoder import VoiceEncoder
 from .models.t3.modules.cond_enc import T3Cond
+from .conds_bank import default_conds_bank
 
 import os 
 import requests
@@ -193,6 +194,7 @@ class ChatterboxMultilingualTTS:
         self.tokenizer = tokenizer
         self.device = device
         self.conds = conds
+        self.conds_bank = default_conds_bank  # set to None to always recompute
         self.watermarker = perth.PerthImplicitWatermarker()
 
     @classmethod
@@ -257,6 +259,14 @@ class ChatterboxMultilingualTTS:
         return cls.from_local(ckpt_dir, device)
     
     def prepare_conditionals(self, wav_fpath, exaggeration=0.5):
+        bank_key = None
+        if self.conds_bank is not None:
+            bank_key = self.conds_bank.make_key("mtl", wav_fpath, exaggeration=exaggeration)
+            cached = self.conds_bank.get(bank_key, Conditionals, self.device)
+            if cached is not None:
+                self.conds = cached
+                return
+
         ## Load reference wav
         s3gen_ref_wav, _sr = librosa.load(wav_fpath, sr=S3GEN_SR)
 
@@ -282,6 +292,8 @@ class ChatterboxMultilingualTTS:
             emotion_adv=exaggeration * torch.ones(1, 1, 1),
         ).to(device=self.device)
         self.conds = Conditionals(t3_cond, s3gen_ref_dict)
+        if self.conds_bank is not None:
+            self.conds_bank.put(bank_key, self.conds)
 
     def generate(
         self,
@@ -355,3 +367,93 @@ class ChatterboxMultilingualTTS:
             ##If you use your own voice
             # watermarked_wav = wav
         return torch.from_numpy(watermarked_wav).unsqueeze(0)
+
+    def generate_batch(
+        self,
+        texts,
+        language_id,
+        audio_prompt_paths=None,
+        exaggeration=0.5,
+        cfg_weight=0.5,
+        temperature=0.8,
+        repetition_penalty=2.0,
+        min_p=0.05,
+        top_p=1.0,
+        max_new_tokens=None,
+    ):
+        """
+        Synthesize several texts with one batched T3 decode.
+
+        audio_prompt_paths may be None (use the prepared conditionals for all texts),
+        a single path, or one path per text (segments of different speakers).
+        max_new_tokens caps each row's speech tokens (default: the T3 config's
+        max_speech_tokens); rows stop earlier at their own EOS.
+        Returns a list of (1, N) wav tensors in input order.
+        """
+        if language_id and language_id.lower() not in SUPPORTED_LANGUAGES:
+            supported_langs = ", ".join(SUPPORTED_LANGUAGES.keys())
+            raise ValueError(
+                f"Unsupported language_id '{language_id}'. "
+                f"Supported languages: {supported_langs}"
+            )
+        if not texts:
+            return []
+
+        if audio_prompt_paths is None or isinstance(audio_prompt_paths, (str, Path)):
+            audio_prompt_paths = [audio_prompt_paths] * len(texts)
+
+        # One Conditionals per distinct speaker (the conds bank makes repeats cheap)
+        conds_by_prompt = {}
+        for prompt in audio_prompt_paths:
+            if prompt in conds_by_prompt:
+                continue
+            if prompt:
+                self.prepare_conditionals(prompt, exaggeration=exaggeration)
+            else:
+                assert self.conds is not None, "Please `prepare_conditionals` first or specify `audio_prompt_paths`"
+            conds = self.conds
+            if float(exaggeration) != float(conds.t3.emotion_adv[0, 0, 0].item()):
+                _cond: T3Cond = conds.t3
+                conds = Conditionals(
+                    T3Cond(
+                        speaker_emb=_cond.speaker_emb,
+                        cond_prompt_speech_tokens=_cond.cond_prompt_speech_tokens,
+                        emotion_adv=exaggeration * torch.ones(1, 1, 1),
+                    ).to(device=self.device),
+                    conds.gen,
+                )
+            conds_by_prompt[prompt] = conds
+
+        sot = self.t3.hp.start_text_token
+        eot = self.t3.hp.stop_text_token
+        text_tokens = []
+        for text in texts:
+            tokens = self.tokenizer.text_to_tokens(
+                punc_norm(text), language_id=language_id.lower() if language_id else None
+            ).to(self.device)
+            tokens = F.pad(tokens, (1, 0), value=sot)
+            tokens = F.pad(tokens, (0, 1), value=eot)
+            text_tokens.append(tokens)
+
+        wavs = []
+        with torch.inference_mode():
+            batch_speech_tokens = self.t3.inference_batch(
+                t3_conds=[conds_by_prompt[p].t3 for p in audio_prompt_paths],
+                text_tokens=text_tokens,
+                max_new_tokens=max_new_tokens or self.t3.hp.max_speech_tokens,
+                temperature=temperature,
+                cfg_weight=cfg_weight,
+                repetition_penalty=repetition_penalty,
+                min_p=min_p,
+                top_p=top_p,
+            )
+            for prompt, speech_tokens in zip(audio_prompt_paths, batch_speech_tokens):
+                speech_tokens = drop_invalid_tokens(speech_tokens).to(self.device)
+                wav, _ = self.s3gen.inference(
+                    speech_tokens=speech_tokens,
+                    ref_dict=conds_by_prompt[prompt].gen,
+                )
+                wav = wav.squeeze(0).detach().cpu().numpy()
+                watermarked_wav = self.watermarker.apply_watermark(wav, sample_rate=self.sr)
+                wavs.append(torch.from_numpy(watermarked_wav).unsqueeze(0))
+        return wavs
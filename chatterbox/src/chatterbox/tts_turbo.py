@@ -21,6 +21,7 @@ from .models.voice_encoder import VoiceEncoder
 from .models.t3.modules.cond_enc import T3Cond
 from .models.t3.modules.t3_config import T3Config
 from .models.s3gen.const import S3GEN_SIL
+from .conds_bank import default_conds_bank
 import logging
 #colab fix
 
@@ -225,6 +226,7 @@ class ChatterboxTurboTTS:
         self.tokenizer = tokenizer
         self.device = device
         self.conds = conds
+        self.conds_bank = default_conds_bank  # set to None to always recompute
         self.watermarker = perth.PerthImplicitWatermarker()
 
     @classmethod
@@ -316,6 +318,16 @@ class ChatterboxTurboTTS:
         return wav
 
     def prepare_conditionals(self, wav_fpath, exaggeration=0.5, norm_loudness=True):
+        bank_key = None
+        if self.conds_bank is not None:
+            bank_key = self.conds_bank.make_key(
+                "turbo", wav_fpath, exaggeration=exaggeration, norm_loudness=norm_loudness
+            )
+            cached = self.conds_bank.get(bank_key, Conditionals, self.device)
+            if cached is not None:
+                self.conds = cached
+                return
+
         ## Load and norm reference wav
         s3gen_ref_wav, _sr = librosa.load(wav_fpath, sr=S3GEN_SR)
 
@@ -345,6 +357,8 @@ class ChatterboxTurboTTS:
             emotion_adv=exaggeration * torch.ones(1, 1, 1),
         ).to(device=self.device)
         self.conds = Conditionals(t3_cond, s3gen_ref_dict)
+        if self.conds_bank is not None:
+            self.conds_bank.put(bank_key, self.conds)
 
     def generate(
         self,
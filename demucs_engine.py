@@ -0,0 +1,168 @@
+#@title /content/Video-Dubbing/demucs_engine.py
+# %%writefile /content/Video-Dubbing/demucs_engine.py
+import numpy as np
+import soundfile as sf
+import torch
+
+from media_probe import stream_pcm
+
+WINDOW_SEC = 60.0   # audio handed to apply_model at once
+OVERLAP_SEC = 5.0   # crossfaded between consecutive windows
+
+
+def auto_device():
+    if torch.cuda.is_available():
+        return "cuda"
+    if getattr(torch.backends, "mps", None) is not None and torch.backends.mps.is_available():
+        return "mps"
+    return "cpu"
+
+
+class DemucsEngine:
+    """
+    In-process two-stem Demucs (vocals / no_vocals) with bounded memory.
+
+    The model stays loaded between files (registered with model_manager). Input is
+    decoded through an ffmpeg pipe and separated in WINDOW_SEC windows that
+    overlap by OVERLAP_SEC; overlaps are linearly crossfaded and both stems are
+    written to disk as they are produced, so peak RAM doesn't grow with media length.
+    """
+
+    def __init__(self, model_name="htdemucs_ft", device=None):
+        self.model_name = model_name
+        self.device = device or auto_device()
+        self.model = None
+
+    def load(self):
+        if self.model is None:
+            from demucs.pretrained import get_model
+            print(f"🔁 Loading Demucs {self.model_name} on {self.device} ...")
+            self.model = get_model(self.model_name)
+            self.model.eval()
+        return self.model
+
+    def unload(self):
+        self.model = None
+
+    def _global_stats(self, path, samplerate):
+        """Mean/std of the mono mix (Demucs normalizes by whole-track stats), one streaming pass."""
+        count, total, total_sq = 0, 0.0, 0.0
+        for block in stream_pcm(path, samplerate, 1, samplerate * 30):
+            x = block[:, 0].astype(np.float64)
+            count += len(x)
+            total += x.sum()
+            total_sq += np.square(x).sum()
+        if count == 0:
+            return 0.0, 1.0
+        mean = total / count
+        std = max(np.sqrt(max(total_sq / count - mean ** 2, 0.0)), 1e-8)
+        return mean, std
+
+    @torch.no_grad()
+    def _separate_window(self, window, mean, std):
+        from demucs.apply import apply_model
+        model = self.model
+        wav = torch.from_numpy(np.ascontiguousarray(window.T))
+        wav = (wav - mean) / std
+        sources = apply_model(model, wav[None], device=self.device, split=True, overlap=0.25, progress=False)[0]
+        sources = sources * std + mean
+        vocals_index = model.sources.index("vocals")
+        vocals = sources[vocals_index]
+        no_vocals = sources.sum(dim=0) - vocals
+        return vocals.cpu().numpy().T, no_vocals.cpu().numpy().T
+
+    def separate(self, input_path, vocals_path, background_path,
+                 window_sec=WINDOW_SEC, overlap_sec=OVERLAP_SEC):
+        self.load()
+        samplerate = self.model.samplerate
+        channels = self.model.audio_channels
+        window = int(window_sec * samplerate)
+        overlap = int(overlap_sec * samplerate)
+        hop = window - overlap
+        fade_in = np.linspace(0.0, 1.0, overlap, dtype=np.float32)[:, None]
+        fade_out = 1.0 - fade_in
+
+        mean, std = self._global_stats(input_path, samplerate)
+
+        writers = [
+            sf.SoundFile(path, "w", samplerate=samplerate, channels=channels, subtype="PCM_16")
+            for path in (vocals_path, background_path)
+        ]
+        tails = None
+        buffer = np.zeros((0, channels), dtype=np.float32)
+
+        def process(chunk, final):
+            nonlocal tails
+            stems = self._separate_window(chunk, mean, std)
+            for s, stem in enumerate(stems):
+                if tails is not None:
+                    n = min(overlap, len(stem))
+                    stem = stem.copy()
+                    stem[:n] = stem[:n] * fade_in[:n] + tails[s][:n] * fade_out[:n]
+                if final or len(stem) <= overlap:
+                    writers[s].write(np.clip(stem, -1.0, 1.0))
+                else:
+                    writers[s].write(np.clip(stem[:-overlap], -1.0, 1.0))
+            if final:
+                tails = None
+            else:
+                tails = [stem[-overlap:] for stem in stems]
+
+        try:
+            for block in stream_pcm(input_path, samplerate, channels, hop):
+                buffer = np.concatenate([buffer, block])
+                while len(buffer) >= window:
+                    process(buffer[:window], final=False)
+                    buffer = buffer[hop:]
+            if len(buffer) > (overlap if tails is not None else 0):
+                process(buffer, final=True)
+            elif tails is not None:
+                for s in range(2):
+                    writers[s].write(np.clip(tails[s][:len(buffer)], -1.0, 1.0))
+        finally:
+            for writer in writers:
+                writer.close()
+        return vocals_path, background_path
+
+
+_engines = {}
+
+
+def register_demucs_engine(model_name="htdemucs_ft"):
+    """
+    Registers the process-wide engine for a model with model_manager and
+    returns its name. Pin it for the whole separation so another thread's
+    eviction can't unload it mid-file:
+        with model_manager.use(register_demucs_engine()) as engine:
+            engine.separate(...)
+    """
+    from model_manager import model_manager
+
+    name = f"demucs-{model_name}"
+    if name not in _engines:
+        engine = DemucsEngine(model_name)
+        _engines[name] = engine
+
+        def load():
+            engine.load()
+            return engine
+
+        model_manager.register(
+            name,
+            loader=load,
+            unloader=engine.unload,
+            is_loaded=lambda: engine.model is not None,
+            device=engine.device,
+        )
+    return name
+
+
+def get_demucs_engine(model_name="htdemucs_ft"):
+    """Warm engine, not pinned (see register_demucs_engine for long runs)."""
+    from model_manager import model_manager
+    return model_manager.get(register_demucs_engine(model_name))
+
+# from model_manager import model_manager
+# from demucs_engine import register_demucs_engine
+# with model_manager.use(register_demucs_engine()) as engine:
+#     engine.separate("/content/lecture.mp4", "vocals.wav", "no_vocals.wav")
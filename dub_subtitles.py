@@ -0,0 +1,240 @@
+#@title /content/Video-Dubbing/dub_subtitles.py
+# %%writefile /content/Video-Dubbing/dub_subtitles.py
+import os
+import re
+import json
+import unicodedata
+
+import librosa
+import torch
+
+from model_manager import model_manager
+from audio_sync_pipeline import timeline_path
+from STT.subtitle import (
+    SUBTITLE_FOLDER,
+    clean_file_name,
+    generate_srt_from_sentences,
+    word_level_srt,
+    write_sentence_srt,
+)
+
+
+ALIGN_SR = 16000
+ALIGNER_DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+ALIGNER_MODEL = None
+_aligner_tools = None
+_uroman = None
+
+
+# =========================
+# CTC FORCED ALIGNER (torchaudio MMS_FA, ~1.2 GB wav2vec2)
+# =========================
+def load_aligner():
+    global ALIGNER_MODEL
+    if ALIGNER_MODEL is None:
+        import torchaudio
+        print("🔁 Loading MMS forced aligner ...")
+        ALIGNER_MODEL = torchaudio.pipelines.MMS_FA.get_model(with_star=False).to(ALIGNER_DEVICE).eval()
+    return ALIGNER_MODEL
+
+
+def unload_aligner():
+    global ALIGNER_MODEL
+    ALIGNER_MODEL = None
+
+
+model_manager.register(
+    "mms_fa_aligner",
+    loader=load_aligner,
+    unloader=unload_aligner,
+    is_loaded=lambda: ALIGNER_MODEL is not None,
+    device=ALIGNER_DEVICE,
+)
+
+
+def aligner_tools():
+    global _aligner_tools
+    if _aligner_tools is None:
+        import torchaudio
+        bundle = torchaudio.pipelines.MMS_FA
+        _aligner_tools = (bundle.get_tokenizer(), bundle.get_aligner())
+    return _aligner_tools
+
+
+def romanize(word):
+    """MMS_FA only knows a-z and '; non-Latin scripts go through uroman (in requirements.txt)."""
+    global _uroman
+    if _uroman is None:
+        try:
+            import uroman
+            _uroman = uroman.Uroman()
+        except ImportError:
+            _uroman = False
+    if _uroman:
+        try:
+            word = _uroman.romanize_string(word)
+        except Exception:
+            pass
+    word = unicodedata.normalize("NFKD", word)
+    word = "".join(ch for ch in word if not unicodedata.combining(ch))
+    return re.sub(r"[^a-z']", "", word.lower())
+
+
+# Scripts written without spaces between words: Thai, Lao, Myanmar, Khmer, kana, CJK ideographs
+CONTINUOUS_SCRIPT = re.compile(
+    "[\u0E00-\u0EFF\u1000-\u109F\u1780-\u17FF\u3040-\u30FF\u3400-\u4DBF\u4E00-\u9FFF\uF900-\uFAFF]"
+)
+
+
+def split_words(text):
+    """
+    Whitespace-separated words, with runs of scriptio-continua text (CJK, Thai,
+    ...) split into single characters so each gets its own alignment. Combining
+    marks and punctuation stay on the character before them, opening
+    punctuation on the one after.
+    """
+    words = []
+    for token in text.split():
+        if not CONTINUOUS_SCRIPT.search(token):
+            words.append(token)
+            continue
+        pieces, continuous, opening = [], [], False
+        for ch in token:
+            category = unicodedata.category(ch)
+            is_continuous = bool(CONTINUOUS_SCRIPT.match(ch))
+            if pieces and (opening or (category[0] in "MP" and category not in ("Ps", "Pi"))
+                           or (not is_continuous and not continuous[-1])):
+                pieces[-1] += ch
+                continuous[-1] = continuous[-1] or is_continuous
+            else:
+                pieces.append(ch)
+                continuous.append(is_continuous)
+            opening = category in ("Ps", "Pi") and pieces[-1] == ch
+        words.extend(pieces)
+    return words
+
+
+def proportional_word_times(words, start, end):
+    """Fallback: spread the words over [start, end] by character count."""
+    weights = [max(len(w), 1) for w in words]
+    total = sum(weights)
+    times, cursor = [], start
+    for weight in weights:
+        step = (end - start) * weight / total
+        times.append((cursor, cursor + step))
+        cursor += step
+    return times
+
+
+def align_words(audio, words, start, end):
+    """
+    (start, end) per word inside one placed segment of the dub. CTC forced
+    alignment on just that slice; falls back to proportional timing when a word
+    can't be romanized or the slice is too short for the transcript.
+    """
+    tokens = [romanize(w) for w in words]
+    clip = audio[int(start * ALIGN_SR):int(end * ALIGN_SR)]
+    if not words or not all(tokens) or len(clip) < ALIGN_SR // 10:
+        return proportional_word_times(words, start, end)
+
+    try:
+        tokenizer, aligner = aligner_tools()
+        with model_manager.use("mms_fa_aligner") as model, torch.inference_mode():
+            emission, _ = model(torch.from_numpy(clip).float()[None].to(ALIGNER_DEVICE))
+        spans = aligner(emission[0].cpu(), tokenizer(tokens))
+    except Exception as e:
+        print(f"⚠️ Forced alignment failed ({e}), using proportional word timing")
+        return proportional_word_times(words, start, end)
+
+    seconds_per_frame = len(clip) / emission.size(1) / ALIGN_SR
+    return [
+        (start + word_spans[0].start * seconds_per_frame, start + word_spans[-1].end * seconds_per_frame)
+        for word_spans in spans
+    ]
+
+
+# =========================
+# SUBTITLES FROM THE DUB MANIFEST
+# =========================
+def placed_segments(json_path):
+    """Dubbed text + final placement in the synced audio, in timeline order."""
+    with open(json_path, "r", encoding="utf-8") as f:
+        segments = json.load(f)["segments"]
+    timeline = {}
+    if os.path.exists(timeline_path(json_path)):
+        with open(timeline_path(json_path), "r", encoding="utf-8") as f:
+            timeline = json.load(f)
+
+    placed = []
+    for segment_id, segment in segments.items():
+        text = segment.get("dubbing", "").strip()
+        if segment_id in timeline:
+            placement = timeline[segment_id]
+            if placement is None:
+                continue  # silenced during sync: nothing audible to subtitle
+            start, end = placement["dub_start"], placement["dub_end"]
+        else:
+            start, end = segment["start"], segment["end"]
+        if text and end > start:
+            placed.append({"text": text, "start": start, "end": end})
+    return sorted(placed, key=lambda s: s["start"])
+
+
+def dub_subtitle_maker(json_path, dubbed_audio_path, language_name="English"):
+    """
+    Same outputs as STT.subtitle.subtitle_maker for the dubbed audio, without an
+    ASR pass: the text is the dubbing text we synthesized and the timing is
+    where audio_sync placed each segment; only word timings are estimated, by
+    forced alignment on each placed segment.
+    """
+    segments = placed_segments(json_path)
+    audio, _ = librosa.load(dubbed_audio_path, sr=ALIGN_SR, mono=True)
+
+    sentence_timestamps, word_timestamps = [], []
+    for sentence_id, segment in enumerate(segments):
+        words = split_words(segment["text"])
+        times = align_words(audio, words, segment["start"], segment["end"])
+        sentence_words = [
+            {"word": word, "start": round(w_start, 3), "end": round(w_end, 3)}
+            for word, (w_start, w_end) in zip(words, times)
+        ]
+        sentence_timestamps.append({
+            "id": sentence_id,
+            "text": segment["text"],
+            "start": segment["start"],
+            "end": segment["end"],
+            "words": sentence_words,
+        })
+        word_timestamps.extend(sentence_words)
+    transcript_text = " ".join(s["text"] for s in sentence_timestamps)
+
+    base_filename = os.path.splitext(os.path.basename(dubbed_audio_path))[0][:30]
+    clean_srt_path = clean_file_name(f"{SUBTITLE_FOLDER}/{base_filename}_{language_name}.srt")
+    txt_path = clean_srt_path.replace(".srt", ".txt")
+    word_srt_path = clean_srt_path.replace(".srt", "_word_level.srt")
+    custom_srt_path = clean_srt_path.replace(".srt", "_Multiline.srt")
+    shorts_srt_path = clean_srt_path.replace(".srt", "_shorts.srt")
+
+    generate_srt_from_sentences(sentence_timestamps, srt_path=clean_srt_path)
+    word_level_srt(word_timestamps, srt_path=word_srt_path)
+    shorts_json = write_sentence_srt(
+        word_timestamps, output_file=shorts_srt_path, max_lines=1,
+        max_duration_s=2.0, max_chars_per_line=17
+    )
+    sentence_json = write_sentence_srt(
+        word_timestamps, output_file=custom_srt_path, max_lines=2,
+        max_duration_s=7.0, max_chars_per_line=38
+    )
+    with open(txt_path, "w", encoding="utf-8") as f:
+        f.write(transcript_text)
+
+    # Same tuple as subtitle_maker (no translated srt: the dub is already in language_name)
+    return (
+        clean_srt_path, None, custom_srt_path, word_srt_path,
+        shorts_srt_path, txt_path, sentence_json, shorts_json, transcript_text
+    )
+
+# from dub_subtitles import dub_subtitle_maker
+# default_srt, _, custom_srt, word_srt, shorts_srt, txt_path, sentence_json, word_json, transcript = dub_subtitle_maker(
+#     "./json_input.json", "./dubbed.wav", "Hindi")
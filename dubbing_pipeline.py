@@ -2,16 +2,16 @@
 # %%writefile /content/Video-Dubbing/dubbing_pipeline.py
 from utils import get_dubbing_json,get_speakers,get_media_duration,make_video
 from tts import clone_voice_streaming,supported_languages
-from STT.subtitle import subtitle_maker
 import json
-from librosa import get_duration
+from media_probe import get_duration
 import os
 import subprocess
 from pathlib import Path
 from pydub import AudioSegment
 import uuid
 import shutil
-from audio_sync_pipeline import audio_sync
+from audio_sync_pipeline import PipelinedAudioSync, record_placements
+from job_runner import JobRunner, default_job_id, run_dub_stages
 from tqdm.auto import tqdm
 # from tts_hub import run_kokoro_tts
 
@@ -134,18 +134,54 @@ import re
 import soundfile as sf
 from pydub import AudioSegment
 import torch,gc
-from turbo_tts import generate, unload_turbo_model
-from tts import clone_voice_streaming, unload_multilingual_model
-from kokoro import KPipeline
+from turbo_tts import generate
+from tts import clone_voice_streaming, clean_text, ChatterboxBatch
+from kokoro_tts import (
+    KOKORO_LANGUAGE_MAP, KOKORO_SR, KOKORO_BATCH_CHARS, KOKORO_BATCH_SIZE,
+    KokoroBatch, kokoro_synthesize, register_kokoro_pipeline,
+)
+from model_manager import model_manager
 from rich import print
 import shutil
-from edge_tts_code import edge_tts_generate
+from edge_tts_code import edge_tts_generate, get_edge_tts_client, EDGE_TTS_SR
+from tts_cache import get_tts_cache, tts_cache_key
+from vad_service import remove_noise_batch
+
+
+def tts_model_name(voice_model, language_name="English"):
+    """model_manager entry backing a voice model (None for Edge TTS, which runs remotely)."""
+    if voice_model == "Chatterbox Multilingual":
+        return "chatterbox_multilingual"
+    if voice_model == "Chatterbox Turbo":
+        return "chatterbox_turbo"
+    if voice_model == "Kokoro":
+        return register_kokoro_pipeline(KOKORO_LANGUAGE_MAP.get(language_name, "a"))
+    return None
 
 
 # =========================
-# GLOBAL PIPELINES
+# GENERATION SETTINGS
 # =========================
-kokoro_pipeline = None
+# Single source for the per-model settings run_tts uses; also part of the TTS cache key.
+TTS_GENERATION_PARAMS = {
+    "Chatterbox Multilingual": {
+        "exaggeration": 0.5,
+        "temperature": 0.8,
+        "cfg_weight": 0.5,
+        "remove_silence": False,
+        "remove_noise": True,
+    },
+    "Chatterbox Turbo": {
+        "temperature": 0.8,
+        "min_p": 0.0,
+        "top_p": 0.95,
+        "top_k": 1000,
+        "repetition_penalty": 1.2,
+        "norm_loudness": True,
+    },
+    "Kokoro": {"speed": 1.0},
+    "Edge TTS": {"speed": 1.0},
+}
 
 
 # =========================
@@ -185,16 +221,17 @@ def temp_tts_file_name(text, language="en"):
 # TURBO TTS
 # =========================
 def call_turbo_tts(text, audio_prompt_path, seed_num):
+    params = TTS_GENERATION_PARAMS["Chatterbox Turbo"]
     audio_path, _ = generate(
         text=text,
         audio_prompt_path=audio_prompt_path,
-        temperature=0.8,
+        temperature=params["temperature"],
         seed=seed_num,
-        min_p=0.0,
-        top_p=0.95,
-        top_k=1000,
-        repetition_penalty=1.2,
-        norm_loudness=True,
+        min_p=params["min_p"],
+        top_p=params["top_p"],
+        top_k=params["top_k"],
+        repetition_penalty=params["repetition_penalty"],
+        norm_loudness=params["norm_loudness"],
         remove_silence=False,
         output_format="wav",
         minimum_silence=0.05,
@@ -209,68 +246,53 @@ def call_turbo_tts(text, audio_prompt_path, seed_num):
 
 
 def run_kokoro_tts(text, language="English", voice="af_heart", speed=1.0):
-    global kokoro_pipeline
-
-    language_map = {
-        "English": "a",
-        "American English": "a",
-        "British English": "b",
-        "Hindi": "h",
-        "Spanish": "e",
-        "French": "f",
-        "Italian": "i",
-        "Brazilian Portuguese": "p",
-        "Japanese": "j",
-        "Mandarin Chinese": "z",
-    }
-
-    lang_code = language_map.get(language, "a")
-
-    if kokoro_pipeline is None:
-        kokoro_pipeline = KPipeline(lang_code=lang_code)
-
+    lang_code = KOKORO_LANGUAGE_MAP.get(language, "a")
     file_name = temp_tts_file_name(text, lang_code)
 
-    generator = kokoro_pipeline(text, voice=voice, speed=speed)
-    for _, _, audio in generator:
-        sf.write(file_name, audio, 24000)
+    # every chunk the pipeline yields, in one buffer (long texts come out in several)
+    audio = kokoro_synthesize(text, language=language, voice=voice, speed=speed)
+    if len(audio) == 0:
+        return None
+    sf.write(file_name, audio, KOKORO_SR)
 
     return file_name
 
 
 
-def run_tts(text, reference_audio, language_name, seed_num, voice_model):
+def run_tts(text, reference_audio, language_name, seed_num, voice_model, remove_noise=None):
     """
     Central TTS router (safe version).
     Returns None if generation fails.
+    remove_noise=False skips Chatterbox's per-file denoise (the dubbing loop batches it).
     """
 
     try:
+        params = TTS_GENERATION_PARAMS.get(voice_model, {})
         if voice_model == "Chatterbox Multilingual":
             return clone_voice_streaming(
                 text,
                 reference_audio,
                 lang_name=language_name,
-                exaggeration_input=0.5,
-                temperature_input=0.8,
+                exaggeration_input=params["exaggeration"],
+                temperature_input=params["temperature"],
                 seed_num_input=seed_num,
-                cfgw_input=0.5,
+                cfgw_input=params["cfg_weight"],
                 stereo=False,
-                remove_silence=False,
-                remove_noise=True,
+                remove_silence=params["remove_silence"],
+                remove_noise=params["remove_noise"] if remove_noise is None else remove_noise,
             )
 
         elif voice_model == "Chatterbox Turbo":
             return call_turbo_tts(text, reference_audio, seed_num)
 
         elif voice_model == "Kokoro":
-            return run_kokoro_tts(text, language=language_name,voice=reference_audio)
+            return run_kokoro_tts(text, language=language_name,voice=reference_audio, speed=params["speed"])
         elif voice_model == "Edge TTS":
             return edge_tts_generate(
                   text=text,
                   language=language_name,
                   voice_name=reference_audio,
-                  speed=1.0,
+                  speed=params["speed"],
               )
 
         # Future models here
@@ -283,9 +305,175 @@ def run_tts(text, reference_audio, language_name, seed_num, voice_model):
     return None
 
 
+def segment_cache_key(text, reference_audio, language_name, seed_num, voice_model):
+    return tts_cache_key(
+        text,
+        reference_audio,
+        seed_num,
+        voice_model,
+        language_name,
+        params=TTS_GENERATION_PARAMS.get(voice_model, {}),
+    )
+
+
+def cached_run_tts(text, reference_audio, language_name, seed_num, voice_model, use_cache=True):
+    """
+    run_tts behind the content-addressed TTS cache.
+    A hit returns the stored wav without touching any model.
+    """
+    if not use_cache:
+        return run_tts(text, reference_audio, language_name, seed_num, voice_model)
+
+    cache = get_tts_cache()
+    key = segment_cache_key(text, reference_audio, language_name, seed_num, voice_model)
+    cached_path = cache.get(key)
+    if cached_path is not None:
+        return cached_path
+
+    raw_path = run_tts(text, reference_audio, language_name, seed_num, voice_model)
+    if raw_path is not None and os.path.exists(raw_path):
+        cache.put(key, raw_path)
+    return raw_path
+
+
+
+
+# Short Chatterbox Multilingual segments decoded together in one T3 pass (1 = off)
+CHATTERBOX_BATCH_SIZE = int(os.getenv("CHATTERBOX_BATCH_SIZE", "8"))
+# Segments per batched denoise pass while the pipelined sync is waiting for them
+DENOISE_BATCH_SIZE = int(os.getenv("DENOISE_BATCH_SIZE", "32"))
+
 
+def tts_timing(save_path, actual_duration):
+    """(tts_duration, signed gap string) for the manifest."""
+    tts_duration = get_duration(path=save_path) if os.path.exists(save_path) else 0.0
+    gap = tts_duration - actual_duration
+    return tts_duration, f"+{gap}" if gap > 0 else str(gap)
 
 
+def denoise_segments(pending, dubbing_dict, use_tts_cache, on_segment=None):
+    """
+    Silero VAD gap collapsing (remove_noise_high_quality settings) over many
+    fresh Chatterbox segments in one batched VAD pass. Each wav is replaced
+    in place, its timing refreshed, then cached and handed to on_segment.
+    pending: [(segment_id, cache_key)], emptied.
+    """
+    if not pending:
+        return
+    paths = [dubbing_dict[segment_id]['tts_path'] for segment_id, _ in pending]
+    try:
+        cleaned_paths = remove_noise_batch(
+            paths,
+            threshold=0.5,
+            min_speech_duration_ms=150,
+            min_silence_duration_ms=100,
+            speech_pad_ms=30,
+            max_gap=0.9,
+            natural_pause=0.2,
+        )
+    except Exception as e:
+        print(f"⚠️ Batched noise removal failed: {e}")
+        cleaned_paths = paths
+    for (segment_id, key), path, cleaned in zip(pending, paths, cleaned_paths):
+        if os.path.abspath(cleaned) != os.path.abspath(path):
+            os.replace(cleaned, path)
+        info = dubbing_dict[segment_id]
+        info['tts_duration'], info['tts_actual_duration_diff'] = tts_timing(path, info['actual_duration'])
+        if use_tts_cache:
+            get_tts_cache().put(key, path)
+        if on_segment is not None:
+            on_segment(segment_id, info)
+    pending.clear()
+
+
+def segments_to_synthesize(dubbing_json, speaker_voice, language_name, redub, use_tts_cache, voice_model):
+    """
+    (segment_id, text, reference, seed) for segments that need fresh TTS (not
+    kept by redub, not cached). reference is the voice name for Kokoro / Edge
+    TTS and the reference audio path for the cloning models.
+    """
+    reference_field = "voice_name" if voice_model in ["Kokoro", "Edge TTS"] else "reference_audio"
+    cache = get_tts_cache() if use_tts_cache else None
+    for segment_id, seg in dubbing_json.items():
+        if redub and not seg.get('redub', False):
+            continue  # reuses the old tts_path
+        spk_info = speaker_voice.get(seg['speaker_id'], {})
+        reference = spk_info.get(reference_field, "")
+        seed = spk_info.get("fixed_seed", 0)
+        if cache is not None:
+            key = segment_cache_key(seg['text'], reference, language_name, seed, voice_model)
+            if cache.get(key) is not None:
+                continue
+        yield segment_id, seg['text'], reference, seed
+
+
+def submit_edge_tts(dubbing_json, speaker_voice, language_name, redub, use_tts_cache):
+    """
+    Edge TTS is network-bound: queue every segment that needs fresh audio at
+    once (EdgeTTSClient bounds the concurrency) and let _srt_to_dub collect
+    the results in order. Returns {segment_id: callable -> float32 array or None}.
+    """
+    client = get_edge_tts_client()
+    speed = TTS_GENERATION_PARAMS["Edge TTS"]["speed"]
+    return {
+        segment_id: client.submit(text, voice_name, speed).result
+        for segment_id, text, voice_name, _ in segments_to_synthesize(
+            dubbing_json, speaker_voice, language_name, redub, use_tts_cache, "Edge TTS")
+    }
+
+
+def plan_kokoro_batches(dubbing_json, speaker_voice, language_name, redub, use_tts_cache):
+    """
+    Short segments (<= KOKORO_BATCH_CHARS) are grouped per voice, up to
+    KOKORO_BATCH_SIZE per group, and each group goes through one Kokoro
+    pipeline call when its first segment comes up. Longer segments keep the
+    one-call-per-segment path. Returns {segment_id: callable -> float32 array or None}.
+    """
+    speed = TTS_GENERATION_PARAMS["Kokoro"]["speed"]
+    open_batches, jobs = {}, {}
+    for segment_id, text, voice_name, _ in segments_to_synthesize(
+            dubbing_json, speaker_voice, language_name, redub, use_tts_cache, "Kokoro"):
+        if len(text) > KOKORO_BATCH_CHARS:
+            continue
+        batch = open_batches.get(voice_name)
+        if batch is None or len(batch.items) >= KOKORO_BATCH_SIZE:
+            batch = open_batches[voice_name] = KokoroBatch(language_name, voice_name, speed)
+        batch.add(segment_id, text)
+        jobs[segment_id] = lambda batch=batch, segment_id=segment_id: batch.result(segment_id)
+    return jobs
+
+
+def plan_chatterbox_batches(dubbing_json, speaker_voice, language_name, redub, use_tts_cache):
+    """
+    Segments that fit one Chatterbox chunk (< 300 chars) are grouped per
+    speaker (reference audio + seed), up to CHATTERBOX_BATCH_SIZE per group,
+    and each group is decoded by one batched T3 pass when its first segment
+    comes up. Longer texts keep clone_voice_streaming's chunked path.
+    Returns {segment_id: callable -> float32 array or None}.
+    """
+    params = TTS_GENERATION_PARAMS["Chatterbox Multilingual"]
+    open_batches, jobs = {}, {}
+    for segment_id, text, reference_audio, seed in segments_to_synthesize(
+            dubbing_json, speaker_voice, language_name, redub, use_tts_cache, "Chatterbox Multilingual"):
+        if CHATTERBOX_BATCH_SIZE <= 1 or not reference_audio or not os.path.exists(reference_audio):
+            continue
+        if len(clean_text(text)) >= 300 or params["remove_silence"]:
+            continue
+        batch = open_batches.get((reference_audio, seed))
+        if batch is None or len(batch.items) >= CHATTERBOX_BATCH_SIZE:
+            batch = open_batches[(reference_audio, seed)] = ChatterboxBatch(
+                reference_audio,
+                lang_name=language_name,
+                exaggeration_input=params["exaggeration"],
+                temperature_input=params["temperature"],
+                seed_num_input=seed,
+                cfgw_input=params["cfg_weight"],
+                batch_size=CHATTERBOX_BATCH_SIZE,
+            )
+        batch.add(segment_id, text)
+        jobs[segment_id] = lambda batch=batch, segment_id=segment_id: batch.result(segment_id)
+    return jobs
+
 
 def srt_to_dub(
     media_file,
@@ -296,16 +484,27 @@ def srt_to_dub(
     # temperature_input=0.8,
     # cfgw_input=0.5,
     redub=False,
-    voice_model="Chatterbox Multilingual"
+    voice_model="Chatterbox Multilingual",
+    use_tts_cache=True,
+    on_segment=None,
 ):
-    global kokoro_pipeline
-    if voice_model=="Chatterbox Multilingual":
-      unload_turbo_model()
-    else:
-      unload_multilingual_model()
-
-
-
+    """
+    on_segment(segment_id, segment_info) is called as soon as each segment's
+    TTS wav is in ./dubbing_temp (used by the pipelined audio_sync in dubbing()).
+    """
+    # The TTS model stays pinned for the whole job; other models are only
+    # evicted by model_manager when the RAM/VRAM budget requires it.
+    model_name = tts_model_name(voice_model, language_name)
+    if model_name is None:
+        return _srt_to_dub(media_file, dubbing_json, speaker_voice, language_name,
+                           redub, voice_model, use_tts_cache, on_segment)
+    with model_manager.use(model_name):
+        return _srt_to_dub(media_file, dubbing_json, speaker_voice, language_name,
+                           redub, voice_model, use_tts_cache, on_segment)
+
+
+def _srt_to_dub(media_file, dubbing_json, speaker_voice, language_name,
+                redub, voice_model, use_tts_cache, on_segment=None):
     #create folders
     temp_folder = "./dubbing_temp"
     if not redub:
@@ -350,6 +549,20 @@ def srt_to_dub(
     #     tqdm(dubbing_json.keys(),
     #          total=len(dubbing_json),
     #          desc="Generating dubbed segments"),1):
+    # {segment_id: callable -> array} for backends that synthesize ahead / in batches
+    tts_jobs, tts_sr = {}, None
+    if voice_model == "Edge TTS":
+        tts_jobs, tts_sr = submit_edge_tts(dubbing_json, speaker_voice, language_name, redub, use_tts_cache), EDGE_TTS_SR
+    elif voice_model == "Kokoro":
+        tts_jobs, tts_sr = plan_kokoro_batches(dubbing_json, speaker_voice, language_name, redub, use_tts_cache), KOKORO_SR
+    elif voice_model == "Chatterbox Multilingual":
+        tts_jobs, tts_sr = plan_chatterbox_batches(dubbing_json, speaker_voice, language_name, redub, use_tts_cache), 24000
+
+    # Chatterbox Multilingual output is denoised in batched VAD passes: once for the
+    # whole run, or every DENOISE_BATCH_SIZE segments when the pipelined sync is waiting
+    denoise = voice_model == "Chatterbox Multilingual" and TTS_GENERATION_PARAMS[voice_model]["remove_noise"]
+    pending_denoise = []  # (segment_id, cache key)
+
     total_segments = len(dubbing_json)
     for idx, segment_id in enumerate(dubbing_json.keys(), start=1):
         clear_screen()
@@ -388,32 +601,32 @@ def srt_to_dub(
 
         save_path = f"{temp_folder}/{segment_id}.wav"
 
-        if voice_model == "Chatterbox Multilingual":
-            unload_turbo_model()
-
-        elif voice_model == "Chatterbox Turbo":
-            unload_multilingual_model()
-
-        elif voice_model == "Kokoro":
-            if kokoro_pipeline is not None:
-                del kokoro_pipeline
-                kokoro_pipeline = None
-
-            gc.collect()
-            if torch:
-                torch.cuda.empty_cache()
-
-
         raw_path = None
+        tts_audio = None
+        needs_denoise = False
+        cache_key = segment_cache_key(text, reference_audio, language_name, seed_num_input, voice_model)
+
+        if segment_id in tts_jobs:
+            tts_audio = tts_jobs[segment_id]()
+            if tts_audio is not None:
+                sf.write(save_path, tts_audio, tts_sr)
+                raw_path = save_path
+                if denoise:
+                    needs_denoise, tts_audio = True, None
+                elif use_tts_cache:
+                    get_tts_cache().put(cache_key, save_path)
 
-        if redub and redub_tts:
-            raw_path = run_tts(text, reference_audio, language_name, seed_num_input, voice_model)
-        
         elif redub and not redub_tts:
             raw_path = old_json["segments"][segment_id]['tts_path']
-        
+
+        elif denoise:
+            raw_path = get_tts_cache().get(cache_key) if use_tts_cache else None
+            if raw_path is None:
+                raw_path = run_tts(text, reference_audio, language_name, seed_num_input, voice_model, remove_noise=False)
+                needs_denoise = raw_path is not None
+
         else:
-            raw_path = run_tts(text, reference_audio, language_name, seed_num_input, voice_model)
+            raw_path = cached_run_tts(text, reference_audio, language_name, seed_num_input, voice_model, use_tts_cache)
         
         if raw_path is None:
             make_silence(actual_duration, save_path)
@@ -427,12 +640,7 @@ def srt_to_dub(
 
 
    
-        tts_duration=get_duration(path=save_path) if os.path.exists(save_path) else 0.0
-        gap=tts_duration-actual_duration
-        if gap>0:
-            gap=f"+{gap}"
-        else:
-            gap=str(gap)
+        tts_duration, gap = tts_timing(save_path, actual_duration)
         dubbing_dict[segment_id] = {
             'text': raw_text,
             'dubbing':text,
@@ -453,29 +661,24 @@ def srt_to_dub(
             # 'cfgw': cfgw_input,
             'reference_audio': reference_audio,
         }
+        if needs_denoise:
+            pending_denoise.append((segment_id, cache_key))
+            if on_segment is not None and len(pending_denoise) >= DENOISE_BATCH_SIZE:
+                denoise_segments(pending_denoise, dubbing_dict, use_tts_cache, on_segment)
+        elif on_segment is not None:
+            segment_info = dubbing_dict[segment_id]
+            if tts_audio is not None:
+                # hand the decoded audio to the sync stage instead of re-reading the wav
+                segment_info = dict(segment_info, tts_audio=(tts_audio, tts_sr))
+            on_segment(segment_id, segment_info)
+    denoise_segments(pending_denoise, dubbing_dict, use_tts_cache, on_segment)
     json_result["segments"]=dubbing_dict
+    if use_tts_cache:
+        get_tts_cache().save()
     with open(json_path, "w", encoding="utf-8") as f:
       json.dump(json_result, f, ensure_ascii=False, indent=4)
 
     redubbing_prompt=prepare_redub_data_and_get_prompt(json_path, language=language_name, threshold=0.9)
-    # =========================
-    # Post-clean models
-    # =========================
-    if voice_model == "Chatterbox Multilingual":
-        unload_multilingual_model()
-
-    elif voice_model == "Chatterbox Turbo":
-        unload_turbo_model()
-
-    elif voice_model == "Kokoro":
-        if kokoro_pipeline is not None:
-            del kokoro_pipeline
-            kokoro_pipeline = None
-
-        gc.collect()
-        if torch:
-            torch.cuda.empty_cache()
-
     return json_result,json_path,redubbing_prompt
 
 
@@ -516,6 +719,43 @@ def srt_to_dub(
 # Step 6: Main dubbing function
 # --------------------------
 
+def pipelined_srt_to_dub(
+    media_file,
+    dubbing_json,
+    speaker_voice,
+    language_name="English",
+    redub=False,
+    voice_model="Chatterbox Multilingual",
+    use_tts_cache=True,
+):
+    """
+    srt_to_dub with each segment trimmed / stretched on CPU workers while TTS
+    generates the next ones. Returns (json_result, json_path, redubbing_prompt,
+    dubbed audio path); if synthesis fails the sync workers are stopped.
+    """
+    timeline_order = sorted(dubbing_json.keys(), key=lambda k: dubbing_json[k]['start'])
+    timeline_index = {segment_id: i for i, segment_id in enumerate(timeline_order)}
+    sync = PipelinedAudioSync()
+    on_segment = lambda segment_id, info: sync.submit(timeline_index[segment_id], info)
+    try:
+        json_result,json_path,redubbing_prompt=srt_to_dub(
+            media_file,
+            dubbing_json,
+            speaker_voice,
+            language_name,
+            redub=redub,
+            voice_model=voice_model,
+            use_tts_cache=use_tts_cache,
+            on_segment=on_segment,
+        )
+    except BaseException:
+        sync.abort()
+        raise
+    save_path=sync.finish(json_result['save_path'])
+    record_placements(json_path, {timeline_order[i]: p for i, p in sync.placements.items()})
+    return json_result,json_path,redubbing_prompt,save_path
+
+
 def dubbing(
     media_file,
     dubbing_json,
@@ -526,27 +766,26 @@ def dubbing(
     # cfgw_input=0.5,
     want_subtile=False,
     redub=False,
-    voice_model="Chatterbox Multilingual"
+    voice_model="Chatterbox Multilingual",
+    use_tts_cache=True,
+    pipelined=True,
+    job_id=None,
 ):
     # curr_dir=os.getcwd()
     # json_path = os.path.join(curr_dir, "json_input.json")
     # if redub and os.path.exists(json_path):
     #     dubbing_json=make_json_for_redub(json_path,dubbing_json)
     # print(dubbing_json)
-    json_result,json_path,redubbing_prompt=srt_to_dub(
-        media_file,
-        dubbing_json,
-        speaker_voice,
-        language_name,
-        # exaggeration_input,
-        # temperature_input,
-        # cfgw_input,
-        redub,
-        voice_model
-
+    # Checkpointed: rerunning an unchanged job reuses its synthesis / sync / subtitles
+    runner = JobRunner(job_id or default_job_id(media_file, language_name, voice_model))
+    dub = run_dub_stages(
+        runner, media_file, dubbing_json, speaker_voice,
+        language_name=language_name, voice_model=voice_model, use_tts_cache=use_tts_cache,
+        redub=redub, pipelined=pipelined, want_subtitle=want_subtile,
     )
-    save_path=audio_sync(json_path)
+    save_path, redubbing_prompt = dub["dubbed_audio"], dub["redubbing_prompt"]
     default_srt,custom_srt, word_srt, shorts_srt=None,None,None,None
     if want_subtile:
-         default_srt, translated_srt_path, custom_srt, word_srt, shorts_srt, txt_path,sentence_json,word_json, transcript= subtitle_maker(save_path, language_name, language_name)
+         # Built from the dub's own text + placement (forced-aligned words), no Whisper pass
+         default_srt, translated_srt_path, custom_srt, word_srt, shorts_srt, txt_path,sentence_json,word_json, transcript= dub["subtitles"]
     return save_path ,save_path,default_srt,custom_srt, word_srt, shorts_srt,redubbing_prompt
@@ -146,11 +146,21 @@ male_voice_list= {'Vietnamese': 'vi-VN-NamMinhNeural',
 import os
 import re
 import uuid
-import subprocess
-from pydub import AudioSegment
-
+import asyncio
+import threading
+import numpy as np
+import soundfile as sf
 
 
+EDGE_TTS_SR = 24000  # Edge TTS streams 24 kHz mono MP3
+# Requests in flight at once
+EDGE_TTS_CONCURRENCY = int(os.getenv("EDGE_TTS_CONCURRENCY", "8"))
+# New requests per second (0 = only the concurrency cap)
+EDGE_TTS_RATE_LIMIT = float(os.getenv("EDGE_TTS_RATE_LIMIT", "0"))
+EDGE_TTS_RETRIES = int(os.getenv("EDGE_TTS_RETRIES", "3"))
+# "" = Microsoft's service through the edge-tts library; an http URL = a stand-in
+# server that answers POST {"text", "voice", "rate"} with the audio bytes
+EDGE_TTS_ENDPOINT = os.getenv("EDGE_TTS_ENDPOINT", "")
 
 
 # ---------- temp filename ----------
@@ -175,13 +185,144 @@ def calculate_rate_string(speed):
     return f"{sign}{abs(int(rate))}"
 
 
+# ---------- in-memory decode ----------
+async def decode_audio_bytes(data, sr=EDGE_TTS_SR):
+    """MP3 (or any ffmpeg-readable) bytes -> mono float32 at sr, through pipes, no files."""
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-v", "error",
+        "-i", "pipe:0",
+        "-ac", "1",
+        "-ar", str(sr),
+        "-f", "f32le", "pipe:1",
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+    )
+    out, _ = await process.communicate(data)
+    if process.returncode != 0 or not out:
+        raise RuntimeError("ffmpeg could not decode the Edge TTS audio")
+    return np.frombuffer(out[:len(out) - len(out) % 4], dtype=np.float32).copy()
+
+
+# ---------- async client ----------
+class EdgeTTSClient:
+    """
+    Edge TTS in-process on one long-lived asyncio loop (daemon thread), so
+    any thread can submit() and get a concurrent Future back. At most
+    `concurrency` syntheses run at once, new requests are spaced to
+    `rate_limit` per second, failures are retried with backoff, and the MP3
+    is decoded in memory: results are float32 arrays at EDGE_TTS_SR (None on
+    failure).
+
+    With an endpoint, requests go to that URL over one shared aiohttp
+    session (keep-alive pool); without, through edge_tts.Communicate, which
+    opens its own websocket per utterance.
+    """
+
+    def __init__(self, endpoint=EDGE_TTS_ENDPOINT, concurrency=EDGE_TTS_CONCURRENCY,
+                 rate_limit=EDGE_TTS_RATE_LIMIT, retries=EDGE_TTS_RETRIES):
+        self.endpoint = endpoint or None
+        self.concurrency = max(1, concurrency)
+        self.rate_limit = rate_limit
+        self.retries = retries
+        self.loop = None
+        self.lock = threading.Lock()
+        self._session = None
+        self._semaphore = None
+        self._rate_lock = None
+        self._next_slot = 0.0
+
+    def _ensure_loop(self):
+        with self.lock:
+            if self.loop is None:
+                self.loop = asyncio.new_event_loop()
+                threading.Thread(target=self.loop.run_forever, name="edge-tts-loop", daemon=True).start()
+            return self.loop
+
+    async def _setup(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._rate_lock = asyncio.Lock()
+
+    async def _throttle(self):
+        if not self.rate_limit or self.rate_limit <= 0:
+            return
+        async with self._rate_lock:
+            now = self.loop.time()
+            wait = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + 1.0 / self.rate_limit
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    async def _fetch(self, text, voice, rate):
+        if self.endpoint:
+            import aiohttp
+            if self._session is None:
+                self._session = aiohttp.ClientSession(
+                    connector=aiohttp.TCPConnector(limit=self.concurrency),
+                    timeout=aiohttp.ClientTimeout(total=60),
+                )
+            async with self._session.post(self.endpoint, json={"text": text, "voice": voice, "rate": rate}) as response:
+                response.raise_for_status()
+                return await response.read()
+
+        import edge_tts
+        chunks = []
+        async for chunk in edge_tts.Communicate(text, voice, rate=rate).stream():
+            if chunk["type"] == "audio":
+                chunks.append(chunk["data"])
+        return b"".join(chunks)
+
+    async def _synthesize(self, text, voice, speed):
+        await self._setup()
+        rate = f"{calculate_rate_string(speed)}%"
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                await self._throttle()
+                try:
+                    data = await self._fetch(text, voice, rate)
+                    if not data:
+                        raise RuntimeError("no audio received")
+                    return await decode_audio_bytes(data)
+                except Exception as e:
+                    if attempt == self.retries:
+                        print("⚠️ Edge-TTS failed:", e)
+                        return None
+                    await asyncio.sleep(0.5 * 2 ** attempt)
+
+    def submit(self, text, voice, speed=1.0):
+        """Queue one synthesis; returns a concurrent.futures.Future of the array (or None)."""
+        return asyncio.run_coroutine_threadsafe(self._synthesize(text, voice, speed), self._ensure_loop())
+
+    def synthesize(self, text, voice, speed=1.0):
+        return self.submit(text, voice, speed).result()
+
+    def synthesize_many(self, items):
+        """items: (text, voice, speed) tuples, all in flight together; arrays in input order."""
+        futures = [self.submit(*item) for item in items]
+        return [future.result() for future in futures]
+
+    def close(self):
+        if self.loop is not None and self._session is not None:
+            asyncio.run_coroutine_threadsafe(self._session.close(), self.loop).result()
+            self._session = None
+
+
+_edge_tts_client = None
+
+
+def get_edge_tts_client():
+    global _edge_tts_client
+    if _edge_tts_client is None:
+        _edge_tts_client = EdgeTTSClient()
+    return _edge_tts_client
+
+
 # ---------- main edge tts function ----------
 def edge_tts_generate(text, language, voice_name="en-US-AvaMultilingualNeural", speed=1.0):
     """
-    Edge TTS CLI wrapper:
-    - No async
-    - Saves WAV audio
-    - Safe for pipelines / Gradio
+    Synthesizes one line with the shared EdgeTTSClient and saves it as WAV.
+    Returns the wav path, or None on failure.
     """
 
     # pick voice
@@ -193,52 +334,28 @@ def edge_tts_generate(text, language, voice_name="en-US-AvaMultilingualNeural",
 
     # if not voice:
     #     raise ValueError(f"No voice configured for {language}")
-    voice=voice_name
-    base_path = temp_tts_file_name(text, language)
-    mp3_path = base_path + ".mp3"
-    wav_path = base_path + ".wav"
-
-    cmd = [
-        "edge-tts",
-        f"--rate={calculate_rate_string(speed)}%",
-        "--voice", voice,
-        "--text", text,
-        "--write-media", mp3_path,
-    ]
-
-    try:
-        subprocess.run(
-            cmd,
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-        )
-
-        # convert mp3 → wav
-        audio = AudioSegment.from_mp3(mp3_path)
-        audio.export(wav_path, format="wav")
-
-        os.remove(mp3_path)
-        return wav_path
-
-    except Exception as e:
-        print("⚠️ Edge-TTS failed:", e)
+    audio = get_edge_tts_client().synthesize(text, voice_name, speed)
+    if audio is None:
         return None
+    wav_path = temp_tts_file_name(text, language) + ".wav"
+    sf.write(wav_path, audio, EDGE_TTS_SR)
+    return wav_path
 
 
 # ---------- example run ----------
 if __name__ == "__main__":
-  #  from edge_tts_code import edge_tts_generate
+  #  from edge_tts_code import edge_tts_generate, get_edge_tts_client
   #  raw_path = edge_tts_generate(
   #       text="Hello",
   #       language="English",
-  #       gender="Female",
+  #       voice_name=female_voice_list["English"],
   #       speed=1.0,
   #   )
+  #  arrays = get_edge_tts_client().synthesize_many([("Hello", female_voice_list["English"], 1.0)] * 20)
     path = edge_tts_generate(
         text="Hello",
         language="English",
-        gender="Female",
+        voice_name=female_voice_list["English"],
         speed=1.0,
     )
 
@@ -0,0 +1,353 @@
+#@title /content/Video-Dubbing/job_runner.py
+# %%writefile /content/Video-Dubbing/job_runner.py
+import os
+import json
+import time
+import hashlib
+import traceback
+
+from tts_cache import file_content_hash
+
+
+JOBS_DIR = "./jobs"
+
+
+def _json_default(value):
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def hash_payload(payload):
+    data = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def hash_files(paths):
+    """{path: sha1} for existing files (missing ones hash to None so they still change the key)."""
+    hashes = {}
+    for path in paths:
+        if path and os.path.isfile(path):
+            hashes[path] = file_content_hash(path)
+        elif path:
+            hashes[path] = None
+    return hashes
+
+
+class Stage:
+    """
+    One node of the job graph.
+
+    func(**kwargs) returns a JSON-serializable result. The stage key hashes
+    its name + version, params, the content of input_files and the keys of
+    the stages it depends on; outputs(result) lists the files it produced,
+    whose hashes are recorded so a stage whose files were overwritten (the
+    pipeline still shares cwd folders between jobs) is rerun.
+    """
+
+    def __init__(self, name, func, params=None, input_files=None, depends_on=None,
+                 outputs=None, version=1):
+        self.name = name
+        self.func = func
+        self.params = params or {}
+        self.input_files = input_files or []
+        self.depends_on = depends_on or []
+        self.outputs = outputs or (lambda result: [])
+        self.version = version
+
+
+class JobRunner:
+    """
+    Runs stages in order and keeps a manifest per job in ./jobs/<job_id>/manifest.json.
+
+    A stage is skipped (its stored result returned) when its key is unchanged
+    and its output files still match; otherwise it reruns, and so does
+    everything downstream since their keys include its key. A crash leaves the
+    finished stages in the manifest, so the next run resumes at the failed one.
+    """
+
+    def __init__(self, job_id, jobs_dir=JOBS_DIR):
+        self.job_id = job_id
+        self.job_dir = os.path.join(jobs_dir, job_id)
+        os.makedirs(self.job_dir, exist_ok=True)
+        self.manifest_path = os.path.join(self.job_dir, "manifest.json")
+        self.manifest = self._load_manifest()
+        self.keys = {}
+
+    def _load_manifest(self):
+        if os.path.exists(self.manifest_path):
+            try:
+                with open(self.manifest_path, "r", encoding="utf-8") as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print("⚠️ Job manifest unreadable, starting fresh")
+        return {"job_id": self.job_id, "stages": {}}
+
+    def _save_manifest(self):
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2, ensure_ascii=False, default=_json_default)
+        os.replace(temp_path, self.manifest_path)
+
+    def stage_key(self, stage):
+        return hash_payload({
+            "stage": stage.name,
+            "version": stage.version,
+            "params": stage.params,
+            "input_files": hash_files(stage.input_files),
+            "depends_on": {dep: self.keys.get(dep) for dep in stage.depends_on},
+        })
+
+    def is_fresh(self, stage, key):
+        entry = self.manifest["stages"].get(stage.name)
+        if not entry or entry.get("status") != "done" or entry.get("key") != key:
+            return False
+        recorded = entry.get("outputs", {})
+        return all(hash_files([path]).get(path) == digest for path, digest in recorded.items())
+
+    def _record_key(self, stage, key, outputs):
+        # Dependents hash this, so a rerun that writes different files
+        # (e.g. a new timeline) invalidates them even with unchanged params.
+        self.keys[stage.name] = hash_payload([key, outputs])
+
+    def run(self, stage, force=False):
+        key = self.stage_key(stage)
+
+        if not force and self.is_fresh(stage, key):
+            print(f"⏭️ {stage.name}: unchanged, reusing previous result")
+            entry = self.manifest["stages"][stage.name]
+            self._record_key(stage, key, entry.get("outputs", {}))
+            return entry["result"]
+
+        print(f"▶️ {stage.name}")
+        started = time.time()
+        self.manifest["stages"][stage.name] = {"key": key, "status": "running", "started_at": started}
+        self._save_manifest()
+        try:
+            result = stage.func(**stage.params)
+        except Exception as e:
+            self.manifest["stages"][stage.name].update(
+                status="failed", error=str(e), traceback=traceback.format_exc()
+            )
+            self._save_manifest()
+            raise
+
+        self.manifest["stages"][stage.name] = {
+            "key": key,
+            "status": "done",
+            "started_at": started,
+            "seconds": round(time.time() - started, 2),
+            "result": result,
+            "outputs": hash_files(stage.outputs(result)),
+        }
+        self._save_manifest()
+        self._record_key(stage, key, self.manifest["stages"][stage.name]["outputs"])
+        return result
+
+    def result(self, name):
+        entry = self.manifest["stages"].get(name)
+        return entry.get("result") if entry else None
+
+
+def default_job_id(media_file, language_name, voice_model):
+    media_hash = file_content_hash(media_file) if os.path.isfile(media_file) else media_file
+    return hash_payload([media_hash, language_name, voice_model])[:16]
+
+
+# =========================
+# DUBBING JOB GRAPH
+# =========================
+def run_dub_stages(
+    runner,
+    media_file,
+    dubbing_json,
+    speaker_voice,
+    language_name="English",
+    voice_model="Chatterbox Multilingual",
+    use_tts_cache=True,
+    redub=False,
+    pipelined=True,
+    want_subtitle=False,
+    force_stages=(),
+):
+    """
+    synthesis → sync → subtitles on runner. With pipelined=True segments are
+    trimmed / stretched while TTS generates, so sync happens inside the
+    synthesis stage. Every file a stage writes that a later stage reads is
+    listed in its outputs (json_input.json, the TTS wavs, the dubbed audio,
+    json_input_timeline.json).
+    """
+    from dubbing_pipeline import srt_to_dub, pipelined_srt_to_dub
+    from audio_sync_pipeline import audio_sync, timeline_path
+    from dub_subtitles import dub_subtitle_maker
+
+    force_stages = set(force_stages)
+
+    def synthesis_stage(dubbing_json, speaker_voice, language_name, voice_model,
+                        use_tts_cache, redub, pipelined):
+        save_path = None
+        if pipelined:
+            json_result, json_path, redubbing_prompt, save_path = pipelined_srt_to_dub(
+                media_file, dubbing_json, speaker_voice, language_name,
+                redub=redub, voice_model=voice_model, use_tts_cache=use_tts_cache,
+            )
+        else:
+            json_result, json_path, redubbing_prompt = srt_to_dub(
+                media_file, dubbing_json, speaker_voice, language_name,
+                redub=redub, voice_model=voice_model, use_tts_cache=use_tts_cache,
+            )
+        return {"json_path": json_path, "redubbing_prompt": redubbing_prompt, "save_path": save_path,
+                "tts_paths": [seg["tts_path"] for seg in json_result["segments"].values()]}
+
+    def synthesis_outputs(r):
+        synced = [r["save_path"], timeline_path(r["json_path"])] if r["save_path"] else []
+        return [r["json_path"]] + r["tts_paths"] + synced
+
+    synthesis = runner.run(Stage(
+        "synthesis", synthesis_stage,
+        params={"dubbing_json": dubbing_json, "speaker_voice": speaker_voice,
+                "language_name": language_name, "voice_model": voice_model,
+                "use_tts_cache": use_tts_cache, "redub": redub, "pipelined": pipelined},
+        input_files=[v.get("reference_audio") for v in speaker_voice.values() if isinstance(v, dict)],
+        outputs=synthesis_outputs,
+    ), force="synthesis" in force_stages)
+
+    if pipelined:
+        sync_stage, dubbed_audio_path = "synthesis", synthesis["save_path"]
+    else:
+        sync_stage = "sync"
+        dubbed_audio_path = runner.run(Stage(
+            "sync", lambda json_path: audio_sync(json_path),
+            params={"json_path": synthesis["json_path"]},
+            depends_on=["synthesis"],
+            outputs=lambda r: [r, timeline_path(synthesis["json_path"])],
+        ), force="sync" in force_stages)
+
+    subtitles = None
+    if want_subtitle:
+        subtitles = runner.run(Stage(
+            "subtitles", lambda: list(dub_subtitle_maker(synthesis["json_path"], dubbed_audio_path, language_name)),
+            params={"language_name": language_name},
+            depends_on=[sync_stage],
+            outputs=lambda r: [p for p in r[:8] if isinstance(p, str)],
+        ), force="subtitles" in force_stages)
+
+    return {
+        "json_path": synthesis["json_path"],
+        "dubbed_audio": dubbed_audio_path,
+        "sync_stage": sync_stage,
+        "subtitles": subtitles,
+        "redubbing_prompt": synthesis["redubbing_prompt"],
+    }
+
+
+def run_dubbing_job(
+    media_file,
+    llm_result_text,
+    language_name="English",
+    voice_model="Chatterbox Multilingual",
+    want_subtitle=False,
+    recover_audio=True,
+    need_video=True,
+    use_tts_cache=True,
+    pipelined=True,
+    job_id=None,
+    force_stages=(),
+):
+    """
+    speakers → synthesis → sync → subtitles → music → video, each checkpointed.
+
+    Editing only the mixing flags (recover_audio / need_video / want_subtitle)
+    reruns just those stages; a crash mid-synthesis resumes at synthesis, where
+    the TTS cache makes already-generated segments free.
+    """
+    from utils import get_dubbing_json, get_speakers, add_gender_to_speakers, restore_music, make_video
+    from find_voice import get_voice_name
+
+    job_id = job_id or default_job_id(media_file, language_name, voice_model)
+    runner = JobRunner(job_id)
+    force_stages = set(force_stages)
+    llm_data = json.loads(llm_result_text) if isinstance(llm_result_text, str) else llm_result_text
+    have_music = voice_model in ["Chatterbox Multilingual", "Chatterbox Turbo"]
+
+    def speakers_stage(llm_data, have_music, language_name, voice_model):
+        speaker_voice = get_speakers(media_file, have_music, llm_data)
+        if voice_model in ["Kokoro", "Edge TTS"]:
+            speaker_voice = add_gender_to_speakers(speaker_voice)
+            speaker_voice = get_voice_name(speaker_voice, language=language_name, voice_model=voice_model)
+        return {str(k): v for k, v in speaker_voice.items()}
+
+    speaker_voice = runner.run(Stage(
+        "speakers", speakers_stage,
+        params={"llm_data": llm_data, "have_music": have_music,
+                "language_name": language_name, "voice_model": voice_model},
+        input_files=[media_file],
+        outputs=lambda r: [v.get("reference_audio") for v in r.values()],
+    ), force="speakers" in force_stages)
+    speaker_voice = {int(k): v for k, v in speaker_voice.items()}
+
+    dub = run_dub_stages(
+        runner, media_file, get_dubbing_json(llm_data), speaker_voice,
+        language_name=language_name, voice_model=voice_model, use_tts_cache=use_tts_cache,
+        pipelined=pipelined, want_subtitle=want_subtitle, force_stages=force_stages,
+    )
+    dubbed_audio_path = dub["dubbed_audio"]
+
+    dubbed_audio_with_music, background_audio = None, None
+    if recover_audio:
+        music = runner.run(Stage(
+            "music", lambda: list(restore_music(media_file, dubbed_audio_path)),
+            input_files=[media_file], depends_on=[dub["sync_stage"]],
+            outputs=lambda r: r,
+        ), force="music" in force_stages)
+        dubbed_audio_with_music, background_audio = music
+
+    video_path = None
+    if need_video:
+        final_audio = dubbed_audio_with_music or dubbed_audio_path
+        video_path = runner.run(Stage(
+            "video", lambda: make_video(media_file, final_audio, language_name),
+            params={"audio": final_audio},
+            input_files=[media_file], depends_on=[dub["sync_stage"]] + (["music"] if recover_audio else []),
+            outputs=lambda r: [r] if r else [],
+        ), force="video" in force_stages)
+
+    return {
+        "job_id": job_id,
+        "dubbed_audio": dubbed_audio_path,
+        "dubbed_audio_with_music": dubbed_audio_with_music,
+        "background_audio": background_audio,
+        "video": video_path,
+        "subtitles": dub["subtitles"],
+        "redubbing_prompt": dub["redubbing_prompt"],
+        "manifest": runner.manifest_path,
+    }
+
+def run_transcription_job(media_file, input_lang=None, num_speakers=None, remove_music=True,
+                          make_small_segments=True, job_id=None, force=False):
+    """Checkpointed whisper_diarization.speech_to_text (transcription + diarization + separation)."""
+    from whisper_diarization import speech_to_text
+
+    job_id = job_id or default_job_id(media_file, input_lang, "transcription")
+    runner = JobRunner(job_id)
+
+    def transcription_stage(input_lang, num_speakers, remove_music, make_small_segments):
+        res, used_audio_file = speech_to_text(
+            media_file, language_name=input_lang, number_of_speakers=num_speakers,
+            remove_music=remove_music, make_small_segments=make_small_segments,
+        )
+        return {"result": res, "used_audio_file": used_audio_file}
+
+    out = runner.run(Stage(
+        "transcription", transcription_stage,
+        params={"input_lang": input_lang, "num_speakers": num_speakers,
+                "remove_music": remove_music, "make_small_segments": make_small_segments},
+        input_files=[media_file],
+        outputs=lambda r: [r["used_audio_file"]],
+    ), force=force)
+    return out["result"], out["used_audio_file"]
+
+
+# from job_runner import run_dubbing_job
+# result = run_dubbing_job("/content/video.mp4", llm_result_text, language_name="Hindi")
+# # rerun after a crash / with only recover_audio changed → finished stages are skipped
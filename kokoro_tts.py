@@ -0,0 +1,161 @@
+#@title /content/Video-Dubbing/kokoro_tts.py
+# %%writefile /content/Video-Dubbing/kokoro_tts.py
+import os
+import re
+import numpy as np
+import torch
+from kokoro import KPipeline
+from model_manager import model_manager
+
+
+KOKORO_SR = 24000
+# Segments up to this many characters are synthesized together ...
+KOKORO_BATCH_CHARS = int(os.getenv("KOKORO_BATCH_CHARS", "120"))
+# ... at most this many per pipeline call
+KOKORO_BATCH_SIZE = int(os.getenv("KOKORO_BATCH_SIZE", "16"))
+
+KOKORO_LANGUAGE_MAP = {
+    "English": "a",
+    "American English": "a",
+    "British English": "b",
+    "Hindi": "h",
+    "Spanish": "e",
+    "French": "f",
+    "Italian": "i",
+    "Brazilian Portuguese": "p",
+    "Japanese": "j",
+    "Mandarin Chinese": "z",
+}
+
+# =========================
+# GLOBAL PIPELINES
+# =========================
+# One KPipeline per Kokoro lang_code, kept warm by model_manager between segments and jobs.
+kokoro_pipelines = {}
+# Voice packs (style tensors) per (lang_code, voice), loaded once per pipeline
+kokoro_voices = {}
+
+
+def kokoro_model_name(lang_code):
+    return f"kokoro-{lang_code}"
+
+
+def register_kokoro_pipeline(lang_code):
+    name = kokoro_model_name(lang_code)
+    if model_manager.is_registered(name):
+        return name
+
+    def load():
+        if lang_code not in kokoro_pipelines:
+            kokoro_pipelines[lang_code] = KPipeline(lang_code=lang_code)
+        return kokoro_pipelines[lang_code]
+
+    def unload():
+        kokoro_pipelines.pop(lang_code, None)
+        for key in [k for k in kokoro_voices if k[0] == lang_code]:
+            kokoro_voices.pop(key, None)
+
+    model_manager.register(
+        name,
+        loader=load,
+        unloader=unload,
+        is_loaded=lambda: lang_code in kokoro_pipelines,
+        device="cuda" if torch.cuda.is_available() else "cpu",
+    )
+    return name
+
+
+def kokoro_pipeline(language="English"):
+    """(lang_code, warm KPipeline) for a language name (unknown → American English)."""
+    lang_code = KOKORO_LANGUAGE_MAP.get(language, "a")
+    return lang_code, model_manager.get(register_kokoro_pipeline(lang_code))
+
+
+def kokoro_voice(pipeline, lang_code, voice):
+    """The voice pack tensor, read from disk / the hub once; passed to the pipeline instead of the name."""
+    key = (lang_code, voice)
+    if key not in kokoro_voices:
+        kokoro_voices[key] = pipeline.load_voice(voice)
+    return kokoro_voices[key]
+
+
+def _to_numpy(audio):
+    if isinstance(audio, torch.Tensor):
+        audio = audio.detach().cpu().numpy()
+    return np.asarray(audio, dtype=np.float32).reshape(-1)
+
+
+# =========================
+# SYNTHESIS
+# =========================
+def kokoro_synthesize(text, language="English", voice="af_heart", speed=1.0):
+    """All chunks the pipeline yields for text, joined into one float32 array at KOKORO_SR."""
+    lang_code, pipeline = kokoro_pipeline(language)
+    chunks = [
+        _to_numpy(result.audio)
+        for result in pipeline(text, voice=kokoro_voice(pipeline, lang_code, voice), speed=speed)
+        if result.audio is not None
+    ]
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.float32)
+
+
+def kokoro_synthesize_batch(texts, language="English", voice="af_heart", speed=1.0):
+    """
+    Several texts in one pipeline call: KPipeline takes a list and tags each
+    yielded chunk with the index of the text it came from, so the chunks are
+    regrouped per text. Returns one float32 array per text.
+    """
+    lang_code, pipeline = kokoro_pipeline(language)
+    lines = [re.sub(r"\s+", " ", text).strip() for text in texts]
+    chunks = [[] for _ in lines]
+    for result in pipeline(lines, voice=kokoro_voice(pipeline, lang_code, voice), speed=speed):
+        index = getattr(result, "text_index", None)
+        if index is None:
+            # Older kokoro without text_index: can't regroup, synthesize one by one
+            return [kokoro_synthesize(text, language, voice, speed) for text in lines]
+        if result.audio is not None:
+            chunks[index].append(_to_numpy(result.audio))
+    return [np.concatenate(c) if c else np.zeros(0, dtype=np.float32) for c in chunks]
+
+
+class KokoroBatch:
+    """
+    Short segments sharing one voice. The whole batch is synthesized by a
+    single pipeline call the first time any of its segments is asked for, so
+    segments can still be consumed (and streamed on) in timeline order.
+    """
+
+    def __init__(self, language="English", voice="af_heart", speed=1.0):
+        self.language = language
+        self.voice = voice
+        self.speed = speed
+        self.items = []  # (segment_id, text)
+        self.audio = None
+
+    def add(self, segment_id, text):
+        self.items.append((segment_id, text))
+
+    def result(self, segment_id):
+        """float32 array for one segment, or None if it failed (or was empty)."""
+        if self.audio is None:
+            texts = [text for _, text in self.items]
+            try:
+                arrays = kokoro_synthesize_batch(texts, self.language, self.voice, self.speed)
+            except Exception as e:
+                print(f"⚠️ Kokoro batch failed ({e}), synthesizing one by one")
+                arrays = []
+                for text in texts:
+                    try:
+                        arrays.append(kokoro_synthesize(text, self.language, self.voice, self.speed))
+                    except Exception as e:
+                        print(f"⚠️ TTS failed (Kokoro): {e}")
+                        arrays.append(None)
+            self.audio = {
+                sid: audio if audio is not None and len(audio) else None
+                for (sid, _), audio in zip(self.items, arrays)
+            }
+        return self.audio.get(segment_id)
+
+# from kokoro_tts import kokoro_synthesize, kokoro_synthesize_batch
+# audio = kokoro_synthesize("Hello there.", language="English", voice="af_heart")
+# batch = kokoro_synthesize_batch(["Hi.", "How are you?"], language="English", voice="af_heart")
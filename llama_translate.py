@@ -1,8 +1,17 @@
 import os
+import re
+import gc
+import threading
 import requests
 import urllib.request
 import urllib.error
 from tqdm.auto import tqdm
+
+from model_manager import model_manager
+try:
+    from STT.translation import TranslationBackend, get_translator
+except ImportError:
+    from translation import TranslationBackend, get_translator
 def download_file(url: str, download_file_path: str, redownload: bool = False) -> bool:
     """Download a single file with urllib + tqdm progress bar."""
     base_path = os.path.dirname(download_file_path)
@@ -86,66 +95,230 @@ def llama_system_prompt(task, source_lang, target_lang):
 
 
 
-def hunyuan_mt_translate(timestamp, source_lang="English", target_lang="Hindi",task="Translation"):
+# =========================
+# RESIDENT HUNYUAN-MT MODEL
+# =========================
+LLAMA_N_CTX = 4096
+LLAMA_REPO = "mradermacher/Hunyuan-MT-7B-GGUF"
+LLAMA_HUB_FILE = "Hunyuan-MT-7B.Q4_K_S.gguf"
+LLAMA_FALLBACK_PATH = "./Hunyuan-MT-7B-GGUF/Hunyuan-MT-7B.Q4_K_M.gguf"
+LLAMA_MODEL = None
+LLAMA_MODEL_FILE = None  # GGUF the resident model was loaded from
+_llama_lock = threading.Lock()  # one llama.cpp context: one request at a time
+
+
+def load_llama():
+    global LLAMA_MODEL, LLAMA_MODEL_FILE
+    if LLAMA_MODEL is not None:
+        return LLAMA_MODEL
+    from llama_cpp import Llama
+    print("🔁 Loading Hunyuan-MT-7B ...")
     try:
-        from llama_cpp import Llama
-        import gc
-        import torch
+        LLAMA_MODEL = Llama.from_pretrained(
+            repo_id=LLAMA_REPO,
+            filename=LLAMA_HUB_FILE,
+            device="cuda",
+            n_ctx=LLAMA_N_CTX,
+            n_gpu_layers=-1,
+            n_threads=8,
+            n_batch=512,
+            verbose=False
+        )
+        LLAMA_MODEL_FILE = LLAMA_HUB_FILE
+    except:
+        print("Trying to download without hf token")
+        download_file_path = LLAMA_FALLBACK_PATH
+        download_file(f"https://huggingface.co/{LLAMA_REPO}/resolve/main/{os.path.basename(LLAMA_FALLBACK_PATH)}",
+                      download_file_path, redownload=False)
+        LLAMA_MODEL = Llama(
+            model_path=download_file_path,
+            device="cuda",
+            n_ctx=LLAMA_N_CTX,
+            n_gpu_layers=-1,
+            n_threads=8,
+            n_batch=512,
+            verbose=False
+        )
+        LLAMA_MODEL_FILE = os.path.basename(download_file_path)
+    return LLAMA_MODEL
 
-        # Load model (your existing code)
-        try:
-            llm = Llama.from_pretrained(
-                repo_id="mradermacher/Hunyuan-MT-7B-GGUF",
-                filename="Hunyuan-MT-7B.Q4_K_S.gguf",
-                device="cuda",
-                n_ctx=4096,
-                n_gpu_layers=-1,
-                n_threads=8,
-                n_batch=512,
-                verbose=False
-            )
-        except:
-            print("Trying to download without hf token")
-            download_file_path = "./Hunyuan-MT-7B-GGUF/Hunyuan-MT-7B.Q4_K_M.gguf"
-            download_file("https://huggingface.co/mradermacher/Hunyuan-MT-7B-GGUF/resolve/main/Hunyuan-MT-7B.Q4_K_M.gguf",
-                          download_file_path, redownload=False)
-            llm = Llama(
-                model_path=download_file_path,
-                device="cuda",
-                n_ctx=4096,
-                n_gpu_layers=-1,
-                n_threads=8,
-                n_batch=512,
-                verbose=False
-            )
 
-        system_prompt=llama_system_prompt(task, source_lang, target_lang)
-        def local_llm_translate(text, system_prompt):
-            try:
-                messages = [
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": text}
-                ]
-                output = llm.create_chat_completion(messages=messages)
-                res=output["choices"][0]["message"]["content"].strip()
-                res=res.strip("**")
-                res=res.strip('“”')
-                return res
-            except:
-                return None
-
-        # Process timestamps
-        for key, entry in timestamp.items():
-            original_text = entry['text']
-            tran_text = local_llm_translate(original_text, system_prompt)
-            entry['dubbing'] = tran_text if tran_text else original_text
-
-        # Free memory
-        del llm
+def unload_llama():
+    global LLAMA_MODEL, LLAMA_MODEL_FILE
+    if LLAMA_MODEL is not None:
+        print("🧹 Unloading Hunyuan-MT-7B ...")
+        with _llama_lock:
+            LLAMA_MODEL = None
+            LLAMA_MODEL_FILE = None
         gc.collect()
-        if torch.cuda.is_available():
-            torch.cuda.empty_cache()
 
+
+def llama_model_file():
+    """GGUF the model is (or will be) loaded from: the resident one, else whichever is on disk."""
+    if LLAMA_MODEL_FILE is not None:
+        return LLAMA_MODEL_FILE
+    try:
+        from huggingface_hub import try_to_load_from_cache
+        if isinstance(try_to_load_from_cache(LLAMA_REPO, LLAMA_HUB_FILE), str):
+            return LLAMA_HUB_FILE
+    except ImportError:
+        pass
+    if os.path.exists(LLAMA_FALLBACK_PATH):
+        return os.path.basename(LLAMA_FALLBACK_PATH)
+    return None
+
+
+model_manager.register(
+    "hunyuan_mt_7b",
+    loader=load_llama,
+    unloader=unload_llama,
+    is_loaded=lambda: LLAMA_MODEL is not None,
+    device="cuda",
+    size_gb=4.6,  # Q4_K GGUF weights + 4k KV cache; not a torch module, so it can't be measured
+)
+
+
+# =========================
+# BATCHED, LINE-ALIGNED REQUESTS
+# =========================
+BATCH_RULES = (
+    "The user sends numbered lines, one segment per line. "
+    "Answer with exactly the same number of lines, in the same order, each starting with its number "
+    "followed by a period, and nothing else."
+)
+NUMBERED_LINE = re.compile(r"^\s*[\[(]?(\d+)[\])]?\s*[.):：、-]?\s*(.*)$")
+
+
+def clean_output(text):
+    text = text.strip().strip("**").strip()
+    return text.strip('“”"').strip()
+
+
+def parse_numbered(output, count):
+    """
+    {line_number: text} from a numbered reply. Unnumbered lines continue the
+    previous numbered line (the model sometimes wraps); numbers outside
+    1..count are ignored, so a missing or garbled line just stays missing.
+    """
+    parsed, current = {}, None
+    for raw in output.splitlines():
+        if not raw.strip():
+            continue
+        match = NUMBERED_LINE.match(raw)
+        if match:
+            number = int(match.group(1))
+            current = number if 1 <= number <= count and number not in parsed else None
+            if current is not None:
+                parsed[current] = clean_output(match.group(2))
+        elif current is not None:
+            parsed[current] = (parsed[current] + " " + clean_output(raw)).strip()
+    return {n: t for n, t in parsed.items() if t}
+
+
+class HunyuanMTBackend(TranslationBackend):
+    """
+    Translation backend on the resident Hunyuan-MT-7B. Every request starts
+    with the same system prompt, so llama.cpp's prefix matching keeps its KV
+    state between requests and only the new lines are evaluated. Lines are
+    packed into numbered requests while the prompt plus the expected answer
+    (OUTPUT_RATIO x the input tokens) fits n_ctx; lines missing from a reply
+    are retried one per request. source/target are language names.
+    The memory name includes the GGUF file, so the Q4_K_S and Q4_K_M
+    quantizations keep separate translations.
+    """
+    max_batch_chars = 100_000  # token-based packing happens here, not in Translator
+    max_batch_lines = 1000
+    max_request_lines = 40
+    output_ratio = 3.0  # non-Latin targets take several times the source tokens
+
+    def __init__(self, task="Translation"):
+        self.task = task
+
+    @property
+    def name(self):
+        return f"hunyuan-mt-7b:{llama_model_file() or 'not-downloaded'}:{self.task}"
+
+    def _system_prompt(self, source, target):
+        return llama_system_prompt(self.task, source, target) + " " + BATCH_RULES
+
+    def _complete(self, llm, system_prompt, lines):
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": "\n".join(f"{n}. {line}" for n, line in enumerate(lines, 1))},
+        ]
+        output = llm.create_chat_completion(messages=messages, max_tokens=None)
+        return output["choices"][0]["message"]["content"]
+
+    def _requests(self, llm, system_prompt, texts):
+        """Consecutive groups of texts whose prompt + answer fit the context."""
+        def tokens(text):
+            return len(llm.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+        budget = (llm.n_ctx() - tokens(system_prompt) - 64) / (1 + self.output_ratio)
+        groups, group, used = [], [], 0
+        for text in texts:
+            cost = tokens(text) + 4  # number prefix + newline
+            if group and (used + cost > budget or len(group) >= self.max_request_lines):
+                groups.append(group)
+                group, used = [], 0
+            group.append(text)
+            used += cost
+        if group:
+            groups.append(group)
+        return groups
+
+    def translate_batch(self, texts, source_code, target_code):
+        system_prompt = self._system_prompt(source_code, target_code)
+        results = {}
+        with model_manager.use("hunyuan_mt_7b") as llm, _llama_lock:
+            for group in self._requests(llm, system_prompt, texts):
+                try:
+                    parsed = parse_numbered(self._complete(llm, system_prompt, group), len(group))
+                except Exception as e:
+                    print(f"⚠️ Hunyuan-MT request failed: {e}")
+                    parsed = {}
+                for n, text in enumerate(group, 1):
+                    if n in parsed:
+                        results[text] = parsed[n]
+            missing = [text for text in texts if text not in results]
+            if missing:
+                print(f"⚠️ {len(missing)} lines lost in batched replies, translating them one by one")
+            for text in missing:
+                try:
+                    output = self._complete(llm, system_prompt, [text])
+                    parsed = parse_numbered(output, 1)
+                    results[text] = parsed.get(1) or clean_output(output) or None
+                except Exception as e:
+                    print(f"⚠️ Hunyuan-MT request failed: {e}")
+        return [results.get(text) for text in texts]
+
+
+_translators = {}
+
+
+def hunyuan_translator(task="Translation"):
+    """
+    One Translator per task: same resident model, own translation-memory
+    namespace, and the SQLite connection STT.translation already holds.
+    """
+    if task not in _translators:
+        _translators[task] = get_translator(HunyuanMTBackend(task), max_workers=1)
+    return _translators[task]
+
+
+def hunyuan_mt_translate(timestamp, source_lang="English", target_lang="Hindi",task="Translation"):
+    """
+    Fills entry['dubbing'] for every timestamp entry (falls back to the
+    original text). The model stays loaded for the next call; it is unloaded
+    by model_manager when something else needs the memory, or unload_llama().
+    """
+    try:
+        entries = list(timestamp.values())
+        translations = hunyuan_translator(task).translate_lines(
+            [entry['text'] for entry in entries], source_lang, target_lang
+        )
+        for entry, tran_text in zip(entries, translations):
+            entry['dubbing'] = tran_text if tran_text else entry['text']
         return timestamp
 
     except Exception as e:
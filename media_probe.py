@@ -0,0 +1,101 @@
+#@title /content/Video-Dubbing/media_probe.py
+# %%writefile /content/Video-Dubbing/media_probe.py
+import os
+import json
+import threading
+import subprocess
+from collections import namedtuple
+
+
+MediaInfo = namedtuple("MediaInfo", ["duration", "samplerate", "channels"])
+
+# soundfile reads these from the header; everything else (video, mp3, aac, m4a) goes to ffprobe
+SOUNDFILE_EXTS = {".wav", ".flac", ".ogg", ".aiff", ".aif"}
+
+_probe_memo = {}
+_probe_lock = threading.Lock()
+
+
+def _probe_soundfile(path):
+    import soundfile as sf
+    info = sf.info(path)
+    return MediaInfo(info.frames / info.samplerate, info.samplerate, info.channels)
+
+
+def _probe_ffprobe(path):
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration:stream=codec_type,sample_rate,channels,duration",
+        "-of", "json",
+        path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    data = json.loads(result.stdout or "{}")
+    audio = next((s for s in data.get("streams", []) if s.get("codec_type") == "audio"), {})
+    duration = audio.get("duration") or data.get("format", {}).get("duration") or 0.0
+    return MediaInfo(
+        float(duration),
+        int(audio.get("sample_rate", 0) or 0),
+        int(audio.get("channels", 0) or 0),
+    )
+
+
+def probe(path):
+    """
+    Duration (s), sample rate and channel count from container headers — no decoding.
+    Memoized by (path, mtime, size), so repeated calls on the same file are free
+    and a rewritten file is probed again. Raises on unreadable files.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    with _probe_lock:
+        if memo_key in _probe_memo:
+            return _probe_memo[memo_key]
+
+    info = None
+    if os.path.splitext(path)[1].lower() in SOUNDFILE_EXTS:
+        try:
+            info = _probe_soundfile(path)
+        except Exception:
+            info = None
+    if info is None:
+        info = _probe_ffprobe(path)
+
+    with _probe_lock:
+        _probe_memo[memo_key] = info
+    return info
+
+
+def stream_pcm(path, samplerate, channels, block_frames):
+    """Decode any ffmpeg-readable media to float32 (frames, channels) blocks without loading it all."""
+    import numpy as np
+    cmd = [
+        "ffmpeg", "-v", "error", "-i", path,
+        "-f", "f32le", "-ac", str(channels), "-ar", str(samplerate), "-",
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    block_bytes = block_frames * channels * 4
+    try:
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            usable = len(data) - len(data) % (channels * 4)
+            yield np.frombuffer(data[:usable], dtype=np.float32).reshape(-1, channels)
+    finally:
+        process.stdout.close()
+        process.wait()
+
+
+def get_duration(path):
+    """Duration in seconds (0.0 if the file is missing or unreadable)."""
+    if not path or not os.path.exists(path):
+        return 0.0
+    try:
+        return probe(path).duration
+    except Exception as e:
+        print(f"Error getting duration for {path}: {e}")
+        return 0.0
+
+# from media_probe import probe, get_duration
+# info = probe("/content/video.mp4")   # MediaInfo(duration=..., samplerate=..., channels=...)
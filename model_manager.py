@@ -0,0 +1,299 @@
+#@title /content/Video-Dubbing/model_manager.py
+# %%writefile /content/Video-Dubbing/model_manager.py
+import os
+import gc
+import time
+import threading
+from contextlib import contextmanager
+
+
+# Assumed size of a model that has never been loaded (no size_gb given), used to make room before its first load
+DEFAULT_MODEL_SIZE_GB = float(os.getenv("DUBBING_DEFAULT_MODEL_GB", "2.0"))
+
+
+def _env_budget(name):
+    value = os.getenv(name)
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            print(f"⚠️ Ignoring invalid {name}={value!r}")
+    return None
+
+
+def _default_vram_budget_gb():
+    try:
+        import torch
+        if torch.cuda.is_available():
+            total = torch.cuda.get_device_properties(0).total_memory / 1024 ** 3
+            return total * 0.85
+    except Exception:
+        pass
+    return None
+
+
+def _default_ram_budget_gb():
+    try:
+        import psutil
+        return psutil.virtual_memory().total / 1024 ** 3 * 0.6
+    except Exception:
+        return None
+
+
+def _free_memory():
+    gc.collect()
+    try:
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+            torch.cuda.ipc_collect()
+    except Exception:
+        pass
+
+
+def _cuda_allocated_gb():
+    try:
+        import torch
+        if torch.cuda.is_available():
+            return torch.cuda.memory_allocated() / 1024 ** 3
+    except Exception:
+        pass
+    return 0.0
+
+
+def _module_size_gb(model):
+    """Parameter + buffer size of a torch module, or of the modules one attribute deep."""
+    try:
+        import torch
+    except Exception:
+        return 0.0
+
+    def size_of(module):
+        return sum(t.numel() * t.element_size() for t in list(module.parameters()) + list(module.buffers()))
+
+    if isinstance(model, torch.nn.Module):
+        return size_of(model) / 1024 ** 3
+    total = 0
+    for value in getattr(model, "__dict__", {}).values():
+        if isinstance(value, torch.nn.Module):
+            total += size_of(value)
+    return total / 1024 ** 3
+
+
+class ModelEntry:
+    def __init__(self, name, loader, unloader=None, is_loaded=None, device="cpu", size_gb=None):
+        self.name = name
+        self.loader = loader
+        self.unloader = unloader
+        self.is_loaded_fn = is_loaded
+        self.device = "cuda" if str(device).startswith("cuda") else "cpu"
+        self.size_gb = size_gb
+        self.model = None
+        self.refcount = 0
+        self.last_used = 0.0
+        self.loading = None  # threading.Event while a thread is running the loader
+
+    @property
+    def estimated_gb(self):
+        return self.size_gb if self.size_gb is not None else DEFAULT_MODEL_SIZE_GB
+
+    @property
+    def loaded(self):
+        if self.is_loaded_fn is not None:
+            try:
+                return bool(self.is_loaded_fn())
+            except Exception:
+                return False
+        return self.model is not None
+
+
+class ModelResidencyManager:
+    """
+    Keeps models warm between segments and jobs.
+
+    Every backend registers a loader/unloader. Stages `acquire` (or `with use(...)`) a model
+    while they run; nothing is unloaded unless the RAM/VRAM budget would be exceeded, and then
+    only idle models (refcount 0) are evicted, least recently used first.
+
+    Budgets (GB) default to DUBBING_VRAM_BUDGET_GB / DUBBING_RAM_BUDGET_GB, else 85% of GPU
+    memory and 60% of system RAM. None means unlimited.
+    """
+
+    def __init__(self, ram_budget_gb=None, vram_budget_gb=None):
+        self.budgets = {
+            "cpu": ram_budget_gb if ram_budget_gb is not None
+                   else (_env_budget("DUBBING_RAM_BUDGET_GB") or _default_ram_budget_gb()),
+            "cuda": vram_budget_gb if vram_budget_gb is not None
+                    else (_env_budget("DUBBING_VRAM_BUDGET_GB") or _default_vram_budget_gb()),
+        }
+        self.entries = {}
+        self.lock = threading.RLock()
+
+    # =========================
+    # REGISTRATION
+    # =========================
+    def register(self, name, loader, unloader=None, is_loaded=None, device="cpu", size_gb=None):
+        """
+        loader() -> model; unloader() frees backend-side references (optional).
+        is_loaded() lets backends that also unload themselves keep the bookkeeping honest.
+        size_gb is measured after the first load when not given.
+        """
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry.loader, entry.unloader, entry.is_loaded_fn = loader, unloader, is_loaded
+                return entry
+            entry = ModelEntry(name, loader, unloader, is_loaded, device, size_gb)
+            self.entries[name] = entry
+            return entry
+
+    def is_registered(self, name):
+        return name in self.entries
+
+    # =========================
+    # CHECKOUT
+    # =========================
+    def acquire(self, name):
+        """
+        Load (if needed) and pin a model; pair with release().
+
+        The loader runs outside the manager lock, so other models can be
+        acquired / released while a big one loads; concurrent acquires of the
+        same model wait for that one load. Room is made before loading, from
+        the known size or DEFAULT_MODEL_SIZE_GB for a first load.
+        """
+        while True:
+            with self.lock:
+                entry = self.entries[name]
+                if entry.loading is None:
+                    if entry.loaded:
+                        if entry.model is None:
+                            entry.model = entry.loader()  # loaded by the backend itself: cheap
+                        entry.refcount += 1
+                        entry.last_used = time.monotonic()
+                        return entry.model
+                    # this thread loads it; pinned meanwhile so nothing evicts it
+                    entry.loading = threading.Event()
+                    entry.refcount += 1
+                    # the loading entry is already counted in _used_gb at its estimate
+                    self._make_room(entry.device, 0.0, exclude=name)
+                    break
+                loading = entry.loading
+            loading.wait()
+
+        try:
+            model = self._load(entry)
+        except BaseException:
+            with self.lock:
+                entry.refcount = max(0, entry.refcount - 1)
+                loading, entry.loading = entry.loading, None
+            loading.set()
+            raise
+        with self.lock:
+            entry.model = model
+            entry.last_used = time.monotonic()
+            loading, entry.loading = entry.loading, None
+            self._make_room(entry.device, 0.0, exclude=name)  # the measured size may exceed the estimate
+        loading.set()
+        return model
+
+    def release(self, name):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None:
+                return
+            entry.refcount = max(0, entry.refcount - 1)
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, name):
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def get(self, name):
+        """Acquire + release: a warm model without pinning it."""
+        model = self.acquire(name)
+        self.release(name)
+        return model
+
+    # =========================
+    # EVICTION
+    # =========================
+    def evict(self, name, force=False):
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is None or not entry.loaded:
+                return False
+            if entry.refcount > 0 and not force:
+                return False
+            self._unload(entry)
+            return True
+
+    def evict_all(self, force=False):
+        with self.lock:
+            for name in list(self.entries):
+                self.evict(name, force=force)
+
+    def resident(self):
+        """{name: (device, size_gb, refcount)} for loaded models."""
+        with self.lock:
+            return {
+                e.name: (e.device, e.size_gb or 0.0, e.refcount)
+                for e in self.entries.values() if e.loaded
+            }
+
+    def _used_gb(self, device):
+        """Loaded models plus the estimate of those being loaded right now."""
+        return sum(
+            (e.size_gb or 0.0) if e.loading is None else e.estimated_gb
+            for e in self.entries.values()
+            if e.device == device and (e.loaded or e.loading is not None)
+        )
+
+    def _make_room(self, device, needed_gb, exclude=None):
+        budget = self.budgets.get(device)
+        if budget is None:
+            return
+        idle = sorted(
+            (e for e in self.entries.values()
+             if e.device == device and e.loaded and e.refcount == 0 and e.name != exclude),
+            key=lambda e: e.last_used,
+        )
+        while self._used_gb(device) + needed_gb > budget and idle:
+            victim = idle.pop(0)
+            print(f"🧹 Evicting {victim.name} ({victim.size_gb or 0:.1f} GB) to stay under {device} budget")
+            self._unload(victim)
+        if self._used_gb(device) + needed_gb > budget:
+            print(f"⚠️ {device} budget {budget:.1f} GB exceeded by pinned models")
+
+    def _load(self, entry):
+        print(f"🔁 Loading {entry.name} ...")
+        before = _cuda_allocated_gb() if entry.device == "cuda" else 0.0
+        model = entry.loader()
+        if entry.size_gb is None:
+            if entry.device == "cuda":
+                entry.size_gb = max(0.0, _cuda_allocated_gb() - before)
+            if not entry.size_gb:
+                entry.size_gb = _module_size_gb(model)
+        return model
+
+    def _unload(self, entry):
+        entry.model = None
+        if entry.unloader is not None:
+            try:
+                entry.unloader()
+            except Exception as e:
+                print(f"⚠️ Unloading {entry.name} failed: {e}")
+        entry.refcount = 0
+        _free_memory()
+
+
+model_manager = ModelResidencyManager()
+
+# from model_manager import model_manager
+# model_manager.register("my_model", loader=load_fn, unloader=unload_fn, device="cuda")
+# with model_manager.use("my_model") as model:
+#     ...
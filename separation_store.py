@@ -0,0 +1,143 @@
+#@title /content/Video-Dubbing/separation_store.py
+# %%writefile /content/Video-Dubbing/separation_store.py
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from tts_cache import file_content_hash
+
+
+SEPARATION_STORE_DIR = os.getenv("SEPARATION_STORE_DIR", "./separation_store")
+
+
+class SeparationStore:
+    """
+    Demucs stems keyed by (source media content hash, model name).
+
+    STT, speaker extraction and music restore all ask the store, so one video is
+    separated once; later calls (and later jobs on the same file) get the
+    stored vocals.wav / no_vocals.wav. `source` lets a caller separate a derived
+    file (e.g. the mono mix) while keying by the original media.
+    """
+
+    def __init__(self, root=SEPARATION_STORE_DIR):
+        self.root = root
+        self._locks = {}
+        self._locks_guard = threading.Lock()
+
+    def key(self, source, model_name="htdemucs_ft"):
+        return hashlib.sha1(f"{file_content_hash(source)}|{model_name}".encode("utf-8")).hexdigest()
+
+    def _lock(self, key):
+        with self._locks_guard:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def _entry_paths(self, key):
+        entry_dir = os.path.join(self.root, key[:2], key)
+        return (
+            entry_dir,
+            os.path.join(entry_dir, "vocals.wav"),
+            os.path.join(entry_dir, "no_vocals.wav"),
+        )
+
+    def lookup(self, source, model_name="htdemucs_ft"):
+        """(vocals_path, background_path) if already separated, else None."""
+        if not source or not os.path.isfile(source):
+            return None
+        _, vocals_path, background_path = self._entry_paths(self.key(source, model_name))
+        if os.path.exists(vocals_path) and os.path.exists(background_path):
+            return vocals_path, background_path
+        return None
+
+    def get_stems(self, audio_path, model_name="htdemucs_ft", source=None):
+        """
+        Stems for `source` (defaults to audio_path), separating audio_path once if needed.
+        Returns (audio_path, None) if Demucs fails, like demucs_separate_vocal_music.
+        """
+        source = source or audio_path
+        key = self.key(source, model_name)
+        entry_dir, vocals_path, background_path = self._entry_paths(key)
+
+        with self._lock(key):
+            if os.path.exists(vocals_path) and os.path.exists(background_path):
+                print("♻️ Reusing stored Demucs stems")
+                return vocals_path, background_path
+
+            stems = self._run_demucs(audio_path, model_name)
+            if stems is None:
+                return audio_path, None
+
+            os.makedirs(entry_dir, exist_ok=True)
+            shutil.move(stems[0], vocals_path)
+            shutil.move(stems[1], background_path)
+            shutil.rmtree(stems[2], ignore_errors=True)
+            with open(os.path.join(entry_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({"source": os.path.abspath(source), "separated": os.path.abspath(audio_path),
+                           "model_name": model_name}, f, indent=2)
+        return vocals_path, background_path
+
+    def _run_demucs(self, audio_path, model_name):
+        # Private output dir per run, so concurrent jobs never rmtree each other's stems
+        os.makedirs(self.root, exist_ok=True)
+        output_dir = tempfile.mkdtemp(prefix="demucs_", dir=self.root)
+        try:
+            from demucs_engine import register_demucs_engine
+            from model_manager import model_manager
+        except ImportError:
+            return self._run_demucs_cli(audio_path, model_name, output_dir)
+
+        vocals_path = os.path.join(output_dir, "vocals.wav")
+        background_path = os.path.join(output_dir, "no_vocals.wav")
+        print("🎧 Running Demucs for vocal and music split ...")
+        try:
+            with model_manager.use(register_demucs_engine(model_name)) as engine:
+                engine.separate(audio_path, vocals_path, background_path)
+        except ImportError:
+            return self._run_demucs_cli(audio_path, model_name, output_dir)
+        except Exception as e:
+            print(f"❌ Demucs failed: {e}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return None
+        return vocals_path, background_path, output_dir
+
+    def _run_demucs_cli(self, audio_path, model_name, output_dir):
+        """Fallback when the demucs package can't be imported in-process."""
+        try:
+            import torch
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        except ImportError:
+            device = "cpu"
+        cmd = [
+            "python", "-m", "demucs",
+            "--two-stems=vocals",
+            "-o", output_dir,
+            "-d", device,
+            audio_path,
+            "-n", model_name,
+        ]
+
+        print("🎧 Running Demucs for vocal and music split ...")
+        try:
+            subprocess.run(cmd, check=True)
+        except Exception as e:
+            print(f"❌ Demucs failed: {e}")
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return None
+
+        model_dir = os.path.join(output_dir, model_name, Path(audio_path).stem)
+        return (
+            os.path.join(model_dir, "vocals.wav"),
+            os.path.join(model_dir, "no_vocals.wav"),
+            output_dir,
+        )
+
+
+separation_store = SeparationStore()
+
+# from separation_store import separation_store
+# vocals_path, background_path = separation_store.get_stems("/content/video.mp4")
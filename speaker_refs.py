@@ -0,0 +1,101 @@
+#@title /content/Video-Dubbing/speaker_refs.py
+# %%writefile /content/Video-Dubbing/speaker_refs.py
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile as sf
+
+from media_probe import probe, stream_pcm
+
+
+MEMMAP_THRESHOLD_SEC = 30 * 60  # decode longer media into a disk-backed buffer
+DECODE_BLOCK_SEC = 30
+
+
+def decode_until(media_file, end_sec, samplerate, channels, temp_dir=None):
+    """
+    Decode media_file once to float32 (frames, channels), stopping at end_sec.
+    Short media lands in RAM; past MEMMAP_THRESHOLD_SEC the buffer is an
+    np.memmap in temp_dir. Returns (pcm, frames_decoded, memmap_path or None).
+    """
+    total = int(np.ceil(end_sec * samplerate))
+    memmap_path = None
+    if end_sec > MEMMAP_THRESHOLD_SEC:
+        fd, memmap_path = tempfile.mkstemp(suffix=".f32", dir=temp_dir)
+        os.close(fd)
+        pcm = np.memmap(memmap_path, dtype=np.float32, mode="w+", shape=(max(total, 1), channels))
+    else:
+        pcm = np.zeros((max(total, 1), channels), dtype=np.float32)
+
+    filled = 0
+    for block in stream_pcm(media_file, samplerate, channels, samplerate * DECODE_BLOCK_SEC):
+        n = min(len(block), total - filled)
+        pcm[filled:filled + n] = block[:n]
+        filled += n
+        if filled >= total:
+            break  # closing the generator stops ffmpeg, the rest of the file is never decoded
+    return pcm, filled, memmap_path
+
+
+def extract_speaker_references(media_file, turns, output_dir="./speaker_voice",
+                               max_duration=20.0, num_workers=None):
+    """
+    One decode for all speakers: turns is {speaker_id: (start, end)} in seconds.
+    Each clip is a view into the decoded PCM, already cut to max_duration, and
+    the clips are written as wav in parallel. Returns {speaker_id: path}, with
+    "" for speakers whose clip couldn't be produced.
+    """
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir)
+    paths = {spk: "" for spk in turns}
+    if not turns:
+        return paths
+
+    try:
+        info = probe(media_file)
+    except Exception as e:
+        print(f"❌ Could not read {media_file}: {e}")
+        return paths
+    samplerate = info.samplerate or 44100
+    channels = min(info.channels or 1, 2)
+
+    spans = {}
+    for spk, (start, end) in turns.items():
+        start = max(0.0, float(start))
+        end = min(float(end), start + max_duration)
+        if end > start:
+            spans[spk] = (int(start * samplerate), int(end * samplerate))
+    if not spans:
+        return paths
+
+    last_end = max(e for _, e in spans.values()) / samplerate
+    pcm, frames, memmap_path = decode_until(media_file, last_end, samplerate, channels, temp_dir=output_dir)
+
+    def write_clip(spk):
+        s, e = spans[spk]
+        clip = pcm[s:min(e, frames)]
+        if len(clip) == 0:
+            print(f"Failed Speaker {spk} audio extraction")
+            return spk, ""
+        output_file = os.path.join(output_dir, f"{spk}.wav")
+        sf.write(output_file, clip, samplerate)
+        return spk, output_file
+
+    try:
+        workers = num_workers or min(len(spans), os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            paths.update(dict(pool.map(write_clip, spans)))
+    finally:
+        del pcm
+        if memmap_path:
+            os.remove(memmap_path)
+    print("Speaker Extraction Successful")
+    return paths
+
+# from speaker_refs import extract_speaker_references
+# refs = extract_speaker_references("/content/video.mp4", {0: (3.2, 18.9), 1: (40.0, 71.5)}, max_duration=20.0)
+# # {0: "./speaker_voice/0.wav", 1: "./speaker_voice/1.wav"}
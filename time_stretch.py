@@ -0,0 +1,116 @@
+#@title /content/Video-Dubbing/time_stretch.py
+# %%writefile /content/Video-Dubbing/time_stretch.py
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+# =========================
+# WSOLA TIME STRETCH
+# =========================
+# Pitch-preserving time-scale modification on NumPy arrays, so audio_sync
+# doesn't need an ffmpeg atempo subprocess + temp wav per segment.
+FRAME_MS = 40       # analysis/synthesis frame
+TOLERANCE_MS = 10   # how far WSOLA may shift a frame to keep waveforms aligned
+
+
+def _wsola(y, num_frames, analysis_hop, frame_len, tolerance):
+    synthesis_hop = frame_len // 2
+    window = np.hanning(frame_len).astype(np.float32)
+
+    # Pad so every candidate window (pos ± tolerance, plus the natural continuation) exists
+    pad = tolerance + frame_len
+    x = np.pad(y, (pad, pad))
+    frames = sliding_window_view(x, frame_len)  # frames[p] = x[p:p + frame_len], no copy
+
+    # Only the frame search is sequential (each template follows the previous
+    # choice); per frame it is one BLAS matrix-vector product, which runs
+    # without the GIL, so segments stretched on parallel threads scale.
+    ideal = np.rint(np.arange(num_frames) * analysis_hop).astype(np.int64)
+    positions = np.empty(num_frames, dtype=np.int64)
+    positions[0] = ideal[0]
+    span = 2 * tolerance + 1
+    for k in range(1, num_frames):
+        template = frames[pad + positions[k - 1] + synthesis_hop]
+        lo = pad + ideal[k] - tolerance
+        positions[k] = ideal[k] - tolerance + int(np.argmax(frames[lo:lo + span] @ template))
+
+    # Overlap-add: with a half-frame hop, even and odd frames each tile the output without overlapping
+    out_len = (num_frames - 1) * synthesis_hop + frame_len
+    out = np.zeros(out_len, dtype=np.float32)
+    norm = np.zeros(out_len, dtype=np.float32)
+    windowed = frames[pad + positions] * window
+    for parity in (0, 1):
+        part = windowed[parity::2].reshape(-1)
+        start = parity * synthesis_hop
+        out[start:start + len(part)] += part
+        norm[start:start + len(part)] += np.tile(window, len(part) // frame_len)
+    nonzero = norm > 1e-3
+    out[nonzero] /= norm[nonzero]
+    return out
+
+
+def time_stretch(y, rate=None, target_length=None, sr=48000):
+    """
+    Pitch-preserving time stretch (WSOLA).
+
+    rate > 1 speeds up (same meaning as ffmpeg atempo / librosa.effects.time_stretch).
+    target_length (samples) selects exact-length mode: the output has exactly that
+    many samples, so callers know the new duration without re-reading the file.
+    """
+    y = np.asarray(y, dtype=np.float32)
+    if y.ndim > 1:
+        y = y.mean(axis=0) if y.shape[0] < y.shape[-1] else y.mean(axis=1)
+    if target_length is None:
+        if rate is None or rate <= 0:
+            raise ValueError("time_stretch needs a positive rate or a target_length")
+        target_length = int(round(len(y) / rate))
+    target_length = int(target_length)
+    if target_length <= 0:
+        return np.zeros(0, dtype=np.float32)
+
+    frame_len = max(64, int(sr * FRAME_MS / 1000) // 2 * 2)
+    tolerance = int(sr * TOLERANCE_MS / 1000)
+    synthesis_hop = frame_len // 2
+
+    if len(y) < frame_len or target_length < frame_len:
+        # Too short for overlap-add; a plain resample of the timeline is inaudible here
+        if len(y) == 0:
+            return np.zeros(target_length, dtype=np.float32)
+        positions = np.linspace(0, len(y) - 1, target_length)
+        return np.interp(positions, np.arange(len(y)), y).astype(np.float32)
+
+    # Choose frame count/hop so the last frame ends at the end of the input and
+    # the output covers target_length; then trim to the exact sample.
+    num_frames = int(np.ceil((target_length - frame_len) / synthesis_hop)) + 1
+    num_frames = max(num_frames, 2)
+    analysis_hop = (len(y) - frame_len) / (num_frames - 1)
+
+    out = _wsola(y, num_frames, analysis_hop, frame_len, tolerance)
+    if len(out) < target_length:
+        out = np.pad(out, (0, target_length - len(out)))
+    return out[:target_length]
+
+
+def time_stretch_batch(signals, rates=None, target_lengths=None, sr=48000, num_workers=None):
+    """
+    Stretch many segments at once. Work runs on a thread pool (the hot loop is a
+    NumPy matmul, which releases the GIL). Results keep input order.
+    """
+    n = len(signals)
+    rates = rates if rates is not None else [None] * n
+    target_lengths = target_lengths if target_lengths is not None else [None] * n
+
+    def one(args):
+        y, rate, length = args
+        return time_stretch(y, rate=rate, target_length=length, sr=sr)
+
+    jobs = list(zip(signals, rates, target_lengths))
+    if num_workers == 1 or n <= 1:
+        return [one(job) for job in jobs]
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        return list(executor.map(one, jobs))
+
+# from time_stretch import time_stretch
+# fast = time_stretch(y, rate=1.25, sr=48000)
+# exact = time_stretch(y, target_length=int(3.2 * 48000), sr=48000)
@@ -61,6 +61,16 @@ def unload_multilingual_model():
         print("✅ Multilingual model fully unloaded")
 
 
+from model_manager import model_manager
+model_manager.register(
+    "chatterbox_multilingual",
+    loader=get_or_load_model,
+    unloader=unload_multilingual_model,
+    is_loaded=lambda: MODEL is not None,
+    device=DEVICE,
+)
+
+
 
 def set_seed(seed: int):
     """Sets the random seed for reproducibility across torch, numpy, and random."""
@@ -135,6 +145,54 @@ def generate_tts_audio(
 
 
 
+def generate_tts_audio_batch(
+    text_inputs: list,
+    language_id: str,
+    audio_prompt_paths=None,
+    exaggeration_input: float = 0.5,
+    temperature_input: float = 0.8,
+    seed_num_input: int = 0,
+    cfgw_input: float = 0.5,
+    batch_size: int = 8,
+    max_new_tokens: int = 1000,
+) -> tuple[int, list]:
+    """
+    Batched counterpart of generate_tts_audio: decodes up to batch_size texts per T3 pass.
+
+    Args:
+        text_inputs (list[str]): Texts to synthesize (each maximum 300 characters)
+        language_id (str): The language code for synthesis (eg. en, fr, de, es, it, pt, hi)
+        audio_prompt_paths (str | list[str], optional): One reference audio for all texts, or one per text.
+        batch_size (int, optional): Segments decoded together. 8-16 works well on CPU. Defaults to 8.
+        max_new_tokens (int, optional): Speech-token cap per text (~40 s at 1000). Defaults to 1000.
+
+    Returns:
+        tuple[int, list[np.ndarray]]: The sample rate and one waveform per input text, in order.
+    """
+    current_model = get_or_load_model()
+
+    if seed_num_input != 0:
+        set_seed(int(seed_num_input))
+
+    if audio_prompt_paths is None or isinstance(audio_prompt_paths, str):
+        audio_prompt_paths = [audio_prompt_paths] * len(text_inputs)
+
+    wavs = []
+    for i in range(0, len(text_inputs), batch_size):
+        batch_wavs = current_model.generate_batch(
+            text_inputs[i:i + batch_size],
+            language_id=language_id,
+            audio_prompt_paths=audio_prompt_paths[i:i + batch_size],
+            exaggeration=exaggeration_input,
+            temperature=temperature_input,
+            cfg_weight=cfgw_input,
+            max_new_tokens=max_new_tokens,
+        )
+        wavs.extend(w.squeeze(0).numpy() for w in batch_wavs)
+    return current_model.sr, wavs
+
+
+
 supported_languages = {
     "English": "en",
     "Hindi": "hi",
@@ -341,6 +399,7 @@ import torch
 import torchaudio
 import numpy as np
 import soundfile as sf
+from vad_service import remove_noise_batch
 
 def remove_noise_high_quality(audio_path,
                               threshold=0.5,
@@ -355,105 +414,18 @@ def remove_noise_high_quality(audio_path,
     - Uses VAD on temporary 16kHz mono copy
     - Collapses long gaps (>max_gap) into short natural pause
     - Preserves original audio clarity
+    Silero VAD + resamplers are cached in vad_service (loaded once, offline-capable);
+    use vad_service.remove_noise_batch for many files at once.
     """
-    # Load original audio (full quality)
-    orig_audio, orig_sr = torchaudio.load(audio_path)  # stereo or mono preserved
-    orig_audio = orig_audio.clone()  # keep original
-
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    orig_audio = orig_audio.to(device)
-
-
-
-    # --------------------------
-    # Step 1: Prepare VAD input (16kHz mono)
-    # --------------------------
-    wav_vad = torch.mean(orig_audio, dim=0, keepdim=True)  # mono
-
-    if orig_sr != 16000:
-        wav_vad = wav_vad.cpu()  # move to CPU before resample
-        wav_vad = torchaudio.transforms.Resample(orig_sr, 16000)(wav_vad)  # resample
-        
-    wav_vad = wav_vad.to(device)  # move back to GPU for VAD model
-    # --------------------------
-    # Step 2: Load Silero-VAD
-    # --------------------------
-    model, utils = torch.hub.load('snakers4/silero-vad', 'silero_vad', trust_repo=True)
-    (get_speech_timestamps, _, _, _, _) = utils
-    model = model.to(device)
-
-    # Detect speech on VAD audio
-    speech_timestamps_vad = get_speech_timestamps(
-        wav_vad, model, sampling_rate=16000,
+    return remove_noise_batch(
+        [audio_path],
         threshold=threshold,
         min_speech_duration_ms=min_speech_duration_ms,
         min_silence_duration_ms=min_silence_duration_ms,
-        speech_pad_ms=speech_pad_ms
-    )
-
-    if not speech_timestamps_vad:
-        print("No speech detected!")
-        output_path = audio_path.replace(".wav", "_remove_noise.wav")
-        sf.write(output_path, orig_audio.squeeze().cpu().numpy(), orig_sr)
-        return output_path
-
-    # --------------------------
-    # Step 3: Map timestamps back to original sample rate
-    # --------------------------
-    ratio = orig_sr / 16000  # scale factor
-    speech_timestamps = []
-    for seg in speech_timestamps_vad:
-        start = int(seg['start'] * ratio)
-        end = int(seg['end'] * ratio)
-        speech_timestamps.append({'start': start, 'end': end})
-
-    # --------------------------
-    # Step 4: Build cleaned audio
-    # --------------------------
-    result_audio = []
-    gap_list = []
-
-    start_trim = speech_timestamps[0]['start']
-    end_trim = speech_timestamps[-1]['end']
-    trimmed_audio = orig_audio[:, start_trim:end_trim]
-
-    for i in range(len(speech_timestamps)):
-        seg_start = speech_timestamps[i]['start'] - start_trim
-        seg_end = speech_timestamps[i]['end'] - start_trim
-        result_audio.append(trimmed_audio[:, seg_start:seg_end])
-
-        if i < len(speech_timestamps) - 1:
-            next_seg_start = speech_timestamps[i + 1]['start'] - start_trim
-            gap_samples = next_seg_start - seg_end
-
-            if gap_samples > 0:
-                if gap_samples > int(max_gap * orig_sr):
-                    pause_samples = int(natural_pause * orig_sr)
-                    result_audio.append(torch.zeros((orig_audio.shape[0], pause_samples), device=device))
-                    gap_list.append(pause_samples)
-                else:
-                    result_audio.append(torch.zeros((orig_audio.shape[0], gap_samples), device=device))
-                    gap_list.append(gap_samples)
-            else:
-                gap_list.append(0)
-
-    clean_audio = torch.cat(result_audio, dim=1)
-
-    # --------------------------
-    # Step 5: Save high-quality
-    # --------------------------
-    output_path = audio_path.replace(".wav", "_remove_noise.wav")
-    sf.write(output_path, clean_audio.squeeze().cpu().numpy(), orig_sr, subtype='PCM_24')
-
-  
-    cursor = 0
-    for i, seg in enumerate(speech_timestamps):
-        seg_len = seg['end'] - seg['start']
-        cursor += seg_len
-        if i < len(speech_timestamps) - 1:
-            cursor += gap_list[i]
-
-    return output_path
+        speech_pad_ms=speech_pad_ms,
+        max_gap=max_gap,
+        natural_pause=natural_pause,
+    )[0]
 
 # -----------------------------
 # Example usage
@@ -535,6 +507,64 @@ def clone_voice_streaming(
                                             natural_pause= 0.2)
     return final_path    
 
+
+class ChatterboxBatch:
+    """
+    Short dubbing segments of one speaker (same reference audio and seed),
+    decoded by one generate_tts_audio_batch call the first time any of them
+    is asked for, so the dubbing loop still consumes segments in order.
+    Texts must fit one chunk (< 300 chars after clean_text).
+    """
+
+    def __init__(self, audio_prompt_path, lang_name="English", exaggeration_input=0.5,
+                 temperature_input=0.8, seed_num_input=0, cfgw_input=0.5, batch_size=8):
+        self.audio_prompt_path = audio_prompt_path
+        self.language_id = supported_languages.get(lang_name, "en")
+        self.exaggeration_input = exaggeration_input
+        self.temperature_input = temperature_input
+        self.seed_num_input = seed_num_input or random.randint(1, 999999)
+        self.cfgw_input = cfgw_input
+        self.batch_size = batch_size
+        self.items = []  # (segment_id, cleaned text)
+        self.audio = None
+        self.sr = 24000
+
+    def add(self, segment_id, text):
+        self.items.append((segment_id, clean_text(text)))
+
+    def result(self, segment_id):
+        """float32 array for one segment, or None if generation failed."""
+        if self.audio is None:
+            try:
+                self.sr, wavs = generate_tts_audio_batch(
+                    [text for _, text in self.items],
+                    self.language_id,
+                    self.audio_prompt_path,
+                    self.exaggeration_input,
+                    self.temperature_input,
+                    self.seed_num_input,
+                    self.cfgw_input,
+                    batch_size=self.batch_size,
+                )
+            except Exception as e:
+                print(f"⚠️ Batched Chatterbox generation failed ({e}), generating one by one")
+                wavs = []
+                for _, text in self.items:
+                    try:
+                        self.sr, wav = generate_tts_audio(
+                            text, self.language_id, self.audio_prompt_path, self.exaggeration_input,
+                            self.temperature_input, self.seed_num_input, self.cfgw_input
+                        )
+                    except Exception as e:
+                        print(f"⚠️ TTS failed (Chatterbox Multilingual): {e}")
+                        wav = None
+                    wavs.append(wav)
+            self.audio = {
+                sid: wav.astype(np.float32) if wav is not None and len(wav) else None
+                for (sid, _), wav in zip(self.items, wavs)
+            }
+        return self.audio.get(segment_id)
+
 ##Test 
 # %cd /content/Video-Dubbing/
 # from tts import clone_voice_streaming
@@ -0,0 +1,188 @@
+#@title /content/Video-Dubbing/tts_cache.py
+# %%writefile /content/Video-Dubbing/tts_cache.py
+import os
+import re
+import atexit
+import json
+import shutil
+import hashlib
+import unicodedata
+from collections import OrderedDict
+
+
+TTS_CACHE_DIR = "./tts_cache"
+TTS_CACHE_MAX_BYTES = 5 * 1024 ** 3  # 5 GB
+# index.json is rewritten after this many new entries (and by save() at the end of a job / at exit)
+TTS_CACHE_SAVE_EVERY = 64
+
+
+# =========================
+# HASHING
+# =========================
+_file_hash_memo = {}
+
+
+def file_content_hash(path, block_size=1024 * 1024):
+    """
+    sha1 of a file's bytes, memoized by (path, mtime, size) so the same
+    speaker reference is only read once per process.
+    """
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if memo_key in _file_hash_memo:
+        return _file_hash_memo[memo_key]
+
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    _file_hash_memo[memo_key] = digest
+    return digest
+
+
+def normalize_text(text):
+    """Whitespace/unicode normalization so cosmetic edits don't miss the cache."""
+    text = unicodedata.normalize("NFC", text or "")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def tts_cache_key(text, reference_audio, seed_num, voice_model, language_name, params=None):
+    """
+    Content address for one TTS segment.
+
+    reference_audio is a file path for the cloning models and a voice name
+    for Kokoro / Edge TTS, so files are hashed by content and names are used as-is.
+    """
+    if reference_audio and os.path.isfile(reference_audio):
+        reference = file_content_hash(reference_audio)
+    else:
+        reference = str(reference_audio or "")
+
+    payload = json.dumps(
+        {
+            "text": normalize_text(text),
+            "reference": reference,
+            "seed": int(seed_num or 0),
+            "voice_model": voice_model,
+            "language": language_name,
+            "params": params or {},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# =========================
+# CACHE
+# =========================
+class TTSCache:
+    """
+    Persistent, size-bounded LRU cache of generated TTS wav files.
+
+    index.json maps key -> {"file", "size"} in least-recently-used order, so a
+    lookup is a dict hit and eviction pops from the front. The index is
+    written in batches (every TTS_CACHE_SAVE_EVERY puts, save() at the end of
+    a job, and at interpreter exit), not per segment.
+    """
+
+    def __init__(self, cache_dir=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.index = OrderedDict()
+        self.total_bytes = 0
+        self._dirty = False
+        self._unsaved_puts = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (json.JSONDecodeError, OSError):
+            print("⚠️ TTS cache index unreadable, starting empty")
+            return
+
+        for key, entry in entries:
+            if os.path.exists(os.path.join(self.cache_dir, entry["file"])):
+                self.index[key] = entry
+                self.total_bytes += entry["size"]
+
+    def save(self):
+        if not self._dirty:
+            return
+        temp_path = self.index_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(list(self.index.items()), f)
+        os.replace(temp_path, self.index_path)
+        self._dirty = False
+        self._unsaved_puts = 0
+
+    def get(self, key):
+        """Return the cached wav path for key, or None."""
+        entry = self.index.get(key)
+        if entry is None:
+            return None
+        path = os.path.join(self.cache_dir, entry["file"])
+        if not os.path.exists(path):
+            self.total_bytes -= entry["size"]
+            del self.index[key]
+            self._dirty = True
+            return None
+        if next(reversed(self.index)) != key:
+            # recency only; persisted with the next batched save
+            self.index.move_to_end(key)
+            self._dirty = True
+        return path
+
+    def put(self, key, wav_path):
+        """Store a copy of wav_path under key and return the cached path."""
+        if key in self.index:
+            return self.get(key)
+
+        rel_path = os.path.join(key[:2], f"{key}.wav")
+        cached_path = os.path.join(self.cache_dir, rel_path)
+        os.makedirs(os.path.dirname(cached_path), exist_ok=True)
+        shutil.copy(wav_path, cached_path)
+
+        size = os.path.getsize(cached_path)
+        self.index[key] = {"file": rel_path, "size": size}
+        self.total_bytes += size
+        self._dirty = True
+        self._evict()
+        self._unsaved_puts += 1
+        if self._unsaved_puts >= TTS_CACHE_SAVE_EVERY:
+            self.save()
+        return cached_path
+
+    def _evict(self):
+        while self.total_bytes > self.max_bytes and len(self.index) > 1:
+            _, entry = self.index.popitem(last=False)
+            self.total_bytes -= entry["size"]
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+            self._dirty = True
+
+
+tts_cache = None
+
+
+def get_tts_cache():
+    """Process-wide cache instance (lazy, so importing this module touches no disk)."""
+    global tts_cache
+    if tts_cache is None:
+        tts_cache = TTSCache()
+        atexit.register(tts_cache.save)
+    return tts_cache
+
+# from tts_cache import get_tts_cache, tts_cache_key
+# cache = get_tts_cache()
+# key = tts_cache_key("Hello", "./speaker_voice/0.mp3", 1234, "Chatterbox Multilingual", "English")
+# cached_wav = cache.get(key)
@@ -4,6 +4,7 @@
 from tts import clone_voice_streaming,supported_languages
 from STT.subtitle import subtitle_maker
 from turbo_tts import unload_turbo_model
+from model_manager import model_manager
 
 def tts_only(
               text,
@@ -19,7 +20,8 @@ def tts_only(
               low_gpu=True
           ):
   if low_gpu:
-    unload_turbo_model()
+    # evict() leaves the model alone if a dubbing job is using it
+    model_manager.evict("chatterbox_turbo")
   audio_path=clone_voice_streaming(
       text,
       audio_prompt_path_input,
@@ -46,6 +46,16 @@ def unload_turbo_model():
         print("✅ Turbo model fully unloaded")
 
 
+from model_manager import model_manager
+model_manager.register(
+    "chatterbox_turbo",
+    loader=get_or_load_model,
+    unloader=unload_turbo_model,
+    is_loaded=lambda: MODEL is not None,
+    device=DEVICE,
+)
+
+
 # MODEL = ChatterboxTurboTTS.from_pretrained("cuda" )
 
 
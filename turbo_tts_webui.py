@@ -3,6 +3,7 @@ from turbo_tts import generate
 from STT.subtitle import subtitle_maker
 import gradio as gr
 from tts import unload_multilingual_model
+from model_manager import model_manager
 
 
 def gradio_turbo_tts( text,
@@ -21,7 +22,8 @@ def gradio_turbo_tts( text,
     mp3_bitrate="192k",
     low_gpu=True):
   if low_gpu:
-      unload_multilingual_model()
+      # evict() leaves the model alone if a dubbing job is using it
+      model_manager.evict("chatterbox_multilingual")
   audio_path,_=generate(
                 text,
                 audio_prompt_path,
@@ -7,6 +7,7 @@ import os
 import math
 import shutil
 import random
+from speaker_refs import extract_speaker_references
 def update_speaker_speeds(dubbing_json, default_speaker_voice, default_tts_rate=14):
     """
     Calculate the average speaking speed for each speaker based on the dubbing JSON
@@ -53,7 +54,7 @@ def update_speaker_speeds(dubbing_json, default_speaker_voice, default_tts_rate=
     return default_speaker_voice
 
 
-def get_speaker_from_media(media_file,json_data):
+def get_speaker_from_media(media_file,json_data,max_duration=20.0):
   if media_file is None:
     media_file=""
   segments = sorted(json_data.values(), key=lambda x: x['start'])
@@ -83,52 +84,14 @@ def get_speaker_from_media(media_file,json_data):
   # print("Max speaking interval per speaker:")
   # print(max_turns)
 
-  _, extension = os.path.splitext(media_file)
-  if extension.lower() == ".mp4":
-    temp_mp3_file = "convert.mp3"
-    try:
-      subprocess.run(
-          ["ffmpeg", "-y", "-i", media_file, temp_mp3_file],
-          check=True,
-          stdout=subprocess.DEVNULL,  # hide normal output
-          stderr=subprocess.DEVNULL   # hide error/progress output
-      )
-      print("Speaker Extraction Successful")
-    except subprocess.CalledProcessError:
-      print("Failed Video to audio conversion")
-    media_file = temp_mp3_file
-    extension=".mp3"
+  # One decode of the source, every speaker's clip cut (and capped at max_duration) from it
+  reference_paths=extract_speaker_references(media_file, max_turns, "./speaker_voice", max_duration)
 
   speaker_voices={}
-  if os.path.exists("./speaker_voice"):
-    shutil.rmtree("./speaker_voice")
-  os.makedirs("./speaker_voice")
   for i in max_turns:
-    start = max_turns[i][0]
-    end = max_turns[i][1]
-    duration = end - start
-
-    try:
-        output_file=f"./speaker_voice/{i}{extension}"
-        subprocess.run(
-            [
-                "ffmpeg", "-y", "-i", media_file,
-                "-ss", str(start), "-t", str(duration),
-                "-c", "copy", output_file
-            ],
-            check=True,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        if os.path.exists(output_file):
-          seed_num_input = random.randint(1, 999999)
-          speaker_voices[i]={"reference_audio":output_file,
-                             "fixed_seed":seed_num_input}
-    except subprocess.CalledProcessError:
-        print(f"Failed Speaker {i} audio extraction")
-        seed_num_input = random.randint(1, 999999)
-        speaker_voices[i]={"reference_audio":"",
-                             "fixed_seed":seed_num_input}
+    seed_num_input = random.randint(1, 999999)
+    speaker_voices[i]={"reference_audio":reference_paths[i],
+                       "fixed_seed":seed_num_input}
   speaker_voices=update_speaker_speeds(json_data, speaker_voices)
   return speaker_voices
 
@@ -289,7 +252,7 @@ def convert_to_mono(media_file):
 
 
 from pydub import AudioSegment
-from librosa import get_duration
+from media_probe import get_duration
 def combine_audios(audio_files, output_path="./new.wav"):
     if not audio_files:
         raise ValueError("No audio files provided!")
@@ -335,33 +298,10 @@ def demucs_separate_vocal_music(file_path, model_name="htdemucs_ft", output_dir=
     # max_duration=10*60 #10 min
     # if duration>max_duration:
     #     model_name="htdemucs"
-        
-    if os.path.exists(output_dir):
-        shutil.rmtree(output_dir)
-    os.makedirs(output_dir, exist_ok=True)
-
-    cmd = [
-        "python", "-m", "demucs",
-        "--two-stems=vocals",
-        "-o", output_dir,
-        "-d", "cuda",
-        file_path,
-        "-n", model_name,
-    ]
-
-    print("🎧 Running Demucs...")
-    try:
-        subprocess.run(cmd, check=True)
-    except Exception as e:
-        print(f"❌ Demucs failed: {e}")
-        return file_path, None
-
-    file_name = Path(file_path).stem
-    model_dir = f"./{output_dir}/{model_name}/{file_name}"
-    vocals_path = f"{model_dir}/vocals.wav"
-    background_path = f"{model_dir}/no_vocals.wav"
-
-    return vocals_path, background_path
+    # Stems come from the shared separation store (one Demucs run per media file);
+    # output_dir is kept for backwards compatibility only.
+    from separation_store import separation_store
+    return separation_store.get_stems(file_path, model_name)
 # vocals_path, background_path=demucs_separate_vocal_music(file_path)
 import subprocess
 from pathlib import Path
@@ -417,7 +357,8 @@ def get_clean_vocal(speaker_voice):
     
 
 
-from librosa import get_duration, load
+from librosa import load
+from media_probe import get_duration
 import soundfile as sf
 
 def fix_duration(speaker_voice, max_duration=20.0):
@@ -452,22 +393,14 @@ def fix_duration(speaker_voice, max_duration=20.0):
 
 
 def get_speakers(media_file,it_has_backgroud_music,json_data):
-  separate_folder="./split_media"
-  name_only = os.path.splitext(os.path.basename(media_file))[0]
-  vocal_path=f"{separate_folder}/{name_only}_vocal.wav"
-  # music_path=f"{separate_folder}/{name_only}_music.wav"
-  flag=True
   if it_has_backgroud_music:
-      if os.path.exists(vocal_path):
+      # Same stems STT and restore_music use, so Demucs runs once per media file
+      vocal_path, music_path = demucs_separate_vocal_music(media_file)
+      if music_path is not None and os.path.exists(vocal_path):
           media_file=vocal_path
-          flag=False
       
-  speaker_voice=get_speaker_from_media(media_file,json_data)
-  fix_duration(speaker_voice, max_duration=20.0)
-  if it_has_backgroud_music==True and flag==True:
-    print("Start Removing Speaker's Background Music ... ")
-    get_clean_vocal(speaker_voice)
-    print("Speaker's Background Music Removal Complete")
+  # clips come out already capped at 20 s, so no fix_duration reload
+  speaker_voice=get_speaker_from_media(media_file,json_data,max_duration=20.0)
     
   return speaker_voice
     
@@ -487,13 +420,56 @@ def get_speakers(media_file,it_has_backgroud_music,json_data):
 
 
 
+GENDER_MODEL = None
+
+
+def load_gender_model():
+    """(processor, model) for speaker gender detection, loaded once and kept by model_manager."""
+    global GENDER_MODEL
+    if GENDER_MODEL is None:
+        import torch
+        from transformers import Wav2Vec2Processor, AutoModelForAudioClassification
+
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print("🔁 Loading gender model...")
+        processor = Wav2Vec2Processor.from_pretrained(
+            "facebook/wav2vec2-base-960h"
+        )
+        model = AutoModelForAudioClassification.from_pretrained(
+            "prithivMLmods/Common-Voice-Gender-Detection"
+        ).eval().to(device)
+        GENDER_MODEL = (processor, model)
+        print("✅ Model loaded.")
+    return GENDER_MODEL
+
+
+def unload_gender_model():
+    global GENDER_MODEL
+    GENDER_MODEL = None
+
+
+def register_gender_model():
+    from model_manager import model_manager
+    import torch
+
+    if not model_manager.is_registered("gender_classifier"):
+        model_manager.register(
+            "gender_classifier",
+            loader=load_gender_model,
+            unloader=unload_gender_model,
+            is_loaded=lambda: GENDER_MODEL is not None,
+            device="cuda" if torch.cuda.is_available() else "cpu",
+        )
+    return model_manager
+
+
 def add_gender_to_speakers(speaker_voice):
     """
     ✔ If only 1 speaker → assign 'female'
     ✔ If model fails → assign 'female'
     ✔ If prediction fails → assign 'female'
     ✔ Never crashes
-    ✔ Always cleans memory
+    ✔ Model stays warm in model_manager (evicted only under memory pressure)
     """
 
     # ---------- Single speaker shortcut ----------
@@ -503,7 +479,6 @@ def add_gender_to_speakers(speaker_voice):
         print("✅ Single speaker → default female assigned.")
         return speaker_voice
 
-    import gc
     import torch
 
     TARGET_SR = 16000
@@ -518,21 +493,11 @@ def add_gender_to_speakers(speaker_voice):
 
     # ---------- Load model safely ----------
     try:
-        from transformers import Wav2Vec2Processor, AutoModelForAudioClassification
         import torchaudio
         import soundfile as sf
 
-        print("🔁 Loading gender model...")
-
-        processor = Wav2Vec2Processor.from_pretrained(
-            "facebook/wav2vec2-base-960h"
-        )
-
-        model = AutoModelForAudioClassification.from_pretrained(
-            "prithivMLmods/Common-Voice-Gender-Detection"
-        ).eval().to(device)
-
-        print("✅ Model loaded.")
+        model_manager = register_gender_model()
+        processor, model = model_manager.acquire("gender_classifier")
 
     except Exception as e:
         print("⚠️ Model load failed → using default female.")
@@ -577,21 +542,7 @@ def add_gender_to_speakers(speaker_voice):
             print(f"⚠️ Prediction failed for speaker {spk_id} → keeping female.")
             # stays female
 
-    # ---------- Cleanup ----------
-    print("🧹 Cleaning model memory...")
-
-    try:
-        del model
-        del processor
-    except:
-        pass
-
-    gc.collect()
-
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
-
-    print("✅ Cleanup done.")
+    model_manager.release("gender_classifier")
 
     return speaker_voice
 
@@ -616,30 +567,8 @@ def get_media_duration(media_file=None):
         print(f"File not found: {media_file}")
         return 0.0
 
-    ext = Path(media_file).suffix.lower()
-
-    # Audio formats to decode for exact duration
-    audio_exts = [".mp3", ".wav", ".flac", ".ogg", ".aac", ".m4a", ".aiff", ".aif"]
-
-    try:
-        if ext in audio_exts:
-            # Decode audio fully for exact duration
-            audio = AudioSegment.from_file(media_file)
-            return len(audio) / 1000.0  # milliseconds → seconds
-        else:
-            # For video, use ffprobe to get duration
-            cmd = [
-                "ffprobe",
-                "-v", "error",
-                "-show_entries", "format=duration",
-                "-of", "default=noprint_wrappers=1:nokey=1",
-                media_file
-            ]
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            return float(result.stdout.strip())
-    except Exception as e:
-        print(f"Error getting duration for {media_file}: {e}")
-        return 0.0
+    # Header-based (soundfile / ffprobe), memoized by path + mtime + size
+    return get_duration(media_file)
 
 
 
@@ -690,13 +619,13 @@ def pad_audio_to_video(audio_path, video_duration_sec, output_path=None):
     video_duration_sec: duration of video in seconds
     output_path: optional path to save padded audio
     """
+    if get_duration(audio_path) >= video_duration_sec:
+        # Audio is already equal or longer (header probe, no decode)
+        return audio_path
+
     audio = AudioSegment.from_file(audio_path)
     audio_duration_sec = len(audio) / 1000  # convert ms to sec
 
-    if audio_duration_sec >= video_duration_sec:
-        # Audio is already equal or longer
-        return audio_path
-
     # Calculate required silence duration
     silence_duration_ms = (video_duration_sec - audio_duration_sec) * 1000
     silence = AudioSegment.silent(duration=silence_duration_ms)
@@ -762,15 +691,8 @@ def pad_or_trim(audio, target_duration_ms):
 
 def restore_music(media_file, tts_dub_path):
     print("🎬 Extracting background and checking durations...")
-    separate_folder="./split_media"
-    name_only = os.path.splitext(os.path.basename(media_file))[0]
-    # vocal_path=f"{separate_folder}/{name_only}_vocal.wav"
-    music_path=f"{separate_folder}/{name_only}_music.wav"
-    if os.path.exists(music_path):
-        background_path=music_path
-    else:
-        # 1️⃣ Separate vocals/background
-        vocals_path, background_path = demucs_separate_vocal_music(media_file)
+    # 1️⃣ Separate vocals/background (reuses the stems from STT / speaker extraction)
+    vocals_path, background_path = demucs_separate_vocal_music(media_file)
 
     # 2️⃣ Get durations (in seconds)
     orig_duration = get_media_duration(media_file)
@@ -0,0 +1,257 @@
+#@title /content/Video-Dubbing/vad_service.py
+# %%writefile /content/Video-Dubbing/vad_service.py
+import os
+import threading
+
+import torch
+import torchaudio
+import soundfile as sf
+
+
+VAD_SR = 16000
+VAD_WINDOW = 512  # samples per Silero window at 16 kHz
+# Clips per batched VAD pass in remove_noise_batch (bounds the padded batch tensor)
+VAD_BATCH_SIZE = int(os.getenv("VAD_BATCH_SIZE", "32"))
+# Local clone of snakers4/silero-vad (used when the silero-vad pip package isn't installed)
+SILERO_VAD_DIR = os.getenv("SILERO_VAD_DIR", "./silero-vad")
+
+
+class VADService:
+    """
+    Silero VAD loaded once per process.
+
+    Load order (first that works): the `silero_vad` pip package (bundled weights,
+    offline), a local repo at SILERO_VAD_DIR via torch.hub source='local', and
+    finally the GitHub hub repo (downloaded once into the torch hub cache).
+    Resamplers are cached per (sr, device); the model is stateful, so calls are
+    serialized with a lock.
+    """
+
+    def __init__(self, local_dir=SILERO_VAD_DIR):
+        self.local_dir = local_dir
+        self.model = None
+        self.get_speech_timestamps = None
+        self._resamplers = {}
+        self._lock = threading.Lock()
+
+    # =========================
+    # LOADING
+    # =========================
+    def _load(self):
+        if self.model is not None:
+            return self.model
+        try:
+            from silero_vad import load_silero_vad, get_speech_timestamps
+            self.model = load_silero_vad()
+            self.get_speech_timestamps = get_speech_timestamps
+        except ImportError:
+            if os.path.isdir(self.local_dir):
+                model, utils = torch.hub.load(self.local_dir, "silero_vad", source="local")
+            else:
+                print("⚠️ silero-vad not found locally, loading from torch hub (once)")
+                model, utils = torch.hub.load("snakers4/silero-vad", "silero_vad", trust_repo=True)
+            self.model = model
+            self.get_speech_timestamps = utils[0]
+        self.model.eval()
+        return self.model
+
+    def resampler(self, orig_sr, device="cpu"):
+        key = (orig_sr, str(device))
+        if key not in self._resamplers:
+            self._resamplers[key] = torchaudio.transforms.Resample(orig_sr, VAD_SR).to(device)
+        return self._resamplers[key]
+
+    def to_vad_input(self, audio, sr):
+        """(channels, samples) tensor at any sr → 1-D 16 kHz mono CPU tensor."""
+        wav = audio.float().mean(dim=0)
+        if sr != VAD_SR:
+            wav = self.resampler(sr, wav.device)(wav)
+        return wav.cpu()
+
+    # =========================
+    # DETECTION
+    # =========================
+    @torch.no_grad()
+    def _speech_probs_batch(self, wavs):
+        """Per-window speech probabilities for several 16 kHz clips in one batched pass."""
+        model = self._load()
+        num_windows = [-(-len(w) // VAD_WINDOW) for w in wavs]
+        longest = max(num_windows) * VAD_WINDOW
+        batch = torch.zeros(len(wavs), longest)
+        for b, w in enumerate(wavs):
+            batch[b, :len(w)] = w
+
+        model.reset_states()
+        probs = []
+        for start in range(0, longest, VAD_WINDOW):
+            probs.append(model(batch[:, start:start + VAD_WINDOW], VAD_SR))
+        model.reset_states()
+        probs = torch.cat([p.reshape(len(wavs), 1) for p in probs], dim=1)
+        return [probs[b, :n].tolist() for b, n in enumerate(num_windows)]
+
+    @staticmethod
+    def _timestamps_from_probs(speech_probs, audio_length, threshold=0.5,
+                               min_speech_duration_ms=150, min_silence_duration_ms=100,
+                               speech_pad_ms=30):
+        """Silero's get_speech_timestamps post-processing, applied to precomputed probabilities."""
+        min_speech = VAD_SR * min_speech_duration_ms / 1000
+        min_silence = VAD_SR * min_silence_duration_ms / 1000
+        speech_pad = VAD_SR * speech_pad_ms / 1000
+        neg_threshold = max(threshold - 0.15, 0.01)
+
+        speeches, current, triggered, temp_end = [], {}, False, 0
+        for i, prob in enumerate(speech_probs):
+            if prob >= threshold and temp_end:
+                temp_end = 0
+            if prob >= threshold and not triggered:
+                triggered = True
+                current["start"] = VAD_WINDOW * i
+                continue
+            if prob < neg_threshold and triggered:
+                if not temp_end:
+                    temp_end = VAD_WINDOW * i
+                if VAD_WINDOW * i - temp_end < min_silence:
+                    continue
+                current["end"] = temp_end
+                if current["end"] - current["start"] > min_speech:
+                    speeches.append(current)
+                current, triggered, temp_end = {}, False, 0
+
+        if current and audio_length - current["start"] > min_speech:
+            current["end"] = audio_length
+            speeches.append(current)
+
+        for i, speech in enumerate(speeches):
+            if i == 0:
+                speech["start"] = int(max(0, speech["start"] - speech_pad))
+            if i != len(speeches) - 1:
+                silence = speeches[i + 1]["start"] - speech["end"]
+                if silence < 2 * speech_pad:
+                    speech["end"] += int(silence // 2)
+                    speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - silence // 2))
+                else:
+                    speech["end"] = int(min(audio_length, speech["end"] + speech_pad))
+                    speeches[i + 1]["start"] = int(max(0, speeches[i + 1]["start"] - speech_pad))
+            else:
+                speech["end"] = int(min(audio_length, speech["end"] + speech_pad))
+        return speeches
+
+    def speech_timestamps_batch(self, wavs, **vad_kwargs):
+        """
+        Speech timestamps (16 kHz samples) for a list of 1-D 16 kHz tensors.
+        Falls back to one get_speech_timestamps call per clip if the batched
+        model call isn't supported by the installed Silero version. Returns
+        None when Silero can't be loaded at all.
+        """
+        if not wavs:
+            return []
+        with self._lock:
+            try:
+                self._load()
+            except Exception as e:
+                print(f"⚠️ Silero VAD unavailable ({e})")
+                return None
+            try:
+                probs = self._speech_probs_batch(wavs)
+                return [
+                    self._timestamps_from_probs(p, len(w), **vad_kwargs)
+                    for p, w in zip(probs, wavs)
+                ]
+            except Exception as e:
+                print(f"⚠️ Batched VAD failed ({e}), running per segment")
+                return [
+                    self.get_speech_timestamps(w, self.model, sampling_rate=VAD_SR, **vad_kwargs)
+                    for w in wavs
+                ]
+
+    def speech_timestamps(self, wav, **vad_kwargs):
+        timestamps = self.speech_timestamps_batch([wav], **vad_kwargs)
+        return None if timestamps is None else timestamps[0]
+
+
+vad_service = None
+
+
+def get_vad_service():
+    global vad_service
+    if vad_service is None:
+        vad_service = VADService()
+    return vad_service
+
+
+# =========================
+# NOISE GATE (gap collapsing)
+# =========================
+def collapse_gaps(orig_audio, orig_sr, speech_timestamps_vad, max_gap=1.5, natural_pause=0.02):
+    """
+    Keep only speech regions; gaps longer than max_gap become natural_pause seconds
+    of silence, shorter gaps are kept as silence. Timestamps are in 16 kHz samples.
+    """
+    ratio = orig_sr / VAD_SR
+    speech_timestamps = [
+        {"start": int(seg["start"] * ratio), "end": int(seg["end"] * ratio)}
+        for seg in speech_timestamps_vad
+    ]
+
+    channels = orig_audio.shape[0]
+    result_audio = []
+    for i, seg in enumerate(speech_timestamps):
+        result_audio.append(orig_audio[:, seg["start"]:seg["end"]])
+        if i < len(speech_timestamps) - 1:
+            gap_samples = speech_timestamps[i + 1]["start"] - seg["end"]
+            if gap_samples > 0:
+                if gap_samples > int(max_gap * orig_sr):
+                    gap_samples = int(natural_pause * orig_sr)
+                result_audio.append(torch.zeros((channels, gap_samples), dtype=orig_audio.dtype))
+    return torch.cat(result_audio, dim=1)
+
+
+def remove_noise_batch(audio_paths,
+                       threshold=0.5,
+                       min_speech_duration_ms=150,
+                       min_silence_duration_ms=100,
+                       speech_pad_ms=30,
+                       max_gap=1.5,
+                       natural_pause=0.02,
+                       batch_size=VAD_BATCH_SIZE):
+    """
+    Batched remove_noise_high_quality: batched VAD passes over the files
+    (batch_size clips each), then each file is gap-collapsed at its original
+    sample rate / channels and saved as <name>_remove_noise.wav. Returns
+    output paths in input order; if Silero can't be loaded the input paths
+    are returned untouched.
+    """
+    service = get_vad_service()
+    output_paths = []
+    for i in range(0, len(audio_paths), batch_size):
+        paths = audio_paths[i:i + batch_size]
+        audios = []
+        for path in paths:
+            audio, sr = torchaudio.load(path)
+            audios.append((audio, sr))
+
+        wavs = [service.to_vad_input(audio, sr) for audio, sr in audios]
+        all_timestamps = service.speech_timestamps_batch(
+            wavs,
+            threshold=threshold,
+            min_speech_duration_ms=min_speech_duration_ms,
+            min_silence_duration_ms=min_silence_duration_ms,
+            speech_pad_ms=speech_pad_ms,
+        )
+        if all_timestamps is None:
+            print("⚠️ Noise removal skipped")
+            return list(audio_paths)
+
+        for path, (audio, sr), timestamps in zip(paths, audios, all_timestamps):
+            output_path = path.replace(".wav", "_remove_noise.wav")
+            if not timestamps:
+                print("No speech detected!")
+                sf.write(output_path, audio.numpy().T, sr)
+            else:
+                clean_audio = collapse_gaps(audio, sr, timestamps, max_gap, natural_pause)
+                sf.write(output_path, clean_audio.numpy().T, sr, subtype='PCM_24')
+            output_paths.append(output_path)
+    return output_paths
+
+# from vad_service import remove_noise_batch
+# cleaned = remove_noise_batch(["./dubbing_temp/1.wav", "./dubbing_temp/2.wav"], max_gap=0.9, natural_pause=0.2)
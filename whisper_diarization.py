@@ -11,7 +11,7 @@ import re
 import os
 import json
 import uuid
-from deep_translator import GoogleTranslator
+from translation import get_translator
 from llama_translate import hunyuan_mt_translate
 LANGUAGE_CODE = {
     'Akan': 'aka', 'Albanian': 'sq', 'Amharic': 'am', 'Arabic': 'ar', 'Armenian': 'hy',
@@ -161,21 +161,26 @@ def save_json(res):
         filepath = None
     return filepath
 
-def translate_text(text, source_language, destination_language):
-    """Translates a single block of text using GoogleTranslator."""
+def translation_codes(source_language, destination_language):
+    """Google-style (source, target) codes; an unknown source means auto-detect."""
     source_code = LANGUAGE_CODE.get(source_language, None)
     target_code = LANGUAGE_CODE[destination_language]
     if destination_language == "Chinese":
         target_code = 'zh-CN'
+    return source_code, target_code
+
+def translate_text(text, source_language, destination_language):
+    """Translates a single block of text with the configured translation backend."""
+    return translate_lines([text], source_language, destination_language)[0]
+
+def translate_lines(texts, source_language, destination_language):
+    """All lines at once: batched requests + translation memory. Failed lines come back as ""."""
+    source_code, target_code = translation_codes(source_language, destination_language)
     try:
-      if source_code is None:
-        translator = GoogleTranslator(target=target_code)
-      else:
-        translator = GoogleTranslator(source=source_code, target=target_code)
-      return str(translator.translate(text.strip()))
+      return get_translator().translate_lines(texts, source_code, target_code)
     except Exception as e:
       print(f"Translation failed: {e}")
-      return ""
+      return [""] * len(texts)
 
 def process_media(media_file,num_speakers,remove_music, make_small_segments,input_lang, output_lang,method,task):
   json_transcription,readable_json,prompt=None,None,None
@@ -184,19 +189,16 @@ def process_media(media_file,num_speakers,remove_music, make_small_segments,inpu
     res,used_audio_file = speech_to_text(media_file,language_name=input_lang,number_of_speakers=num_speakers,remove_music=remove_music,make_small_segments=make_small_segments)
     json_transcription=save_json(res)
     sentence_number=1
-    for i in res["segments"]:
+    if input_lang!=output_lang and method=="Using Google Translator" and task=="Translation":
+      translations=translate_lines([i["text"] for i in res["segments"]], input_lang,output_lang)
+    else:
+      translations=[""]*len(res["segments"])
+    for i,trans_text in zip(res["segments"],translations):
       text=i["text"]
       start=i["start"]
       end=i["end"]
       speaker=i["speaker"]
       speaker_id=int(speaker.split("SPEAKER_")[-1])
-      if input_lang==output_lang:
-        trans_text=""
-      else:
-        if method=="Using Google Translator" and task=="Translation":
-          trans_text=translate_text(text, input_lang,output_lang)
-        else:
-          trans_text=""
       data={
           "text":text,
           "dubbing":trans_text,